@@ -1,10 +1,56 @@
 import numpy as np
 import random
+from collections import defaultdict
 from base_classes import BaseAgent
+from policy_tables import PolicyTable, NO_ACTION
+
+
+def state_layer(state):
+    """The item flags of a state, e.g. (has_bag, has_rope). States with the same flags form one layer."""
+    return tuple(state[2:])
+
+
+def backward_layer_order(model):
+    """
+    Orders the item layers so every layer comes after all the layers it can move into.
+    Items are never dropped, so the layers form a DAG and solving them in this order
+    (reverse topological order) means each layer only looks up values that are final.
+    Returns None if the model has a cycle between layers.
+    """
+    successors = defaultdict(set)
+    layers = set()
+    for state, actions in model.items():
+        layer = state_layer(state)
+        layers.add(layer)
+        for transitions in actions.values():
+            for _, next_state, _ in transitions:
+                next_layer = state_layer(next_state)
+                if next_layer != layer:
+                    successors[layer].add(next_layer)
+
+    # Kahn's algorithm on the reversed graph: a layer is ready once all its successors are ordered
+    pending = {layer: len(successors[layer]) for layer in layers}
+    predecessors = defaultdict(set)
+    for layer, targets in successors.items():
+        for target in targets:
+            predecessors[target].add(layer)
+    ready = sorted(layer for layer, count in pending.items() if count == 0)
+    order = []
+    while ready:
+        layer = ready.pop()
+        order.append(layer)
+        for predecessor in sorted(predecessors[layer]):
+            pending[predecessor] -= 1
+            if pending[predecessor] == 0:
+                ready.append(predecessor)
+    return order if len(order) == len(layers) else None
+
 
 class DynamicProgrammingAgent(BaseAgent):
     """
     An agent that uses dynamic programming (policy iteration) to find the optimal policy.
+    The item layers are solved one at a time, starting with the layer holding every item,
+    with the layers already solved kept frozen.
     """
     def __init__(self, env, settings):
         super().__init__(env, settings)
@@ -38,31 +84,71 @@ class DynamicProgrammingAgent(BaseAgent):
                         if valid_actions:
                             self.policy[state] = random.choice(valid_actions)
         
+        self._build_model()
         self.is_trained = False
+        self.extract_policy()
+
+    def _build_model(self):
+        """
+        Caches the transition model of every state and valid action, groups the states
+        into item layers and orders the layers for the backward solve.
+        """
+        self.model = {}
+        for state in self.env.state_space:
+            self.model[state] = {action: self.env.get_transition_model(state, action) for action in self.env.get_valid_actions(state)}
+
+        order = backward_layer_order(self.model)
+        if order is None:
+            # Not a DAG: fall back to sweeping every state together
+            self.layers = [list(self.env.state_space)]
+        else:
+            states_by_layer = defaultdict(list)
+            for state in self.env.state_space:
+                states_by_layer[state_layer(state)].append(state)
+            self.layers = [states_by_layer[layer] for layer in order]
+        self.active_layer = 0
+        self.state_updates = 0
 
     def train_step(self):
         """
-        Performs a single full iteration of Policy Iteration.
-        1. Evaluates the current policy until the value function converges.
-        2. Improves the policy based on the new value function.
-        Returns whether the policy is stable and the final delta from evaluation.
+        Solves the next item layer with Policy Iteration, keeping the layers solved
+        before it frozen. Returns whether every layer is solved and the final delta
+        from evaluation.
+        """
+        if self.active_layer >= len(self.layers):
+            return True, 0.0
+        states = self.layers[self.active_layer]
+        while True:
+            policy_stable, eval_delta = self._policy_iteration_step(states)
+            if policy_stable:
+                break
+
+        self.active_layer += 1
+        self.is_trained = self.active_layer >= len(self.layers)
+        return self.is_trained, eval_delta
+
+    def _policy_iteration_step(self, states):
+        """
+        One iteration of Policy Iteration restricted to the given states.
+        1. Evaluates the current policy until the values of the states converge.
+        2. Improves the policy of the states based on the new value function.
+        Returns whether their policy is stable and the final delta from evaluation.
         """
         # --- 1. Policy Evaluation ---
-        # This loop runs until the value function for the current policy is stable.
+        # This loop runs until the values of the states are stable for the current policy.
         eval_delta = 0
         while True:
             eval_delta = 0
+            self.state_updates += len(states)
             # Create a copy to calculate new values based on the values from the previous sweep
             v_copy = np.copy(self.value_function)
-            for state in self.env.state_space:
-                v = self.value_function[state]
+            for state in states:
                 action = self.policy[state]
                 if action is None:
                     continue
-                
-                transitions = self.env.get_transition_model(state, action)
+                v = self.value_function[state]
                 # Calculate the new value using the values from the *previous* sweep (v_copy)
-                new_v = sum(prob * (reward + self.gamma * v_copy[next_state]) for prob, next_state, reward in transitions)
+                new_v = sum(prob * (reward + self.gamma * v_copy[next_state]) for prob, next_state, reward in self.model[state][action])
                 
                 self.value_function[state] = new_v
                 eval_delta = max(eval_delta, abs(v - new_v))
@@ -73,26 +159,141 @@ class DynamicProgrammingAgent(BaseAgent):
 
         # --- 2. Policy Improvement ---
         policy_stable = True
-        for state in self.env.state_space:
+        for state in states:
             old_action = self.policy[state]
             if old_action is None:
                 continue
 
-            action_values = {}
-            for action in self.env.get_valid_actions(state):
-                transitions = self.env.get_transition_model(state, action)
-                action_values[action] = sum(prob * (reward + self.gamma * self.value_function[next_state]) for prob, next_state, reward in transitions)
-            
+            action_values = {
+                action: sum(prob * (reward + self.gamma * self.value_function[next_state]) for prob, next_state, reward in transitions)
+                for action, transitions in self.model[state].items()
+            }
             if action_values:
                 best_action = max(action_values, key=action_values.get)
                 self.policy[state] = best_action
                 if old_action != best_action:
                     policy_stable = False
 
-        self.is_trained = policy_stable
         # The delta returned here is the final, small delta from the evaluation's convergence.
         # The meaningful change is whether the policy became stable.
         return policy_stable, eval_delta
 
     def extract_policy(self):
-        pass
+        """The policy array is kept up to date by train_step; this refreshes its compact int8 copy."""
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
+
+    def get_trained_state(self):
+        return {
+            'value_function': np.copy(self.value_function),
+            'policy': np.copy(self.policy),
+            'is_trained': self.is_trained,
+        }
+
+    def load_trained_state(self, snapshot):
+        self.value_function = np.copy(snapshot['value_function'])
+        self.policy = np.copy(snapshot['policy'])
+        self.is_trained = snapshot['is_trained']
+        self.active_layer = len(self.layers) if self.is_trained else 0
+        self.extract_policy()
+
+
+class ItemLayerDPAgent(BaseAgent):
+    """
+    A vectorized dynamic programming agent for the ordered-items room. Values live in
+    a (2^N, size, size) float32 array, one layer per item mask. Picking up an item only
+    ever sets a bit, so the masks are solved from the full mask down to 0, each with
+    NumPy value iteration over the layer and the layers above it frozen.
+    """
+    def __init__(self, env, settings):
+        super().__init__(env, settings)
+        self.name = "Dynamic Programming (Item Layers)"
+        self.training_type = "iterative"
+        self.gamma = float(settings.get('Discount Factor', 0.9))
+        self.theta = float(settings.get('Theta', 1e-6))
+        self.reset()
+
+    @staticmethod
+    def get_editor_options():
+        return DynamicProgrammingAgent.get_editor_options()
+
+    def reset(self):
+        num_masks = 1 << self.env.num_items
+        self.value_function = np.zeros((num_masks, self.env.size, self.env.size), dtype=np.float32)
+        self.policy = np.full((num_masks, self.env.size, self.env.size), NO_ACTION, dtype=np.int8)
+        self.outcomes, self.valid_actions = self.env.get_outcome_arrays()
+        # A larger mask is a superset reachable from a smaller one, never the other way round
+        self.layers = list(range(num_masks - 1, -1, -1))
+        self.active_layer = 0
+        self.state_updates = 0
+        self.is_trained = False
+        self.extract_policy()
+
+    def train_step(self):
+        """Solves the next item layer. Returns whether every layer is solved and the layer's final delta."""
+        if self.active_layer >= len(self.layers):
+            return True, 0.0
+        delta = self._solve_layer(self.layers[self.active_layer])
+        self.active_layer += 1
+        self.is_trained = self.active_layer >= len(self.layers)
+        return self.is_trained, delta
+
+    def _layer_boundary(self, item_mask):
+        """
+        Values of the cells that lead out of the layer: unheld items (pickup reward plus
+        the frozen value in the layer above) and the exit (terminal, so just its reward).
+        """
+        cells = self.env.size * self.env.size
+        fixed = np.zeros(cells)
+        is_fixed = np.zeros(cells, dtype=bool)
+        for pos in self.env.item_positions:
+            reward, next_mask = self.env._pickup(pos, item_mask)
+            if next_mask != item_mask:
+                cell = pos[0] * self.env.size + pos[1]
+                fixed[cell] = reward + self.gamma * self.value_function[next_mask][pos]
+                is_fixed[cell] = True
+        exit_cell = self.env.exit_pos[0] * self.env.size + self.env.exit_pos[1]
+        fixed[exit_cell] = self.env.exit_reward if item_mask == self.env.full_mask else self.env.early_exit_reward
+        is_fixed[exit_cell] = True
+        return fixed, is_fixed
+
+    def _solve_layer(self, item_mask, max_sweeps=100000):
+        cells = self.env.size * self.env.size
+        fixed, is_fixed = self._layer_boundary(item_mask)
+        live = self.valid_actions.any(axis=0)
+        values = self.value_function[item_mask].ravel().astype(np.float64)
+        action_values = np.empty((len(self.outcomes), cells))
+        delta = 0.0
+        for _ in range(max_sweeps):
+            next_values = np.where(is_fixed, fixed, self.gamma * values)
+            for a, (sources, next_cells, probs, rewards) in enumerate(self.outcomes.values()):
+                action_values[a] = np.bincount(sources, weights=probs * (rewards + next_values[next_cells]), minlength=cells)
+            action_values[~self.valid_actions] = -np.inf
+            new_values = np.where(live, action_values.max(axis=0), 0.0)
+            delta = float(np.max(np.abs(new_values - values)))
+            values = new_values
+            self.state_updates += cells
+            if delta < self.theta:
+                break
+
+        size = self.env.size
+        self.value_function[item_mask] = values.reshape(size, size)
+        self.policy[item_mask] = np.where(live, action_values.argmax(axis=0), NO_ACTION).reshape(size, size)
+        return delta
+
+    def extract_policy(self):
+        """The int8 policy array already uses the room's state encoding, so the table wraps it directly."""
+        self.policy_table = PolicyTable(list(self.env.action_space), self.policy.ravel())
+
+    def get_trained_state(self):
+        return {
+            'value_function': np.copy(self.value_function),
+            'policy': np.copy(self.policy),
+            'is_trained': self.is_trained,
+        }
+
+    def load_trained_state(self, snapshot):
+        self.value_function = np.copy(snapshot['value_function'])
+        self.policy = np.copy(snapshot['policy'])
+        self.is_trained = snapshot['is_trained']
+        self.active_layer = len(self.layers) if self.is_trained else 0
+        self.extract_policy()
@@ -1,8 +1,20 @@
+import heapq
 import numpy as np
 import random
 from collections import defaultdict
 from base_classes import BaseAgent
-from room3_qlearning_env import ThirdEscapeRoom
+from memory_stats import MemoryMonitor
+from convergence import ConvergenceMonitor
+from policy_evaluation import PolicyEvaluator
+from policy_tables import PolicyTable
+from eligibility_traces import EligibilityTraces
+from dyna_model import TransitionModel
+from replay_buffer import ReplayBuffer
+from q_tables import ArrayQTable, SharedQTable
+from exact_solvers import ReachableStateSolver
+
+PRIORITY_THRESHOLD = 1e-4  # Prioritized planning ignores model transitions whose TD error is smaller
+PLANNING_BATCH_STEPS = 64  # Uniform planning applies the simulated updates of this many real steps in one batch
 
 class QLearningAgent(BaseAgent):
     """An agent that learns using the Q-Learning (model-free, off-policy) algorithm."""
@@ -19,6 +31,28 @@ class QLearningAgent(BaseAgent):
 
         self.epsilon_decay = float(settings.get('Epsilon Decay', 0.9995))
         self.min_epsilon = float(settings.get('Min Epsilon', 0.01))
+        self.memory_budget_mb = float(settings.get('Memory Budget (MB)', 512))
+        self.warm_start = settings.get('Warm Start', 'None')
+        self.action_masking = settings.get('Action Masking', 'Off') == 'On'
+        self.reward_shaping = settings.get('Reward Shaping', 'Off') == 'On'
+        self.shaping_scale = float(settings.get('Shaping Scale', 100))
+        self.trace_lambda = float(settings.get('Lambda', 0))
+        self.parallel_workers = int(settings.get('Parallel Workers', 1))
+        self.sync_every = max(1, int(settings.get('Sync Every', 25)))
+        self.early_stopping = settings.get('Early Stopping', 'Off') == 'On'
+        self.convergence_window = max(1, int(settings.get('Convergence Window', 500)))
+        self.convergence_tolerance = float(settings.get('Convergence Tolerance', 0.5))
+        self.evaluate_every = max(0, int(settings.get('Evaluate Every', 0)))
+        self.evaluation_rollouts = max(1, int(settings.get('Evaluation Rollouts', 100)))
+        self.shared_q_table = settings.get('Shared Q-Table', 'Off') == 'On'
+        self.planning_steps = int(settings.get('Planning Steps', 0))
+        self.model_capacity = int(settings.get('Model Capacity', 100000))
+        self.prioritized_planning = settings.get('Prioritized Planning', 'Off') == 'On'
+        self.experience_replay = settings.get('Experience Replay', 'Off') == 'On'
+        self.replay_capacity = int(settings.get('Replay Capacity', 50000))
+        self.batch_size = int(settings.get('Batch Size', 64))
+        self.replay_every = max(1, int(settings.get('Replay Every', 4)))
+        self.solved_layout = None  # (layout signature, solver, error) of the last exact solve, kept across resets
         
         self.reset()
     
@@ -33,17 +67,62 @@ class QLearningAgent(BaseAgent):
             "Min Epsilon": {"type": "input", "default": "0.01", "input_type": "float"},
             "Max Episodes": {"type": "input", "default": "10000", "input_type": "int"},
             "Max Steps": {"type": "input", "default": "200", "input_type": "int"},
+            "Memory Budget (MB)": {"type": "input", "default": "512", "input_type": "float"},
+            "Warm Start": {"type": "dropdown", "options": ["None", "Exact Solver"], "default": "None"},
+            "Action Masking": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Reward Shaping": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Shaping Scale": {"type": "input", "default": "100", "input_type": "float"},
+            "Lambda": {"type": "input", "default": "0", "input_type": "float"},
+            "Parallel Workers": {"type": "input", "default": "1", "input_type": "int"},
+            "Sync Every": {"type": "input", "default": "25", "input_type": "int"},
+            "Early Stopping": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Convergence Window": {"type": "input", "default": "500", "input_type": "int"},
+            "Convergence Tolerance": {"type": "input", "default": "0.5", "input_type": "float"},
+            "Evaluate Every": {"type": "input", "default": "0", "input_type": "int"},
+            "Evaluation Rollouts": {"type": "input", "default": "100", "input_type": "int"},
+            "Shared Q-Table": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Planning Steps": {"type": "input", "default": "0", "input_type": "int"},
+            "Model Capacity": {"type": "input", "default": "100000", "input_type": "int"},
+            "Prioritized Planning": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Experience Replay": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Replay Capacity": {"type": "input", "default": "50000", "input_type": "int"},
+            "Batch Size": {"type": "input", "default": "64", "input_type": "int"},
+            "Replay Every": {"type": "input", "default": "4", "input_type": "int"},
         }
 
-    def reset(self):
+    def reset(self, warm_start=True):
         """Resets the agent's Q-table and policy for a new training session."""
+        if isinstance(getattr(self, 'q_table', None), SharedQTable):
+            self.q_table.release()
         self.q_table = defaultdict(lambda: {action: 0.0 for action in self.env.action_space})
         self.policy = {}
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
         self.is_trained = False
         self.episode_rewards = []
         self.episode_steps = []
         self.training_episode_count = 0
         self.action_counts = defaultdict(lambda: defaultdict(int))
+        self.memory_monitor = MemoryMonitor(self.memory_budget_mb)
+        self.convergence = ConvergenceMonitor(self.convergence_window, self.convergence_tolerance, self.early_stopping)
+        self.evaluator = PolicyEvaluator(self.evaluate_every, self.evaluation_rollouts)
+        self.traces = EligibilityTraces(self.gamma * self.trace_lambda)
+        self.model = TransitionModel(self.env.action_space, self.model_capacity, with_masks=self.action_masking,
+                                     with_predecessors=self.prioritized_planning)
+        self.planning_queue = []
+        self.steps_since_planning = 0
+        if self.experience_replay or self.planning_steps > 0:
+            # Replay and the model index Q-values by row, so the table starts out array-backed
+            self.q_table = ArrayQTable(self.env.action_space)
+            self.replay_rng = np.random.default_rng(random.getrandbits(32))
+        if self.experience_replay:
+            self.replay = ReplayBuffer(self.replay_capacity, len(self.env.action_space), with_masks=self.action_masking)
+            self.steps_since_replay = 0
+        self.shared_table_error = None
+        if self.shared_q_table:
+            try:
+                self.q_table = SharedQTable(self.env)
+            except ValueError as e:
+                self.shared_table_error = str(e)
         
         self.slow_train_episode_active = False
         self.slow_train_state = None
@@ -51,11 +130,56 @@ class QLearningAgent(BaseAgent):
         self.slow_train_path = []
         self.slow_train_step_count = 0
 
+        self.exact_solver = None
+        self.warm_start_error = None
+        if warm_start and self.warm_start == "Exact Solver":
+            self._warm_start_from_solver()
+
+    def _warm_start_from_solver(self):
+        """
+        Replaces the Q-table with the optimal Q-values over every state reachable from the start.
+        The solve takes about 20 seconds on 10x10, so it only runs again once the layout changes.
+        """
+        signature = ReachableStateSolver.layout_signature(self.env)
+        if self.solved_layout is None or self.solved_layout[0] != signature:
+            try:
+                self.solved_layout = (signature, ReachableStateSolver(self.env, self.gamma).solve(theta=1e-6), None)
+            except ValueError as e:
+                self.solved_layout = (signature, None, str(e))
+        _, self.exact_solver, self.warm_start_error = self.solved_layout
+        if self.exact_solver is None:
+            return
+        if isinstance(self.q_table, SharedQTable):
+            self.q_table.load(self.exact_solver.states, self.exact_solver.q_values)
+        else:
+            self.q_table = self.exact_solver.to_q_table()
+
+    def _allowed_actions(self, state):
+        """The actions to explore and maximize over: the room's action mask when masking is on, otherwise all of them."""
+        if self.action_masking:
+            return self.env.get_action_mask(state) or list(self.env.action_space)
+        return list(self.env.action_space)
+
+    def _potential(self, state):
+        """Shaping potential: the scale discounted over the room's estimated moves to go, a rough guess at the optimal value."""
+        moves = self.env.estimated_moves_to_go(state)
+        return 0.0 if moves is None else self.shaping_scale * self.gamma ** moves
+
+    def _shaped_reward(self, state, reward, next_state, done):
+        """
+        Adds the potential-based shaping term gamma * phi(s') - phi(s) when shaping is on, with
+        phi = 0 once the episode ends. Shaping of this form leaves the optimal policy unchanged.
+        """
+        if not self.reward_shaping:
+            return reward
+        next_potential = 0.0 if done else self._potential(next_state)
+        return reward + self.gamma * next_potential - self._potential(state)
+
     def choose_action(self, state):
         """
-        Selects an action using an epsilon-greedy strategy.
+        Selects an action using an epsilon-greedy strategy over the allowed actions.
         """
-        all_actions = list(self.env.action_space.keys())
+        all_actions = self._allowed_actions(state)
 
         if not all_actions:
             return None
@@ -63,30 +187,139 @@ class QLearningAgent(BaseAgent):
         if random.random() < self.epsilon:
             return random.choice(all_actions)
         else:
-            q_values = self.q_table[state]
+            q_values = self.q_table.get(state)
             if not q_values:
                 return random.choice(all_actions)
-            max_q = max(q_values.values())
-            best_actions = [action for action, q in q_values.items() if q == max_q]
+            # One read per value: with a shared table other processes may write between reads
+            values = [q_values[action] for action in all_actions] if self.action_masking else list(q_values.values())
+            max_q = max(values)
+            best_actions = [action for action, value in zip(all_actions, values) if value == max_q]
             return random.choice(best_actions)
 
+    def _cut_traces_if_exploratory(self, state, action):
+        """Watkins Q(lambda): traces only follow the greedy policy, so an exploratory action clears them."""
+        if self.trace_lambda > 0 and action is not None and len(self.traces):
+            q_values = self.q_table.get(state)
+            if q_values and q_values[action] < max(q_values[a] for a in self._allowed_actions(state)):
+                self.traces.clear()
+
+    def _max_q(self, state):
+        """The best (allowed) Q-value in a state, 0 for states the table has not seen."""
+        q_values = self.q_table.get(state)
+        if not q_values:
+            return 0.0
+        if self.action_masking:
+            return max(q_values[a] for a in self._allowed_actions(state))
+        return max(q_values.values())
+
+    def _update_q(self, state, action, reward, next_state):
+        """
+        Applies the Q-Learning update, bootstrapping from the best (allowed) action in the next
+        state. With Lambda > 0 this is Watkins Q(lambda) and the TD error reaches every traced pair.
+        """
+        q_values = self.q_table[state]
+        old_value = q_values[action]
+        td_error = reward + self.gamma * self._max_q(next_state) - old_value
+        if self.trace_lambda > 0:
+            self.traces.visit(state, action)
+            self.traces.update(self.q_table, self.alpha * td_error)
+        else:
+            q_values[action] = old_value + self.alpha * td_error
+
+    def _learn(self, state, action, reward, next_state, done):
+        """Learns from one real transition: an immediate update, or a place in the replay buffer. Then plans, if enabled."""
+        if self.experience_replay:
+            self._remember(state, action, reward, next_state, done)
+        else:
+            self._update_q(state, action, reward, next_state)
+        self._plan(state, action, reward, next_state, done)
+
+    def _next_mask(self, next_state):
+        """The allowed actions of a next state as a mask over the action space, or None without action masking."""
+        if not self.action_masking:
+            return None
+        allowed = self._allowed_actions(next_state)
+        return [a in allowed for a in self.env.action_space]
+
+    def _remember(self, state, action, reward, next_state, done):
+        """Adds a transition to the replay buffer and replays a minibatch every Replay Every steps."""
+        actions = list(self.env.action_space)
+        self.replay.add(self.q_table.row_of(state), actions.index(action), reward, self.q_table.row_of(next_state), done, self._next_mask(next_state))
+        self.steps_since_replay += 1
+        if self.steps_since_replay >= self.replay_every:
+            self.steps_since_replay = 0
+            self._replay_minibatch()
+
+    def _replay_minibatch(self):
+        self._batched_update(*self.replay.sample(self.batch_size, self.replay_rng))
+
+    def _batched_update(self, rows, actions, rewards, next_rows, done, next_masks):
+        """
+        One vectorized Q-learning update over a sample of transitions (replay or planning). All
+        TD errors are computed from the values before the update; a (state, action) sampled more
+        than once moves by alpha times the mean of its TD errors rather than once per copy.
+        """
+        values = self.q_table.values
+        next_values = values[next_rows]
+        if next_masks is not None:
+            next_values = np.where(next_masks, next_values, -np.inf)
+        targets = rewards + self.gamma * np.where(done, 0.0, next_values.max(axis=1))
+        td_errors = targets - values[rows, actions]
+
+        pairs, inverse, counts = np.unique(rows * values.shape[1] + actions, return_inverse=True, return_counts=True)
+        mean_errors = np.bincount(inverse, weights=td_errors) / counts
+        pair_rows, pair_actions = np.divmod(pairs, values.shape[1])
+        values[pair_rows, pair_actions] += (self.alpha * mean_errors).astype(values.dtype)
+
+    def _model_td_error(self, slot):
+        state, action, reward, next_state, done = self.model.transition(slot)
+        target = reward if done else reward + self.gamma * self._max_q(next_state)
+        return target - self.q_table[state][action]
+
+    def _queue_if_urgent(self, slot):
+        priority = abs(self._model_td_error(slot))
+        if priority > PRIORITY_THRESHOLD:
+            heapq.heappush(self.planning_queue, (-priority, slot))
+            if len(self.planning_queue) > 2 * self.model.capacity:
+                self.planning_queue = heapq.nsmallest(self.model.capacity, self.planning_queue)
+
+    def _plan(self, state, action, reward, next_state, done):
+        """
+        Dyna-Q: records the real transition in the model, then applies Planning Steps simulated
+        updates per real step. Uniform planning draws them from the model and applies those of
+        PLANNING_BATCH_STEPS real steps as one vectorized update, so a simulated update costs
+        far less than a real one. Prioritized planning replays the transitions with the largest
+        TD error first and, whenever that changes a state's value, queues the transitions
+        leading into the state (prioritized sweeping); that is sequential, one update at a time.
+        """
+        if self.planning_steps <= 0:
+            return
+        slot = self.model.record(state, action, reward, next_state, done, self.q_table.row_of(state),
+                                 self.q_table.row_of(next_state), self._next_mask(next_state))
+        if not self.prioritized_planning:
+            self.steps_since_planning += 1
+            if self.steps_since_planning >= PLANNING_BATCH_STEPS:
+                self._batched_update(*self.model.sample(self.planning_steps * self.steps_since_planning, self.replay_rng))
+                self.steps_since_planning = 0
+            return
+        self._queue_if_urgent(slot)
+        for _ in range(self.planning_steps):
+            if not self.planning_queue: break
+            slot = heapq.heappop(self.planning_queue)[1]
+            planned_state, planned_action = self.model.states[slot], self.model.actions[self.model.action_codes[slot]]
+            value_before = self._max_q(planned_state)
+            self.q_table[planned_state][planned_action] += self.alpha * self._model_td_error(slot)
+            if self._max_q(planned_state) != value_before:
+                for previous in self.model.slots_leading_to(planned_state):
+                    self._queue_if_urgent(previous)
+
     def train_step(self):
         """
         Runs a full training episode using the Q-Learning algorithm.
         """
         self.env.reset_state()
-        
-        start_pos = self.env.start_pos
-        if isinstance(self.env, ThirdEscapeRoom):
-            if hasattr(self.env, 'original_plank1_pos'):
-                state = (*start_pos, 
-                         *self.env.original_plank1_pos, 
-                         *self.env.original_plank2_pos, 
-                         0, 0)
-            else: 
-                state = (*start_pos, *self.env.original_plank_pos, 0)
-        else:
-            state = (*start_pos, 0)
+        self.traces.clear()
+        state = self.env.get_start_state()
         
         done = False
         path = [state]
@@ -96,21 +329,14 @@ class QLearningAgent(BaseAgent):
         while not done and step_count < self.max_steps:
             action = self.choose_action(state)
             if action is None: break
+            self._cut_traces_if_exploratory(state, action)
             
             if action in ['up', 'down', 'left', 'right']:
                 self.action_counts[state[:2]][action] += 1
 
             next_state, reward, done = self.env.step(state, action)
             total_reward += reward
-            
-            old_value = self.q_table[state][action]
-            
-            next_q_values = self.q_table[next_state]
-            
-            max_next_q = max(next_q_values.values()) if next_q_values else 0.0
-
-            new_value = old_value + self.alpha * (reward + self.gamma * max_next_q - old_value)
-            self.q_table[state][action] = new_value
+            self._learn(state, action, self._shaped_reward(state, reward, next_state, done), next_state, done)
             
             state = next_state
             path.append(state)
@@ -122,47 +348,64 @@ class QLearningAgent(BaseAgent):
         self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
         
         self.training_episode_count += 1
+        self.memory_monitor.on_episode_end(self)
+        self.convergence.on_episode_end(self, path, done and reward > 0)
+        self.evaluator.on_episode_end(self)
         return False, path
 
+    def learn_from_episode(self, transitions, total_reward):
+        """
+        Learns from an episode another process played (see parallel_training.py). The
+        transitions go through the same update, replay and planning path as in train_step.
+        """
+        self.traces.clear()
+        for state, action, reward, next_state, done, _ in transitions:
+            self._cut_traces_if_exploratory(state, action)
+            if action in ['up', 'down', 'left', 'right']:
+                self.action_counts[state[:2]][action] += 1
+            self._learn(state, action, self._shaped_reward(state, reward, next_state, done), next_state, done)
+        reached_exit = bool(transitions) and transitions[-1][4] and transitions[-1][2] > 0
+        self.record_episode(total_reward, len(transitions), [transition[0] for transition in transitions], reached_exit)
+
+    def record_episode(self, total_reward, steps, states, reached_exit):
+        """
+        The end-of-episode bookkeeping of an episode another process played: the learning
+        curves, epsilon decay, episode count and monitors. `states` are the states it visited.
+        """
+        self.episode_rewards.append(total_reward)
+        self.episode_steps.append(steps)
+        self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
+        self.training_episode_count += 1
+        self.memory_monitor.on_episode_end(self)
+        self.convergence.on_episode_end(self, states, reached_exit)
+        self.evaluator.on_episode_end(self)
+
     def train_step_by_step(self):
         """
         Runs a single step of a training episode for visualization purposes.
         """
         if not self.slow_train_episode_active:
             self.env.reset_state()
-            if isinstance(self.env, ThirdEscapeRoom):
-                if hasattr(self.env, 'original_plank1_pos'):
-                    self.slow_train_state = (*self.env.start_pos, 
-                                             *self.env.original_plank1_pos, 
-                                             *self.env.original_plank2_pos, 
-                                             0, 0)
-                else:
-                    self.slow_train_state = (*self.env.start_pos, *self.env.original_plank_pos, 0)
-            else:
-                self.slow_train_state = (*self.env.start_pos, 0)
+            self.traces.clear()
+            self.slow_train_state = self.env.get_start_state()
 
             self.slow_train_action = self.choose_action(self.slow_train_state)
             self.slow_train_path = [self.slow_train_state]
             self.slow_train_episode_active = True
             self.slow_train_step_count = 0
 
-        done = False
+        done = reached_exit = False
         if self.slow_train_action is not None and self.slow_train_step_count < self.max_steps:
             if self.slow_train_action in ['up', 'down', 'left', 'right']:
                 self.action_counts[self.slow_train_state[:2]][self.slow_train_action] += 1
 
             next_state, reward, done = self.env.step(self.slow_train_state, self.slow_train_action)
-            
-            old_value = self.q_table[self.slow_train_state][self.slow_train_action]
-            
-            next_q_values = self.q_table[next_state]
-            max_next_q = max(next_q_values.values()) if next_q_values else 0.0
-
-            new_value = old_value + self.alpha * (reward + self.gamma * max_next_q - old_value)
-            self.q_table[self.slow_train_state][self.slow_train_action] = new_value
+            reached_exit = done and reward > 0
+            self._learn(self.slow_train_state, self.slow_train_action, self._shaped_reward(self.slow_train_state, reward, next_state, done), next_state, done)
             
             self.slow_train_state = next_state
             self.slow_train_action = self.choose_action(self.slow_train_state)
+            self._cut_traces_if_exploratory(self.slow_train_state, self.slow_train_action)
             self.slow_train_path.append(next_state)
             self.slow_train_step_count += 1
         else:
@@ -172,21 +415,62 @@ class QLearningAgent(BaseAgent):
             self.slow_train_episode_active = False
             self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
             self.training_episode_count += 1
+            self.memory_monitor.on_episode_end(self)
+            self.convergence.on_episode_end(self, self.slow_train_path, reached_exit)
+            self.evaluator.on_episode_end(self)
 
         return False, self.slow_train_path
 
-    def extract_policy(self):
-        """
-        Extracts the greedy policy from the learned Q-table.
-        """
+    def greedy_policy(self):
+        """{state: action} greedy in the current Q-table over the valid actions, without marking the agent trained."""
+        policy = {}
         for state, actions in self.q_table.items():
-            valid_actions = self.env.get_valid_actions(state)
+            valid_actions = self._allowed_actions(state) if self.action_masking else self.env.get_valid_actions(state)
             if not valid_actions:
-                self.policy[state] = None
+                policy[state] = None
                 continue
             
             valid_q_values = {action: actions.get(action, -np.inf) for action in valid_actions}
             
             if valid_q_values:
-                self.policy[state] = max(valid_q_values, key=valid_q_values.get)
+                policy[state] = max(valid_q_values, key=valid_q_values.get)
+        return policy
+
+    def extract_policy(self):
+        """
+        Extracts the greedy policy from the learned Q-table.
+        """
+        self.policy.update(self.greedy_policy())
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
         self.is_trained = True
+
+    def get_trained_state(self):
+        """Returns the learned tables as plain dicts so they can cross process boundaries."""
+        return {
+            'q_table': {state: dict(actions) for state, actions in self.q_table.items()},
+            'policy': dict(self.policy),
+            'is_trained': self.is_trained,
+            'epsilon': self.epsilon,
+            'training_episode_count': self.training_episode_count,
+            'episode_rewards': list(self.episode_rewards),
+            'episode_steps': list(self.episode_steps),
+            'action_counts': {pos: dict(counts) for pos, counts in self.action_counts.items()},
+            'stopped_at': self.convergence.stopped_at,
+            'evaluations': list(self.evaluator.history),
+        }
+
+    def load_trained_state(self, snapshot):
+        self.reset(warm_start=False)
+        for state, actions in snapshot['q_table'].items():
+            self.q_table[state].update(actions)
+        self.policy = dict(snapshot['policy'])
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
+        self.is_trained = snapshot['is_trained']
+        self.epsilon = snapshot['epsilon']
+        self.training_episode_count = snapshot['training_episode_count']
+        self.episode_rewards = list(snapshot['episode_rewards'])
+        self.episode_steps = list(snapshot['episode_steps'])
+        for pos, counts in snapshot['action_counts'].items():
+            self.action_counts[pos].update(counts)
+        self.convergence.stopped_at = snapshot['stopped_at']
+        self.evaluator.history = list(snapshot['evaluations'])
@@ -2,6 +2,12 @@ import numpy as np
 import random
 from collections import defaultdict
 from base_classes import BaseAgent
+from memory_stats import MemoryMonitor
+from convergence import ConvergenceMonitor
+from policy_evaluation import PolicyEvaluator
+from policy_tables import PolicyTable
+from eligibility_traces import EligibilityTraces
+from exact_solvers import PatrolPlanner
 
 class SarsaAgent(BaseAgent):
     """
@@ -19,6 +25,19 @@ class SarsaAgent(BaseAgent):
 
         self.epsilon_decay = float(settings.get('Epsilon Decay', 0.9995))
         self.min_epsilon = float(settings.get('Min Epsilon', 0.01))
+        self.memory_budget_mb = float(settings.get('Memory Budget (MB)', 512))
+        self.warm_start = settings.get('Warm Start', 'None')
+        self.action_masking = settings.get('Action Masking', 'Off') == 'On'
+        self.reward_shaping = settings.get('Reward Shaping', 'Off') == 'On'
+        self.shaping_scale = float(settings.get('Shaping Scale', 100))
+        self.trace_lambda = float(settings.get('Lambda', 0))
+        self.parallel_workers = int(settings.get('Parallel Workers', 1))
+        self.sync_every = max(1, int(settings.get('Sync Every', 25)))
+        self.early_stopping = settings.get('Early Stopping', 'Off') == 'On'
+        self.convergence_window = max(1, int(settings.get('Convergence Window', 500)))
+        self.convergence_tolerance = float(settings.get('Convergence Tolerance', 0.5))
+        self.evaluate_every = max(0, int(settings.get('Evaluate Every', 0)))
+        self.evaluation_rollouts = max(1, int(settings.get('Evaluation Rollouts', 100)))
 
         self.reset()
     
@@ -32,16 +51,34 @@ class SarsaAgent(BaseAgent):
             "Min Epsilon": {"type": "input", "default": "0.01", "input_type": "float"},
             "Max Episodes": {"type": "input", "default": "5000", "input_type": "int"},
             "Max Steps": {"type": "input", "default": "200", "input_type": "int"},
+            "Memory Budget (MB)": {"type": "input", "default": "512", "input_type": "float"},
+            "Warm Start": {"type": "dropdown", "options": ["None", "Exact Planner"], "default": "None"},
+            "Action Masking": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Reward Shaping": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Shaping Scale": {"type": "input", "default": "100", "input_type": "float"},
+            "Lambda": {"type": "input", "default": "0", "input_type": "float"},
+            "Parallel Workers": {"type": "input", "default": "1", "input_type": "int"},
+            "Sync Every": {"type": "input", "default": "25", "input_type": "int"},
+            "Early Stopping": {"type": "dropdown", "options": ["Off", "On"], "default": "Off"},
+            "Convergence Window": {"type": "input", "default": "500", "input_type": "int"},
+            "Convergence Tolerance": {"type": "input", "default": "0.5", "input_type": "float"},
+            "Evaluate Every": {"type": "input", "default": "0", "input_type": "int"},
+            "Evaluation Rollouts": {"type": "input", "default": "100", "input_type": "int"},
         }
 
-    def reset(self):
+    def reset(self, warm_start=True):
         self.q_table = defaultdict(lambda: {action: 0.0 for action in self.env.action_space})
         self.policy = {}
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
         self.is_trained = False
         self.training_episode_count = 0
         self.episode_rewards = []
         self.episode_steps = []
         self.action_counts = defaultdict(lambda: defaultdict(int))
+        self.memory_monitor = MemoryMonitor(self.memory_budget_mb)
+        self.convergence = ConvergenceMonitor(self.convergence_window, self.convergence_tolerance, self.early_stopping)
+        self.evaluator = PolicyEvaluator(self.evaluate_every, self.evaluation_rollouts)
+        self.traces = EligibilityTraces(self.gamma * self.trace_lambda)
         
         self.slow_train_episode_active = False
         self.slow_train_state = None
@@ -49,11 +86,47 @@ class SarsaAgent(BaseAgent):
         self.slow_train_path = []
         self.slow_train_step_count = 0
 
+        self.exact_solver = None
+        self.warm_start_error = None
+        if warm_start and self.warm_start == "Exact Planner":
+            self._warm_start_from_planner()
+
+    def _warm_start_from_planner(self):
+        """Seeds the Q-table with the exact patrol planner's Q-values, averaged over the patrol phase."""
+        try:
+            self.exact_solver = PatrolPlanner(self.env, self.gamma).solve()
+        except ValueError as e:
+            self.warm_start_error = str(e)
+            return
+        for state, action_values in self.exact_solver.q_table_warm_start().items():
+            self.q_table[state].update(action_values)
+
+    def _allowed_actions(self, state):
+        """The actions to explore and maximize over: the room's action mask when masking is on, otherwise all of them."""
+        if self.action_masking:
+            return self.env.get_action_mask(state) or list(self.env.action_space)
+        return list(self.env.action_space)
+
+    def _potential(self, state):
+        """Shaping potential: the scale discounted over the room's estimated moves to go, a rough guess at the optimal value."""
+        moves = self.env.estimated_moves_to_go(state)
+        return 0.0 if moves is None else self.shaping_scale * self.gamma ** moves
+
+    def _shaped_reward(self, state, reward, next_state, done):
+        """
+        Adds the potential-based shaping term gamma * phi(s') - phi(s) when shaping is on, with
+        phi = 0 once the episode ends. Shaping of this form leaves the optimal policy unchanged.
+        """
+        if not self.reward_shaping:
+            return reward
+        next_potential = 0.0 if done else self._potential(next_state)
+        return reward + self.gamma * next_potential - self._potential(state)
+
     def choose_action(self, state):
         """
-        Selects an action using an epsilon-greedy strategy.
+        Selects an action using an epsilon-greedy strategy over the allowed actions.
         """
-        all_actions = list(self.env.action_space.keys())
+        all_actions = self._allowed_actions(state)
 
         if not all_actions:
             return None
@@ -61,17 +134,33 @@ class SarsaAgent(BaseAgent):
         if random.random() < self.epsilon:
             return random.choice(all_actions)
         else:
-            q_values = self.q_table[state]
+            q_values = self.q_table.get(state)
             if not q_values:
                 return random.choice(all_actions)
-            max_q = max(q_values.values())
-            best_actions = [action for action, q in q_values.items() if q == max_q]
+            max_q = max(q_values[action] for action in all_actions)
+            best_actions = [action for action in all_actions if q_values[action] == max_q]
             return random.choice(best_actions)
 
+    def _update_q(self, state, action, reward, next_state, next_action):
+        """
+        Applies the SARSA update for a single (s, a, r, s', a') transition. With Lambda > 0
+        this is SARSA(lambda): the TD error is spread over every pair that still has a trace.
+        """
+        old_value = self.q_table[state][action]
+        next_q_values = self.q_table.get(next_state)
+        next_value = next_q_values[next_action] if next_q_values and next_action else 0.0
+        td_error = reward + self.gamma * next_value - old_value
+        if self.trace_lambda > 0:
+            self.traces.visit(state, action)
+            self.traces.update(self.q_table, self.alpha * td_error)
+        else:
+            self.q_table[state][action] = old_value + self.alpha * td_error
+
     def train_step(self):
         """Runs a full training episode."""
         self.env.reset_state()
-        state = (*self.env.start_pos, 0)
+        self.traces.clear()
+        state = self.env.get_start_state()
         
         action = self.choose_action(state)
         done = False
@@ -89,12 +178,7 @@ class SarsaAgent(BaseAgent):
             total_reward += reward
             
             next_action = self.choose_action(next_state)
-            
-            old_value = self.q_table[state][action]
-            next_value = self.q_table[next_state][next_action] if next_action else 0.0
-            
-            new_value = old_value + self.alpha * (reward + self.gamma * next_value - old_value)
-            self.q_table[state][action] = new_value
+            self._update_q(state, action, self._shaped_reward(state, reward, next_state, done), next_state, next_action)
             
             state = next_state
             action = next_action
@@ -105,31 +189,57 @@ class SarsaAgent(BaseAgent):
         self.episode_steps.append(step_count)
         self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
         self.training_episode_count += 1
+        self.memory_monitor.on_episode_end(self)
+        self.convergence.on_episode_end(self, path, done and reward > 0)
+        self.evaluator.on_episode_end(self)
         return False, path 
     
+    def learn_from_episode(self, transitions, total_reward):
+        """
+        Learns from an episode another process played (see parallel_training.py), applying
+        the SARSA update to its (s, a, r, s', done, a') transitions in order.
+        """
+        self.traces.clear()
+        for state, action, reward, next_state, done, next_action in transitions:
+            if action in ['up', 'down', 'left', 'right']:
+                self.action_counts[state[:2]][action] += 1
+            self._update_q(state, action, self._shaped_reward(state, reward, next_state, done), next_state, next_action)
+        reached_exit = bool(transitions) and transitions[-1][4] and transitions[-1][2] > 0
+        self.record_episode(total_reward, len(transitions), [transition[0] for transition in transitions], reached_exit)
+
+    def record_episode(self, total_reward, steps, states, reached_exit):
+        """
+        The end-of-episode bookkeeping of an episode another process played: the learning
+        curves, epsilon decay, episode count and monitors. `states` are the states it visited.
+        """
+        self.episode_rewards.append(total_reward)
+        self.episode_steps.append(steps)
+        self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
+        self.training_episode_count += 1
+        self.memory_monitor.on_episode_end(self)
+        self.convergence.on_episode_end(self, states, reached_exit)
+        self.evaluator.on_episode_end(self)
+
     def train_step_by_step(self):
         """Runs a single step of a training episode."""
         if not self.slow_train_episode_active:
             self.env.reset_state()
-            self.slow_train_state = (*self.env.start_pos, 0)
+            self.traces.clear()
+            self.slow_train_state = self.env.get_start_state()
             self.slow_train_action = self.choose_action(self.slow_train_state)
             self.slow_train_path = [self.slow_train_state]
             self.slow_train_episode_active = True
             self.slow_train_step_count = 0
 
-        done = False
+        done = reached_exit = False
         if self.slow_train_action is not None and self.slow_train_step_count < self.max_steps:
             if self.slow_train_action in ['up', 'down', 'left', 'right']:
                 self.action_counts[self.slow_train_state[:2]][self.slow_train_action] += 1
 
             next_state, reward, done = self.env.step(self.slow_train_state, self.slow_train_action)
+            reached_exit = done and reward > 0
             next_action = self.choose_action(next_state)
-            
-            old_value = self.q_table[self.slow_train_state][self.slow_train_action]
-            next_value = self.q_table[next_state][next_action] if next_action else 0.0
-            
-            new_value = old_value + self.alpha * (reward + self.gamma * next_value - old_value)
-            self.q_table[self.slow_train_state][self.slow_train_action] = new_value
+            self._update_q(self.slow_train_state, self.slow_train_action, self._shaped_reward(self.slow_train_state, reward, next_state, done), next_state, next_action)
             
             self.slow_train_state = next_state
             self.slow_train_action = next_action
@@ -142,18 +252,59 @@ class SarsaAgent(BaseAgent):
             self.slow_train_episode_active = False
             self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
             self.training_episode_count += 1
+            self.memory_monitor.on_episode_end(self)
+            self.convergence.on_episode_end(self, self.slow_train_path, reached_exit)
+            self.evaluator.on_episode_end(self)
 
         return False, self.slow_train_path
 
-    def extract_policy(self):
-        """Extracts the policy from the learned Q-table."""
+    def greedy_policy(self):
+        """{state: action} greedy in the current Q-table over the valid actions, without marking the agent trained."""
+        policy = {}
         for state, actions in self.q_table.items():
-            valid_actions = self.env.get_valid_actions(state)
+            valid_actions = self._allowed_actions(state) if self.action_masking else self.env.get_valid_actions(state)
             if not valid_actions:
-                self.policy[state] = None
+                policy[state] = None
                 continue
             
             valid_q_values = {action: actions.get(action, -np.inf) for action in valid_actions}
             if valid_q_values:
-                self.policy[state] = max(valid_q_values, key=valid_q_values.get)
+                policy[state] = max(valid_q_values, key=valid_q_values.get)
+        return policy
+
+    def extract_policy(self):
+        """Extracts the policy from the learned Q-table."""
+        self.policy.update(self.greedy_policy())
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
         self.is_trained = True
+
+    def get_trained_state(self):
+        """Returns the learned tables as plain dicts so they can cross process boundaries."""
+        return {
+            'q_table': {state: dict(actions) for state, actions in self.q_table.items()},
+            'policy': dict(self.policy),
+            'is_trained': self.is_trained,
+            'epsilon': self.epsilon,
+            'training_episode_count': self.training_episode_count,
+            'episode_rewards': list(self.episode_rewards),
+            'episode_steps': list(self.episode_steps),
+            'action_counts': {pos: dict(counts) for pos, counts in self.action_counts.items()},
+            'stopped_at': self.convergence.stopped_at,
+            'evaluations': list(self.evaluator.history),
+        }
+
+    def load_trained_state(self, snapshot):
+        self.reset(warm_start=False)
+        for state, actions in snapshot['q_table'].items():
+            self.q_table[state].update(actions)
+        self.policy = dict(snapshot['policy'])
+        self.policy_table = PolicyTable.from_policy(self.env, self.policy)
+        self.is_trained = snapshot['is_trained']
+        self.epsilon = snapshot['epsilon']
+        self.training_episode_count = snapshot['training_episode_count']
+        self.episode_rewards = list(snapshot['episode_rewards'])
+        self.episode_steps = list(snapshot['episode_steps'])
+        for pos, counts in snapshot['action_counts'].items():
+            self.action_counts[pos].update(counts)
+        self.convergence.stopped_at = snapshot['stopped_at']
+        self.evaluator.history = list(snapshot['evaluations'])
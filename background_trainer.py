@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel_training import train_parallel, train_hogwild
+from q_tables import SharedQTable
+from result_cache import ResultCache, result_key
+from constants import RESULT_CACHE_MB
+
+
+def run_full_training(agent, max_iterations=500):
+    """Trains an agent the same way the "Fast Train" button does, without any UI."""
+    agent.reset()
+    if agent.training_type == 'iterative':
+        for _ in range(max_iterations):
+            converged, _ = agent.train_step()
+            if converged:
+                break
+    elif getattr(agent, 'parallel_workers', 1) > 1 and isinstance(getattr(agent, 'q_table', None), SharedQTable):
+        train_hogwild(agent, agent.max_episodes - agent.training_episode_count, agent.parallel_workers)
+    elif getattr(agent, 'parallel_workers', 1) > 1:
+        train_parallel(agent, agent.max_episodes - agent.training_episode_count, agent.parallel_workers, agent.sync_every)
+    else:
+        for _ in range(agent.max_episodes - agent.training_episode_count):
+            agent.train_step()
+            if agent.convergence.converged:
+                break
+    agent.extract_policy()
+    return agent
+
+
+def _train_room(env, AgentClass, settings):
+    """
+    Worker entry point. Runs in a separate process on a copy of the room. A layout trained
+    before with the same settings is read from the result cache instead of trained again.
+    """
+    cache = ResultCache() if RESULT_CACHE_MB > 0 else None
+    key = result_key(env, AgentClass, settings) if cache else None
+    snapshot = cache.get(key) if cache else None
+    if snapshot is not None:
+        return snapshot
+    agent = AgentClass(env, settings)
+    run_full_training(agent)
+    snapshot = agent.get_trained_state()
+    if isinstance(getattr(agent, 'q_table', None), SharedQTable):
+        agent.q_table.release()
+    if cache:
+        cache.put(key, snapshot)
+    return snapshot
+
+
+class BackgroundTrainer:
+    """
+    Trains agents for several rooms in worker processes while the UI keeps running.
+    Every submission gets a token; only the result of the latest submission for a
+    room index is ever handed back, so regenerating a map discards stale work.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.pending = {}  # room_index -> (token, future)
+        self.next_token = 0
+
+    def submit(self, room_index, env, AgentClass, settings):
+        """Queues training for a room, replacing any job already pending for it."""
+        self.cancel(room_index)
+        self.next_token += 1
+        future = self.executor.submit(_train_room, env, AgentClass, dict(settings))
+        self.pending[room_index] = (self.next_token, future)
+        return self.next_token
+
+    def cancel(self, room_index):
+        """Forgets the pending job of a room. A job that already started still runs, but its result is dropped."""
+        entry = self.pending.pop(room_index, None)
+        if entry:
+            entry[1].cancel()
+
+    def is_pending(self, room_index):
+        return room_index in self.pending
+
+    def poll(self):
+        """Returns a list of (room_index, token, snapshot, error) for every job that finished since the last poll."""
+        finished = []
+        for room_index, (token, future) in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[room_index]
+            if future.cancelled():
+                continue
+            error = future.exception()
+            finished.append((room_index, token, None if error else future.result(), error))
+        return finished
+
+    def shutdown(self):
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
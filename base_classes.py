@@ -1,11 +1,16 @@
 import numpy as np
 import random
-from constants import WALL, EXIT, EMPTY, START
+from bisect import bisect_right
+from collections import deque
+from constants import WALL, EXIT, EMPTY, START, GRID_SIZE, GRID_SIZE_OPTIONS
+
+SLIP_DRAW_BLOCK = 4096  # Uniforms drawn at a time for sampling slips
 
 class BaseAgent:
     """A base class that defines the interface for all agents."""
     def __init__(self, env, settings):
         self.env = env
+        self.settings = dict(settings)
         self.is_trained = False
         self.name = "Base Agent"
         self.training_type = "iterative" 
@@ -25,8 +30,19 @@ class BaseAgent:
     def extract_policy(self):
         raise NotImplementedError
 
+    def get_trained_state(self):
+        """Returns a picklable snapshot of everything training produced."""
+        raise NotImplementedError
+
+    def load_trained_state(self, snapshot):
+        """Restores a snapshot produced by get_trained_state."""
+        raise NotImplementedError
+
 class BaseRoom:
     """A base class that defines the interface for all rooms."""
+    # Attributes set by generate_layout that, with the grid, define a layout (see layout_fingerprint)
+    layout_attributes = ('size', 'start_pos', 'exit_pos', 'slippery_probabilities')
+
     def __init__(self, size=10):
         self.size = size
         self.grid = np.zeros((size, size), dtype=int)
@@ -36,6 +52,11 @@ class BaseRoom:
         self.action_space = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1), 'right': (0, 1)}
         self.name = "Base Room"
         self.slippery_probabilities = {}
+        self.slip_actions = {}
+        self.slip_probabilities = {}
+        self.slip_cumulative = {}
+        self._uniform_draws = []
+        self._draw_index = 0
 
     def generate_layout(self, settings):
         self.grid.fill(EMPTY)
@@ -45,7 +66,7 @@ class BaseRoom:
         possible_placements = [(r, c) for r in range(self.size) for c in range(self.size) if (r, c) not in [self.start_pos, self.exit_pos]]
         
         num_walls_str = settings.get('Walls', '0')
-        num_walls = random.randint(1,15) if "Random" in num_walls_str else int(num_walls_str)
+        num_walls = self._random_count(1, 15) if "Random" in num_walls_str else int(num_walls_str)
         num_walls = min(num_walls, len(possible_placements))
         wall_positions = random.sample(possible_placements, num_walls)
         for pos in wall_positions:
@@ -53,6 +74,57 @@ class BaseRoom:
             if pos in possible_placements:
                 possible_placements.remove(pos)
 
+    def layout_fingerprint(self):
+        """
+        Everything generate_layout decided, as plain data: the room's layout_attributes and
+        its grid as generated (rooms whose grid changes during play keep it as original_grid).
+        Two layouts with equal fingerprints train the same way.
+        """
+        layout = {name: getattr(self, name) for name in self.layout_attributes}
+        layout['grid'] = getattr(self, 'original_grid', self.grid)
+        return layout
+
+    def _compile_slip_tables(self):
+        """
+        Compiles slippery_probabilities into per-tile outcome tables: the actions a slip can
+        turn into, their probabilities and their cumulative probabilities. step samples slips
+        from these tables and the models the planners build read the same outcomes, so the
+        simulator and the model cannot drift apart. Call once the layout's tiles are final.
+        """
+        self.slip_actions, self.slip_probabilities, self.slip_cumulative = {}, {}, {}
+        for pos, probs in self.slippery_probabilities.items():
+            outcomes = [(action, p) for action, p in probs.items() if p > 0]
+            if not outcomes: continue
+            actions, weights = zip(*outcomes)
+            total = sum(weights)
+            cumulative = np.cumsum(weights) / total
+            cumulative[-1] = 1.0
+            self.slip_actions[pos] = actions
+            self.slip_probabilities[pos] = tuple(weight / total for weight in weights)
+            self.slip_cumulative[pos] = cumulative.tolist()
+
+    def slip_outcomes(self, pos):
+        """[(probability, action)] a slip on pos turns a move into; empty if the tile does not slip."""
+        return list(zip(self.slip_probabilities.get(pos, ()), self.slip_actions.get(pos, ())))
+
+    def _sample_slip(self, pos):
+        """The action a slip on pos turns a move into: the tile's cumulative table searched with the next pre-drawn uniform."""
+        if self._draw_index == len(self._uniform_draws):
+            self._uniform_draws = np.random.default_rng(random.getrandbits(64)).random(SLIP_DRAW_BLOCK).tolist()
+            self._draw_index = 0
+        u = self._uniform_draws[self._draw_index]
+        self._draw_index += 1
+        return self.slip_actions[pos][bisect_right(self.slip_cumulative[pos], u)]
+
+    def discard_slip_draws(self):
+        """Drops the pre-drawn uniforms, e.g. in a worker process whose random module was just reseeded."""
+        self._uniform_draws, self._draw_index = [], 0
+
+    def _random_count(self, low, high):
+        """A count for a "Random" setting. The range is given for the default grid and scales with the grid's area."""
+        scale = (self.size * self.size) / (GRID_SIZE * GRID_SIZE)
+        return random.randint(max(1, round(low * scale)), max(1, round(high * scale)))
+
     def get_valid_actions(self, state):
         """Returns a list of valid actions from a given state."""
         actions = []
@@ -63,9 +135,66 @@ class BaseRoom:
                 actions.append(action)
         return actions
 
+    def get_action_mask(self, state):
+        """The actions worth trying in a state: those that are not certain to bump into something. Rooms narrow this down."""
+        return list(self.action_space)
+
+    def _distance_field(self, targets, blocked, teleports=None):
+        """
+        Fewest moves from every cell to the nearest target, as a (size, size) float array that is
+        inf where no target can be reached. blocked is a (size, size) bool array of cells that
+        cannot be entered (targets count as reachable even if blocked); teleports maps a cell to
+        the cell the player lands on when entering it.
+        """
+        teleports = teleports or {}
+        landed_from = {}
+        for r, c in np.ndindex(blocked.shape):
+            if blocked[r, c]: continue
+            for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < self.size and 0 <= nc < self.size and not blocked[nr, nc]:
+                    landed_from.setdefault(teleports.get((nr, nc), (nr, nc)), []).append((r, c))
+                elif (nr, nc) in targets:
+                    landed_from.setdefault((nr, nc), []).append((r, c))
+
+        distances = np.full(blocked.shape, np.inf)
+        queue = deque()
+        for target in targets:
+            distances[target] = 0
+            queue.append(target)
+        while queue:
+            cell = queue.popleft()
+            for previous in landed_from.get(cell, ()):
+                if distances[previous] == np.inf:
+                    distances[previous] = distances[cell] + 1
+                    queue.append(previous)
+        return distances
+
+    def estimated_moves_to_go(self, state):
+        """
+        Estimated number of moves left to finish from a state, read off the room's distance maps.
+        Drives potential-based reward shaping; rooms without distance maps return None.
+        """
+        return None
+
     def reset_state(self):
         pass
 
+    def get_start_state(self, settings=None):
+        """The state every episode and every run starts from."""
+        return self.start_pos
+
+    def num_encoded_states(self):
+        """Number of distinct integers encode_state can return."""
+        return self.size * self.size
+
+    def encode_state(self, state):
+        """Maps a state tuple to a unique integer in [0, num_encoded_states())."""
+        return state[0] * self.size + state[1]
+
+    def decode_state(self, index):
+        return divmod(index, self.size)
+
     def get_state_type(self, state_pos):
         return self.grid[state_pos]
 
@@ -73,7 +202,9 @@ class BaseRoom:
         raise NotImplementedError
 
     def get_editor_options(self):
-        return {}
+        return {
+            "Grid Size": {"type": "dropdown", "options": GRID_SIZE_OPTIONS, "default": str(GRID_SIZE)},
+        }
         
     def step(self, state, action):
         """A simple step function for model-free agents."""
@@ -0,0 +1,275 @@
+import numpy as np
+
+from constants import WALL
+from room1_dp_env import FirstEscapeRoom
+from room2_sarsa_env import SecondEscapeRoom, CAUGHT_BEFORE_PATROL
+
+NO_POS = -1  # Row and column of a position the layout does not have
+
+
+def _positions(rooms, attribute):
+    """(M, 2) int array of a position attribute of each room, NO_POS where it is None."""
+    return np.array([getattr(room, attribute) or (NO_POS, NO_POS) for room in rooms], dtype=np.int64)
+
+
+def _slip_tables(rooms, actions):
+    """
+    (M, size, size, A) cumulative slip probabilities over the action codes and an (M, size, size)
+    mask of the tiles that slip, from the rooms' compiled slip tables. A slipping move is the
+    first action whose cumulative probability exceeds a uniform draw. A room that appears more
+    than once, as when one layout is rolled out many times, is compiled once.
+    """
+    size = rooms[0].size
+    distinct = {id(room): room for room in rooms}
+    probabilities = np.zeros((len(distinct), size, size, len(actions)))
+    for m, room in enumerate(distinct.values()):
+        for (r, c), slip_actions in room.slip_actions.items():
+            for prob, action in room.slip_outcomes((r, c)):
+                probabilities[m, r, c, actions.index(action)] = prob
+    slippery = probabilities.sum(axis=3) > 0
+    cumulative = np.cumsum(probabilities, axis=3)
+    cumulative[slippery] /= cumulative[slippery][:, -1:]
+    rows = {key: m for m, key in enumerate(distinct)}
+    which = [rows[id(room)] for room in rooms]
+    return cumulative[which], slippery[which]
+
+
+class BatchedRooms:
+    """
+    M layouts of one room stepped together. The layouts are stacked into (M, size, size)
+    arrays and every step moves all M players at once with NumPy. The rules are the room's
+    own step, written over arrays. States are (M, k) int arrays in the room's tuple order.
+    An episode that ends, or reaches max_steps, is recorded in the per-layout statistics
+    and its layout restarts on the same call, so every row always holds a live episode.
+    Subclasses fill in the room's start state and transition.
+    """
+    room_class = None
+
+    def __init__(self, rooms, max_steps=200, seed=None):
+        if not rooms:
+            raise ValueError("A batch needs at least one layout.")
+        if any(type(room) is not self.room_class for room in rooms):
+            raise ValueError(f"Every layout must be a {self.room_class.__name__}.")
+        if len({room.size for room in rooms}) > 1:
+            raise ValueError("Every layout in a batch must have the same size.")
+        self.rooms = list(rooms)
+        self.count = len(rooms)
+        self.size = rooms[0].size
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self.actions = list(rooms[0].action_space)
+        self.deltas = np.array([rooms[0].action_space[action] for action in self.actions], dtype=np.int64)
+        self.walls = np.stack([room.original_grid == WALL if hasattr(room, 'original_grid') else room.grid == WALL for room in rooms])
+        self.slip_cumulative, self.slippery = _slip_tables(rooms, self.actions)
+        self.layout_index = np.arange(self.count)
+
+        self.episodes = np.zeros(self.count, dtype=np.int64)
+        self.successes = np.zeros(self.count, dtype=np.int64)
+        self.return_sums = np.zeros(self.count)
+        self.step_sums = np.zeros(self.count, dtype=np.int64)
+        self.reset()
+
+    @classmethod
+    def generate(cls, count, settings=None, size=10, max_steps=200, seed=None):
+        """Generates `count` fresh layouts of the room with the given editor settings and batches them."""
+        rooms = []
+        for _ in range(count):
+            room = cls.room_class(size)
+            room.generate_layout(settings or {})
+            rooms.append(room)
+        return cls(rooms, max_steps, seed)
+
+    def reset(self, which=None):
+        """Restarts the episodes of the layouts selected by the boolean mask `which` (all of them by default)."""
+        which = np.ones(self.count, dtype=bool) if which is None else which
+        if not hasattr(self, 'states'):
+            self.states = np.zeros((self.count, len(self._start_state())), dtype=np.int64)
+            self.episode_returns = np.zeros(self.count)
+            self.episode_steps = np.zeros(self.count, dtype=np.int64)
+        self.states[which] = self._start_state()
+        self.episode_returns[which] = 0.0
+        self.episode_steps[which] = 0
+        self._reset_extra(which)
+        return self.states
+
+    def _start_state(self):
+        raise NotImplementedError
+
+    def encoded_states(self):
+        """The current states as the room's encode_state indices, one per layout."""
+        raise NotImplementedError
+
+    def _reset_extra(self, which):
+        """Resets per-layout state that is not part of the agent's state, such as the enemy's patrol."""
+
+    def _moves(self, actions):
+        """Applies slips and walls: (rows, cols) the players land on and whether each move bumped."""
+        r, c = self.states[:, 0], self.states[:, 1]
+        actions = np.asarray(actions, dtype=np.int64)
+        on_ice = self.slippery[self.layout_index, r, c]
+        if on_ice.any():
+            draws = self.rng.random(self.count)
+            slipped = (draws[:, None] >= self.slip_cumulative[self.layout_index, r, c]).sum(axis=1)
+            actions = np.where(on_ice, np.minimum(slipped, len(self.actions) - 1), actions)
+        nr, nc = r + self.deltas[actions, 0], c + self.deltas[actions, 1]
+        inside = (nr >= 0) & (nr < self.size) & (nc >= 0) & (nc < self.size)
+        blocked = ~inside
+        blocked[inside] = self._blocked(nr[inside], nc[inside], inside)
+        return np.where(blocked, r, nr), np.where(blocked, c, nc), blocked
+
+    def _blocked(self, rows, cols, which):
+        return self.walls[self.layout_index[which], rows, cols]
+
+    def _transition(self, actions):
+        """(next_states, rewards, done, success) for every layout; must not modify self.states."""
+        raise NotImplementedError
+
+    def step(self, actions):
+        """
+        Steps every layout with one action code each (indices into the room's action_space).
+        Returns (states, rewards, done, truncated); rows that finished are already restarted,
+        so `states` holds the first state of their next episode.
+        """
+        next_states, rewards, done, success = self._transition(actions)
+        self.states = next_states
+        self.episode_returns += rewards
+        self.episode_steps += 1
+        truncated = ~done & (self.episode_steps >= self.max_steps)
+        finished = done | truncated
+        if finished.any():
+            self.episodes += finished
+            self.successes += success & done
+            self.return_sums += np.where(finished, self.episode_returns, 0.0)
+            self.step_sums += np.where(finished, self.episode_steps, 0)
+            self.reset(finished)
+        return self.states, rewards, done, truncated
+
+    def state_tuples(self):
+        """The current states as the tuples the room's agents use, one per layout."""
+        return [tuple(state) for state in self.states.tolist()]
+
+    def summary(self):
+        """
+        Statistics of the finished episodes: per-layout arrays ('episodes', 'success_rate',
+        'mean_return', 'mean_steps') and their means over the layouts that finished any episode.
+        """
+        episodes = np.maximum(self.episodes, 1)
+        per_layout = {
+            'episodes': self.episodes.copy(),
+            'success_rate': self.successes / episodes,
+            'mean_return': self.return_sums / episodes,
+            'mean_steps': self.step_sums / episodes,
+        }
+        played = self.episodes > 0
+        overall = {name: float(values[played].mean()) if played.any() else 0.0
+                   for name, values in per_layout.items() if name != 'episodes'}
+        overall['episodes'] = int(self.episodes.sum())
+        return {'layouts': per_layout, 'overall': overall}
+
+
+class BatchedFirstEscapeRoom(BatchedRooms):
+    """Room 1 over M layouts: states are (r, c, has_bag, has_rope); the player starts without items."""
+    room_class = FirstEscapeRoom
+
+    def __init__(self, rooms, max_steps=200, seed=None):
+        self.bag = _positions(rooms, 'bag_pos')
+        self.rope = _positions(rooms, 'rope_pos')
+        self.exit = np.array(rooms[0].exit_pos)
+        super().__init__(rooms, max_steps, seed)
+
+    def _start_state(self):
+        return (*self.rooms[0].start_pos, 0, 0)
+
+    def encoded_states(self):
+        r, c, has_bag, has_rope = self.states.T
+        return ((r * self.size + c) * 2 + has_bag) * 2 + has_rope
+
+    def _transition(self, actions):
+        has_bag, has_rope = self.states[:, 2], self.states[:, 3]
+        r, c, bumped = self._moves(actions)
+        rewards = np.where(bumped, -10.0, 0.0)
+
+        at_bag = (r == self.bag[:, 0]) & (c == self.bag[:, 1]) & (has_bag == 0)
+        at_rope = ~at_bag & (r == self.rope[:, 0]) & (c == self.rope[:, 1]) & (has_rope == 0)
+        rewards += np.where(at_bag, 20.0, 0.0)
+        rewards += np.where(at_rope, np.where(has_bag == 1, 30.0, -10.0), 0.0)
+        next_bag = has_bag | at_bag
+        next_rope = has_rope | at_rope
+
+        done = (r == self.exit[0]) & (c == self.exit[1])
+        success = done & (next_bag == 1) & (next_rope == 1)
+        rewards += np.where(done, np.where(success, 100.0, -20.0), 0.0)
+        return np.stack([r, c, next_bag, next_rope], axis=1), rewards, done, success
+
+
+class BatchedSecondEscapeRoom(BatchedRooms):
+    """
+    Room 2 over M layouts: states are (r, c, has_key). The patrol route depends only on the
+    grid size, so all layouts share it and its (patrol_index, r, c) collision table; each
+    layout keeps its own patrol index, which restarts with its episodes. The door is a wall
+    until the layout's player holds the key.
+    """
+    room_class = SecondEscapeRoom
+
+    def __init__(self, rooms, max_steps=200, seed=None):
+        self.key = _positions(rooms, 'key_pos')
+        self.door = _positions(rooms, 'door_pos')
+        self.portal_in = _positions(rooms, 'portal_in_pos')
+        self.portal_out = _positions(rooms, 'portal_out_pos')
+        self.has_portal = (self.portal_in[:, 0] != NO_POS) & (self.portal_out[:, 0] != NO_POS)
+        self.exit = np.array(rooms[0].exit_pos)
+        self.route = np.array(rooms[0].patrol_route or [rooms[0].enemy_pos], dtype=np.int64)
+        self.collisions = rooms[0].collision_table
+        self.patrol_index = np.zeros(len(rooms), dtype=np.int64)
+        super().__init__(rooms, max_steps, seed)
+
+    def _start_state(self):
+        return (*self.rooms[0].start_pos, 0)
+
+    def encoded_states(self):
+        r, c, has_key = self.states.T
+        return (r * self.size + c) * 2 + has_key
+
+    def _reset_extra(self, which):
+        self.patrol_index[which] = 0
+
+    @property
+    def enemy_positions(self):
+        """(M, 2) positions of the enemy in each layout."""
+        return self.route[self.patrol_index]
+
+    def _blocked(self, rows, cols, which):
+        open_door = (self.states[which, 2] == 1) & (rows == self.door[which, 0]) & (cols == self.door[which, 1])
+        return super()._blocked(rows, cols, which) & ~open_door
+
+    def _transition(self, actions):
+        has_key = self.states[:, 2]
+        r, c, bumped = self._moves(actions)
+        rewards = np.where(bumped, -5.0, 0.0)
+
+        collision = self.collisions[self.patrol_index, r, c]
+        caught = collision > 0
+        self.patrol_index = np.where(collision == CAUGHT_BEFORE_PATROL, self.patrol_index, (self.patrol_index + 1) % len(self.route))
+
+        teleported = ~caught & self.has_portal & (r == self.portal_in[:, 0]) & (c == self.portal_in[:, 1])
+        r = np.where(teleported, self.portal_out[:, 0], r)
+        c = np.where(teleported, self.portal_out[:, 1], c)
+        rewards += np.where(teleported, 5.0, 0.0)
+
+        got_key = ~caught & (has_key == 0) & (r == self.key[:, 0]) & (c == self.key[:, 1])
+        rewards += np.where(got_key, 50.0, 0.0)
+        escaped = ~caught & (r == self.exit[0]) & (c == self.exit[1])
+        rewards += np.where(escaped, 100.0, 0.0)
+        rewards = np.where(caught, -100.0, rewards)
+        return np.stack([r, c, has_key | got_key], axis=1), rewards, caught | escaped, escaped
+
+
+BATCHED_ROOMS = {FirstEscapeRoom: BatchedFirstEscapeRoom, SecondEscapeRoom: BatchedSecondEscapeRoom}
+
+
+def batch_rooms(rooms, max_steps=200, seed=None):
+    """Batches layouts of Room 1 or Room 2 with the matching BatchedRooms class."""
+    batched_class = BATCHED_ROOMS.get(type(rooms[0])) if rooms else None
+    if batched_class is None:
+        raise ValueError("Batched stepping is available for Rooms 1 and 2.")
+    return batched_class(rooms, max_steps, seed)
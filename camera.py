@@ -0,0 +1,84 @@
+import pygame
+from constants import CELL_SIZE, MIN_CELL_SIZE, MAX_CELL_SIZE
+
+
+class Camera:
+    """
+    Maps grid cells to screen pixels inside the grid viewport. Supports scrolling and
+    zooming so grids larger than the viewport can be explored, and reports which cells
+    are visible so draw routines only touch those.
+    """
+    def __init__(self, viewport):
+        self.viewport = pygame.Rect(viewport)
+        self.grid_size = 1
+        self.cell_size = CELL_SIZE
+        self.offset_x = 0
+        self.offset_y = 0
+
+    def set_grid(self, grid_size):
+        """Resets the view for a new grid, zoomed so the whole grid fits when possible."""
+        self.grid_size = grid_size
+        self.cell_size = max(MIN_CELL_SIZE, min(CELL_SIZE, self.viewport.width // grid_size))
+        self.offset_x = self.offset_y = 0
+        self._clamp()
+
+    def _clamp(self):
+        world = self.grid_size * self.cell_size
+        self.offset_x = max(0, min(self.offset_x, world - self.viewport.width)) if world > self.viewport.width else (world - self.viewport.width) // 2
+        self.offset_y = max(0, min(self.offset_y, world - self.viewport.height)) if world > self.viewport.height else (world - self.viewport.height) // 2
+
+    def pan(self, dx, dy):
+        self.offset_x += dx
+        self.offset_y += dy
+        self._clamp()
+
+    def zoom(self, factor, anchor=None):
+        """Scales the cell size, keeping the grid point under the anchor (a screen position) in place."""
+        anchor = anchor or self.viewport.center
+        new_size = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, int(round(self.cell_size * factor))))
+        if new_size == self.cell_size and factor != 1:
+            new_size = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, self.cell_size + (1 if factor > 1 else -1)))
+        world_x = (anchor[0] - self.viewport.x + self.offset_x) / self.cell_size
+        world_y = (anchor[1] - self.viewport.y + self.offset_y) / self.cell_size
+        self.cell_size = new_size
+        self.offset_x = int(world_x * new_size - (anchor[0] - self.viewport.x))
+        self.offset_y = int(world_y * new_size - (anchor[1] - self.viewport.y))
+        self._clamp()
+
+    def ensure_visible(self, r, c, margin=1):
+        """Scrolls just enough to keep a cell (plus a margin of cells) inside the viewport."""
+        left, top = (c - margin) * self.cell_size, (r - margin) * self.cell_size
+        right, bottom = (c + 1 + margin) * self.cell_size, (r + 1 + margin) * self.cell_size
+        if left < self.offset_x: self.offset_x = left
+        elif right > self.offset_x + self.viewport.width: self.offset_x = right - self.viewport.width
+        if top < self.offset_y: self.offset_y = top
+        elif bottom > self.offset_y + self.viewport.height: self.offset_y = bottom - self.viewport.height
+        self._clamp()
+
+    def visible_cells(self):
+        """Yields (r, c) for every cell at least partly inside the viewport."""
+        first_r, last_r, first_c, last_c = self.visible_bounds()
+        for r in range(first_r, last_r):
+            for c in range(first_c, last_c):
+                yield r, c
+
+    def visible_bounds(self):
+        """Returns (first_row, end_row, first_col, end_col) of the visible cells, end exclusive."""
+        first_c = max(0, self.offset_x // self.cell_size)
+        first_r = max(0, self.offset_y // self.cell_size)
+        last_c = min(self.grid_size, (self.offset_x + self.viewport.width) // self.cell_size + 1)
+        last_r = min(self.grid_size, (self.offset_y + self.viewport.height) // self.cell_size + 1)
+        return first_r, last_r, first_c, last_c
+
+    def is_visible(self, r, c):
+        first_r, last_r, first_c, last_c = self.visible_bounds()
+        return first_r <= r < last_r and first_c <= c < last_c
+
+    def cell_rect(self, r, c):
+        return pygame.Rect(self.viewport.x + c * self.cell_size - self.offset_x,
+                           self.viewport.y + r * self.cell_size - self.offset_y,
+                           self.cell_size, self.cell_size)
+
+    def cell_center(self, r, c):
+        return (self.viewport.x + c * self.cell_size - self.offset_x + self.cell_size / 2,
+                self.viewport.y + r * self.cell_size - self.offset_y + self.cell_size / 2)
@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from room1_dp_env import FirstEscapeRoom
+from room2_sarsa_env import SecondEscapeRoom
+from room3_qlearning_env import ThirdEscapeRoom
+from room1_items_env import ItemsEscapeRoom
+from agent_sarsa import SarsaAgent
+from agent_qlearning import QLearningAgent
+from policy_evaluation import evaluate_agent
+
+ROOMS = {'1': FirstEscapeRoom, '2': SecondEscapeRoom, '3': ThirdEscapeRoom, '1+': ItemsEscapeRoom}
+AGENTS = {'SARSA': SarsaAgent, 'Q-Learning': QLearningAgent}
+
+# Every trial trains in its own process, so the agents' own parallel modes stay off
+TRIAL_SETTINGS = {'Parallel Workers': '1', 'Shared Q-Table': 'Off', 'Evaluate Every': '0'}
+
+EVALUATION_ROLLOUTS = 200  # Greedy rollouts of each trained policy
+BOOTSTRAP_RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+
+def trial_settings(room_class, agent_class, overrides):
+    """Editor defaults of the room and the agent, then the comparison's overrides, then TRIAL_SETTINGS."""
+    options = {**room_class().get_editor_options(), **agent_class.get_editor_options()}
+    settings = {name: details['default'] for name, details in options.items()}
+    return {**settings, **overrides, **TRIAL_SETTINGS}
+
+
+def run_trial(room_name, agent_name, layout, seed, overrides):
+    """
+    Trains one agent on one layout with one seed and returns its learning curve and a
+    greedy evaluation. The layout is generated from its own seed, so every agent and
+    every training seed sees the same L layouts of a room.
+    """
+    room_class, agent_class = ROOMS[room_name], AGENTS[agent_name]
+    settings = trial_settings(room_class, agent_class, overrides)
+    random.seed(f"layout-{room_name}-{layout}")
+    env = room_class()
+    env.generate_layout(settings)
+    random.seed(f"train-{room_name}-{layout}-{seed}")
+
+    started = time.perf_counter()
+    agent = agent_class(env, settings)
+    for _ in range(agent.max_episodes):
+        agent.train_step()
+        if agent.convergence.converged:
+            break
+    seconds = time.perf_counter() - started
+    evaluation = evaluate_agent(agent, EVALUATION_ROLLOUTS, seed=seed)
+    successes = np.array(agent.convergence.successes, dtype=bool)
+    return {
+        'room': room_name, 'agent': agent_name, 'layout': layout, 'seed': seed,
+        'rewards': np.array(agent.episode_rewards, dtype=np.float32),
+        'steps': np.array(agent.episode_steps, dtype=np.int32),
+        'successes': successes,
+        'first_success': int(np.argmax(successes)) + 1 if successes.any() else -1,
+        'seconds': seconds,
+        'eval_success_rate': evaluation['success_rate'],
+        'eval_mean_return': evaluation['mean_return'],
+    }
+
+
+def run_comparison(agents, rooms, seeds, layouts, overrides=None, workers=None):
+    """Runs every (room, agent, layout, seed) trial over a process pool. Returns the trials in submission order."""
+    jobs = [(room, agent, layout, seed, dict(overrides or {}))
+            for room in rooms for agent in agents for layout in range(layouts) for seed in range(seeds)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(run_trial, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def results_columns(trials):
+    """
+    The trials as two column tables: per-episode columns (room, agent, layout, seed, episode,
+    reward, steps, success) and per-trial columns prefixed with 'trial_'.
+    """
+    lengths = [len(trial['rewards']) for trial in trials]
+    columns = {
+        name: np.repeat([trial[name] for trial in trials], lengths)
+        for name in ('room', 'agent', 'layout', 'seed')
+    }
+    columns['episode'] = np.concatenate([np.arange(1, length + 1, dtype=np.int32) for length in lengths])
+    columns['reward'] = np.concatenate([trial['rewards'] for trial in trials])
+    columns['steps'] = np.concatenate([trial['steps'] for trial in trials])
+    columns['success'] = np.concatenate([trial['successes'] for trial in trials])
+    for name in ('room', 'agent', 'layout', 'seed', 'first_success', 'seconds', 'eval_success_rate', 'eval_mean_return'):
+        columns[f'trial_{name}'] = np.array([trial[name] for trial in trials])
+    columns['trial_episodes'] = np.array(lengths)
+    return columns
+
+
+def save_results(trials, path):
+    """Writes results_columns to a compressed .npz file, one array per column."""
+    np.savez_compressed(path, **results_columns(trials))
+
+
+def bootstrap_interval(values, rng, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE):
+    """Mean of the values and a percentile bootstrap confidence interval for it."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return float(values.mean()), float(values.mean()), float(values.mean())
+    means = rng.choice(values, size=(resamples, len(values))).mean(axis=1)
+    tail = 100 * (1 - confidence) / 2
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return float(values.mean()), float(low), float(high)
+
+
+def summarize(trials, final_fraction=0.1, seed=0):
+    """
+    Per (room, agent) statistics over its trials, each a (mean, low, high) bootstrap interval:
+    the mean reward over the last `final_fraction` of training, the greedy evaluation's success
+    rate and return, and the episodes to the first successful episode (trials without one count
+    as their full length). With several agents, each also gets its paired difference in final
+    reward from the first agent, over the same layouts and seeds.
+    """
+    rng = np.random.default_rng(seed)
+    by_key = {}
+    for trial in trials:
+        by_key.setdefault((trial['room'], trial['agent']), {})[(trial['layout'], trial['seed'])] = trial
+
+    def final_reward(trial):
+        tail = max(1, int(len(trial['rewards']) * final_fraction))
+        return float(trial['rewards'][-tail:].mean())
+
+    summary = {}
+    for (room, agent), runs in by_key.items():
+        runs_list = list(runs.values())
+        stats = {
+            'trials': len(runs_list),
+            'final_reward': bootstrap_interval([final_reward(run) for run in runs_list], rng),
+            'eval_success_rate': bootstrap_interval([run['eval_success_rate'] for run in runs_list], rng),
+            'eval_mean_return': bootstrap_interval([run['eval_mean_return'] for run in runs_list], rng),
+            'first_success': bootstrap_interval([run['first_success'] if run['first_success'] > 0 else len(run['rewards'])
+                                                 for run in runs_list], rng),
+        }
+        baseline_agent = next(a for r, a in by_key if r == room)
+        if agent != baseline_agent:
+            baseline = by_key[(room, baseline_agent)]
+            paired = [final_reward(run) - final_reward(baseline[key]) for key, run in runs.items() if key in baseline]
+            if paired:
+                stats['final_reward_vs_' + baseline_agent] = bootstrap_interval(paired, rng)
+        summary[(room, agent)] = stats
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"Mean [{CONFIDENCE:.0%} bootstrap interval] over layouts x seeds"]
+    for (room, agent), stats in summary.items():
+        lines.append(f"Room {room}, {agent} ({stats['trials']} trials)")
+        for name, value in stats.items():
+            if name == 'trials': continue
+            mean, low, high = value
+            lines.append(f"  {name:<28} {mean:10.3f}  [{low:.3f}, {high:.3f}]")
+    return "\n".join(lines)
+
+
+def _parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition('=')
+        overrides[name.strip()] = value.strip()
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trains agents head to head across rooms, layouts and seeds.")
+    parser.add_argument('--agents', nargs='+', default=list(AGENTS), choices=list(AGENTS))
+    parser.add_argument('--rooms', nargs='+', default=['2'], choices=list(ROOMS))
+    parser.add_argument('--seeds', type=int, default=5, help="Training seeds per layout (K)")
+    parser.add_argument('--layouts', type=int, default=3, help="Layouts per room (L)")
+    parser.add_argument('--set', dest='overrides', action='append', metavar='NAME=VALUE',
+                        help="Overrides an editor setting for every trial, e.g. --set 'Max Episodes=3000'")
+    parser.add_argument('--workers', type=int, default=None, help="Processes to run trials in (default: one per core)")
+    parser.add_argument('--output', default='comparison_results.npz')
+    args = parser.parse_args()
+
+    trials = run_comparison(args.agents, args.rooms, args.seeds, args.layouts, _parse_overrides(args.overrides), args.workers)
+    save_results(trials, args.output)
+    print(format_summary(summarize(trials)))
+    print(f"Learning curves of {len(trials)} trials written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import pygame
 
 # Grid and Window Dimensions
-GRID_SIZE = 10
-CELL_SIZE = 70
+GRID_SIZE = 10 # Default grid size; each room can be resized from its editor
+GRID_SIZE_OPTIONS = [10, 15, 20, 25, 30, 40, 50, 75, 100]
+CELL_SIZE = 70 # Cell size at 100% zoom
+MIN_CELL_SIZE = 8
+MAX_CELL_SIZE = 140
+MIN_LABEL_CELL_SIZE = 40 # Cells drawn smaller than this skip their text overlays
 GRID_WIDTH = GRID_SIZE * CELL_SIZE
 CONSOLE_WIDTH = 675
 BOTTOM_PANEL_HEIGHT = 100
@@ -10,6 +14,24 @@ WINDOW_WIDTH = GRID_WIDTH + CONSOLE_WIDTH
 WINDOW_HEIGHT = GRID_WIDTH + BOTTOM_PANEL_HEIGHT
 FPS = 60
 
+# Train every room's agent in worker processes at startup and after each map generation
+BACKGROUND_TRAINING = False
+
+# Time hot-path phases and show the profiler overlay from startup (F3 toggles it at runtime)
+PROFILING = False
+
+# While Hogwild workers train on a shared Q-table, the greedy policy is re-extracted this often (ms)
+LIVE_POLICY_REFRESH_MS = 1000
+
+# Greedy rollouts behind the policy evaluation logged after training
+EVALUATION_ROLLOUTS = 100
+
+# Size limit of the on-disk cache of trained results (result_cache.py); 0 turns the cache off
+RESULT_CACHE_MB = 256
+
+# Oldest console lines are dropped beyond this many
+MAX_CONSOLE_LOGS = 2000
+
 # Colors
 COLORS = {
     'WHITE': (255, 255, 255), 'BLACK': (0, 0, 0), 'GRAY': (200, 200, 200),
@@ -23,5 +45,5 @@ COLORS = {
 }
 
 # Tile Types
-EMPTY, WALL, START, EXIT, SLIPPERY, BAG, ROPE, IRON_KEY, REWARD_TILE, HINT_TILE, PORTAL, ENEMY, LOCKED_DOOR, PLANK, POTHOLE, BRIDGE, SILVER_KEY, GOLDEN_KEY = 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 15, 16, 17, 18
+EMPTY, WALL, START, EXIT, SLIPPERY, BAG, ROPE, IRON_KEY, REWARD_TILE, HINT_TILE, PORTAL, ENEMY, LOCKED_DOOR, PLANK, POTHOLE, BRIDGE, SILVER_KEY, GOLDEN_KEY, ITEM = 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 15, 16, 17, 18, 19
 
@@ -0,0 +1,99 @@
+from operator import sub
+
+SUCCESS_RATE_TOLERANCE = 0.05  # How far the rolling success rate may move between windows and still count as stable
+
+
+class ConvergenceMonitor:
+    """
+    Tracks whether an episodic agent is still learning. At the end of every episode it
+    reads the Q-values of the states the episode visited and compares them with the values
+    it saw the last time it looked at each state. The largest difference is the episode's
+    max |dQ| and the states whose greedy action moved are its policy changes. Both come from
+    the table itself, so updates made by traces, replay, planning or other processes count
+    too. An episode is a success when it ends on a positive reward (reaching the exit).
+
+    With early stopping on, `converged` is set, and `stopped_at` records the episode, once a
+    full window of episodes has no policy changes, a mean max |dQ| within the tolerance and
+    a success rate within SUCCESS_RATE_TOLERANCE of the window before. The mean rather than
+    the largest: exploring keeps turning up rarely visited states whose values still move,
+    long after the greedy policy has settled.
+    """
+    def __init__(self, window=500, tolerance=0.5, early_stopping=False):
+        self.window = max(1, int(window))
+        self.tolerance = tolerance
+        self.early_stopping = early_stopping
+        self.seen = {}  # state -> (values, greedy action index) when the monitor last looked
+        self.max_q_deltas = []
+        self.policy_changes = []
+        self.successes = []
+        self.delta_totals = [0.0]  # Running sums, so window statistics cost the same at any episode
+        self.success_totals = [0]
+        self.last_change = 0  # Number of episodes played when the greedy policy last changed
+        self.converged = False
+        self.stopped_at = None
+
+    def on_episode_end(self, agent, states, success):
+        """Records one finished episode given the states it visited and whether it reached the exit."""
+        max_delta, changes = 0.0, 0
+        seen, get = self.seen, agent.q_table.get
+        for state in set(states):
+            q_values = get(state)
+            if not q_values:
+                continue
+            values = tuple(q_values.values())
+            previous = seen.get(state)
+            if previous is None:
+                delta = max(map(abs, values))
+            elif values == previous[0]:
+                continue
+            else:
+                delta = max(map(abs, map(sub, values, previous[0])))
+            greedy = values.index(max(values))
+            if delta > max_delta:
+                max_delta = delta
+            if previous is not None and greedy != previous[1]:
+                changes += 1
+            seen[state] = (values, greedy)
+        self.max_q_deltas.append(max_delta)
+        self.policy_changes.append(changes)
+        self.successes.append(bool(success))
+        self.delta_totals.append(self.delta_totals[-1] + max_delta)
+        self.success_totals.append(self.success_totals[-1] + bool(success))
+        if changes:
+            self.last_change = len(self.successes)
+        if self.early_stopping and not self.converged and self._is_stable():
+            self.converged = True
+            self.stopped_at = agent.training_episode_count
+
+    def _window_rate(self, totals, end, episodes):
+        return (totals[end] - totals[end - episodes]) / episodes if episodes else 0.0
+
+    def success_rate(self, episodes=None):
+        """Share of the last `episodes` episodes (the window by default) that reached the exit."""
+        episodes = min(episodes or self.window, len(self.successes))
+        return self._window_rate(self.success_totals, len(self.successes), episodes)
+
+    def mean_max_q_delta(self, episodes=None):
+        """Mean of the max |dQ| of the last `episodes` episodes (the window by default)."""
+        episodes = min(episodes or self.window, len(self.max_q_deltas))
+        return self._window_rate(self.delta_totals, len(self.max_q_deltas), episodes)
+
+    def _is_stable(self):
+        played, window = len(self.successes), self.window
+        if played < 2 * window or played - self.last_change < window:
+            return False
+        if self.mean_max_q_delta() > self.tolerance:
+            return False
+        earlier = self._window_rate(self.success_totals, played - window, window)
+        return abs(self.success_rate() - earlier) <= SUCCESS_RATE_TOLERANCE
+
+    def summary(self):
+        """The latest window's largest and mean max |dQ|, total policy changes and success rate."""
+        return {
+            'episodes': len(self.max_q_deltas),
+            'max_q_delta': max(self.max_q_deltas[-self.window:], default=0.0),
+            'mean_max_q_delta': self.mean_max_q_delta(),
+            'policy_changes': sum(self.policy_changes[-self.window:]),
+            'success_rate': self.success_rate(),
+            'stopped_at': self.stopped_at,
+        }
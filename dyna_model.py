@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class TransitionModel:
+    """
+    The learned model for Dyna-Q: the last observed outcome of each (state, action),
+    in fixed-capacity slots. Actions, rewards, done flags and the Q-table rows of both
+    states live in NumPy arrays, so a sample of slots indexes the value array directly
+    (as ReplayBuffer does); the states are references to the tuples the Q-table already
+    holds. When the model is full the oldest slot is overwritten. With `with_predecessors`
+    it keeps, for each state, the slots that lead into it so prioritized planning can walk
+    back to predecessors. When the agent masks actions, the allowed actions of each next
+    state are kept too.
+    """
+    def __init__(self, actions, capacity=100000, with_masks=False, with_predecessors=True):
+        self.actions = list(actions)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self.capacity = max(1, int(capacity))
+        self.slots = {}
+        self.predecessors = {} if with_predecessors else None
+        self.states = [None] * self.capacity
+        self.next_states = [None] * self.capacity
+        self.action_codes = np.zeros(self.capacity, dtype=np.int8)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.done = np.zeros(self.capacity, dtype=bool)
+        self.rows = np.zeros(self.capacity, dtype=np.int64)
+        self.next_rows = np.zeros(self.capacity, dtype=np.int64)
+        self.next_masks = np.ones((self.capacity, len(self.actions)), dtype=bool) if with_masks else None
+        self.size = 0
+        self._next_slot = 0
+
+    def __len__(self):
+        return self.size
+
+    def _unlink(self, slot):
+        """Drops the slot from the predecessors of the state it leads to."""
+        if self.predecessors is None:
+            return
+        leads_here = self.predecessors[self.next_states[slot]]
+        leads_here.discard(slot)
+        if not leads_here:
+            del self.predecessors[self.next_states[slot]]
+
+    def record(self, state, action, reward, next_state, done, row, next_row, next_mask=None):
+        """Stores an observed transition and its Q-table rows, replacing any earlier outcome of the pair. Returns its slot."""
+        code = self.action_index[action]
+        slot = self.slots.get((state, code))
+        if slot is None:
+            slot = self._next_slot
+            if self.size == self.capacity:
+                self._unlink(slot)
+                del self.slots[(self.states[slot], int(self.action_codes[slot]))]
+            else:
+                self.size += 1
+            self._next_slot = (self._next_slot + 1) % self.capacity
+            self.slots[(state, code)] = slot
+        else:
+            self._unlink(slot)
+        self.states[slot] = state
+        self.next_states[slot] = next_state
+        self.action_codes[slot] = code
+        self.rewards[slot] = reward
+        self.done[slot] = done
+        self.rows[slot] = row
+        self.next_rows[slot] = next_row
+        if self.next_masks is not None:
+            self.next_masks[slot] = next_mask
+        if self.predecessors is not None:
+            self.predecessors.setdefault(next_state, set()).add(slot)
+        return slot
+
+    def transition(self, slot):
+        """(state, action, reward, next_state, done) stored in a slot."""
+        return (self.states[slot], self.actions[self.action_codes[slot]], float(self.rewards[slot]),
+                self.next_states[slot], bool(self.done[slot]))
+
+    def sample(self, batch_size, rng):
+        """A uniform sample of slots (with replacement) as (rows, actions, rewards, next_rows, done, next_masks)."""
+        picks = rng.integers(0, self.size, size=batch_size)
+        masks = None if self.next_masks is None else self.next_masks[picks]
+        return self.rows[picks], self.action_codes[picks], self.rewards[picks], self.next_rows[picks], self.done[picks], masks
+
+    def slots_leading_to(self, state):
+        return self.predecessors.get(state, ())
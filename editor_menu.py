@@ -1,6 +1,12 @@
 import pygame
 from ui_components import Dropdown, InputBox
 
+PANEL_WIDTH = 600
+PANEL_MARGIN = 20  # Space kept between the panel and the window edges
+HEADER_HEIGHT = 50
+ROW_HEIGHT = 60
+FOOTER_HEIGHT = 100  # Room for the Save and Cancel buttons
+
 class EditorMenu:
     """
     A self-contained class to handle the entire "Edit Map" menu logic.
@@ -18,7 +24,9 @@ class EditorMenu:
 
         self.window_width, self.window_height = screen.get_size()
         self.editor_components = {}
+        self.scroll_row = 0  # Index of the first setting shown
         self._setup_ui()
+        self._layout()
 
     def _setup_ui(self):
         """Creates the UI components (dropdowns, input boxes) based on the provided options."""
@@ -36,6 +44,38 @@ class EditorMenu:
             else: # Dropdown
                 self.editor_components[key] = Dropdown(comp_rect, details["options"], self.editor_font, self.colors, selected_option=str(default_value))
 
+    def _layout(self):
+        """
+        Fits the panel in the window. When the settings do not all fit, it shows as many rows
+        as it can from scroll_row on; the mouse wheel and Page Up/Down scroll them, and Save
+        and Cancel stay pinned to the bottom of the panel.
+        """
+        rows = len(self.editor_components)
+        max_rows = max(1, (self.window_height - 2 * PANEL_MARGIN - HEADER_HEIGHT - FOOTER_HEIGHT) // ROW_HEIGHT)
+        self.visible_rows = min(rows, max_rows)
+        self.scroll_row = max(0, min(self.scroll_row, rows - self.visible_rows))
+        panel_height = HEADER_HEIGHT + self.visible_rows * ROW_HEIGHT + FOOTER_HEIGHT
+        self.editor_rect = pygame.Rect((self.window_width - PANEL_WIDTH) // 2, (self.window_height - panel_height) // 2, PANEL_WIDTH, panel_height)
+
+        y_offset = self.editor_rect.top + HEADER_HEIGHT
+        for index, comp in enumerate(self.editor_components.values()):
+            if self.scroll_row <= index < self.scroll_row + self.visible_rows:
+                comp.rect.topleft = (self.editor_rect.x + 280, y_offset)
+                y_offset += ROW_HEIGHT
+            else:
+                # Parked off-screen so clicks cannot reach it; a hidden input box stops taking keys
+                comp.rect.topleft = (-comp.rect.width, -comp.rect.height)
+                if isinstance(comp, InputBox):
+                    comp.active = False
+
+        button_y = self.editor_rect.bottom - 70
+        self.save_button_rect = pygame.Rect(self.editor_rect.centerx - 120, button_y, 110, 50)
+        self.cancel_button_rect = pygame.Rect(self.editor_rect.centerx + 10, button_y, 110, 50)
+
+    def _scroll(self, rows):
+        self.scroll_row += rows
+        self._layout()
+
     def run(self):
         """Runs the main loop for the editor menu. Returns the new settings or None."""
         while self.is_running:
@@ -71,6 +111,15 @@ class EditorMenu:
                     self.is_running = False
                     return
 
+            any_dropdown_open = any(isinstance(c, Dropdown) and c.is_open for c in self.editor_components.values())
+            if not any_dropdown_open:
+                if event.type == pygame.MOUSEWHEEL:
+                    self._scroll(-event.y)
+                    continue
+                if event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN):
+                    self._scroll(self.visible_rows if event.key == pygame.K_PAGEDOWN else -self.visible_rows)
+                    continue
+
             open_dropdown_handled_event = False
             for component in self.editor_components.values():
                 if isinstance(component, Dropdown) and component.is_open:
@@ -89,25 +138,25 @@ class EditorMenu:
         overlay.fill((0, 0, 0, 150))
         self.screen.blit(overlay, (0, 0))
 
-        panel_width = 600
-        panel_height = 150 + len(self.editor_components) * 60
-        editor_rect = pygame.Rect((self.window_width - panel_width) / 2, (self.window_height - panel_height) / 2, panel_width, panel_height)
+        editor_rect = self.editor_rect
         pygame.draw.rect(self.screen, self.colors['LIGHT_GRAY'], editor_rect, border_radius=15)
         pygame.draw.rect(self.screen, self.colors['DARK_GRAY'], editor_rect, 3, border_radius=15)
 
-        y_offset = editor_rect.top + 50
-        for key, comp in self.editor_components.items():
+        shown = list(self.editor_components.items())[self.scroll_row:self.scroll_row + self.visible_rows]
+        for key, comp in shown:
             label_surf = self.editor_font.render(f"{key}:", True, self.colors['BLACK'])
-            self.screen.blit(label_surf, (editor_rect.x + 40, y_offset + 10))
-            
-            comp.rect.topleft = (editor_rect.x + 280, y_offset)
+            self.screen.blit(label_surf, (editor_rect.x + 40, comp.rect.y + 10))
             comp.draw(self.screen)
-            y_offset += 60
 
-        button_y = editor_rect.bottom - 70
-        self.save_button_rect = pygame.Rect(editor_rect.centerx - 120, button_y, 110, 50)
-        self.cancel_button_rect = pygame.Rect(editor_rect.centerx + 10, button_y, 110, 50)
-        
+        rows = len(self.editor_components)
+        if rows > self.visible_rows:
+            # Scrollbar: the thumb's length and position show which part of the list is on screen
+            track = pygame.Rect(editor_rect.right - 20, editor_rect.top + HEADER_HEIGHT, 8, self.visible_rows * ROW_HEIGHT)
+            thumb_height = max(20, track.height * self.visible_rows // rows)
+            thumb_y = track.top + (track.height - thumb_height) * self.scroll_row // (rows - self.visible_rows)
+            pygame.draw.rect(self.screen, self.colors['GRAY'], track, border_radius=4)
+            pygame.draw.rect(self.screen, self.colors['DARK_GRAY'], (track.x, thumb_y, track.width, thumb_height), border_radius=4)
+
         pygame.draw.rect(self.screen, self.colors['GREEN'], self.save_button_rect, border_radius=10)
         save_text = self.button_font.render("Save", True, self.colors['WHITE'])
         self.screen.blit(save_text, save_text.get_rect(center=self.save_button_rect.center))
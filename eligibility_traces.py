@@ -0,0 +1,42 @@
+TRACE_THRESHOLD = 1e-3  # Traces that decay below this are dropped
+MAX_TRACES = 1000  # Hard cap on the pairs carrying a trace; the oldest go first
+
+
+class EligibilityTraces:
+    """
+    Sparse replacing traces for SARSA(lambda) and Watkins Q(lambda): a dict from
+    (state, action) to its trace, kept in order of last visit. Every trace decays by
+    the same factor each step, so the oldest pairs are always the smallest. Pruning
+    below TRACE_THRESHOLD and the MAX_TRACES cap only ever drop from the front.
+    """
+    def __init__(self, decay, threshold=TRACE_THRESHOLD, max_entries=MAX_TRACES):
+        self.decay = decay
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.traces = {}
+
+    def __len__(self):
+        return len(self.traces)
+
+    def clear(self):
+        self.traces.clear()
+
+    def visit(self, state, action):
+        """Sets the pair's trace to 1 (a replacing trace) and moves it to the back."""
+        key = (state, action)
+        self.traces.pop(key, None)
+        self.traces[key] = 1.0
+        if len(self.traces) > self.max_entries:
+            del self.traces[next(iter(self.traces))]
+
+    def update(self, q_table, step):
+        """Adds step * trace to every traced Q-value, then decays the traces and prunes the faded ones."""
+        for (state, action), trace in self.traces.items():
+            q_table[state][action] += step * trace
+        for key in self.traces:
+            self.traces[key] *= self.decay
+        while self.traces:
+            oldest = next(iter(self.traces))
+            if self.traces[oldest] >= self.threshold:
+                break
+            del self.traces[oldest]
@@ -0,0 +1,207 @@
+import numpy as np
+from array import array
+from collections import deque
+
+from q_tables import ArrayQTable
+
+MAX_PLANNER_STATES = 500000  # Layouts with more possible states are refused rather than enumerated in Python
+
+
+class TabularModelSolver:
+    """
+    Value iteration over an enumerated state graph. Subclasses fill `states` (start state
+    first), `index` and the flat model arrays in _build: one entry per (state, action,
+    outcome) with its (state * num_actions + action) row, next state index (-1 when the
+    episode ends), probability and reward.
+    """
+    def __init__(self, env, gamma=0.9):
+        self.env = env
+        self.gamma = gamma
+        self.actions = list(env.action_space)
+        self.states = []
+        self.index = {}
+        self.values = None
+        self.q_values = None
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _policy_key(self, state):
+        """The agent's state for a solver state."""
+        return state
+
+    def _backup(self, values):
+        """Q(s, a) for every state and action given state values; terminal outcomes contribute only their reward."""
+        next_values = np.where(self._next >= 0, values[self._next], 0.0)
+        q = np.bincount(self._rows, weights=self._probs * (self._rewards + self.gamma * next_values),
+                        minlength=len(self.states) * len(self.actions))
+        return q.reshape(len(self.states), len(self.actions))
+
+    def solve(self, theta=1e-9, max_sweeps=100000):
+        """Enumerates the state graph and runs value iteration. Returns self for chaining."""
+        self._build()
+        values = np.zeros(len(self.states))
+        for _ in range(max_sweeps):
+            q = self._backup(values)
+            new_values = q.max(axis=1)
+            delta = np.max(np.abs(new_values - values))
+            values = new_values
+            if delta < theta:
+                break
+        self.values = values
+        self.q_values = self._backup(values)
+        return self
+
+    @property
+    def start_value(self):
+        """Optimal expected discounted return from the start of an episode."""
+        return float(self.values[0])
+
+    def evaluate_policy(self, policy, theta=1e-9, max_sweeps=100000):
+        """
+        Exact expected discounted return from the start of a stationary policy over the
+        agent's states, given as a {state: action} dict. States the policy has no action
+        for end the episode with no further reward.
+        """
+        a_of = np.array([self.actions.index(policy[key]) if policy.get(key) else -1 for key in map(self._policy_key, self.states)])
+        has_action = a_of >= 0
+        rows = np.arange(len(self.states)) * len(self.actions) + np.maximum(a_of, 0)
+        values = np.zeros(len(self.states))
+        for _ in range(max_sweeps):
+            new_values = np.where(has_action, self._backup(values).ravel()[rows], 0.0)
+            delta = np.max(np.abs(new_values - values))
+            values = new_values
+            if delta < theta:
+                break
+        return float(values[0])
+
+
+class PatrolPlanner(TabularModelSolver):
+    """
+    Exact model-based solver for Room 2. The enemy's patrol is a fixed cycle, so adding
+    the patrol index to the state, (r, c, has_key, patrol_index), turns the room into a
+    finite MDP. The planner enumerates the states reachable from the start with a BFS over
+    the room's own SecondEscapeRoom.move_outcome and slip tables, and solves it with vectorized
+    value iteration. Episodes are not truncated at the agents' step limit.
+    """
+
+    def _outcomes(self, state, action):
+        """[(probability, next_state or None when the episode ends, reward)] for one action, from the room's own move rules."""
+        r, c, has_key, patrol_index = state
+        outcomes = []
+        for prob, act in self.env.slip_outcomes((r, c)) or [(1.0, action)]:
+            next_state, reward, done, next_index = self.env.move_outcome((r, c, has_key), act, patrol_index)
+            outcomes.append((prob, None if done else (*next_state, next_index), reward))
+        return outcomes
+
+    def _build(self):
+        """BFS over the time-expanded states, flattening the model into (state, action) indexed arrays."""
+        bound = self.env.size * self.env.size * 2 * len(self.env.collision_table)
+        if bound > MAX_PLANNER_STATES:
+            raise ValueError(f"Up to {bound} states; the layout is too large for the exact planner.")
+        start = (*self.env.start_pos, 0, 0)
+        self.states = [start]
+        self.index = {start: 0}
+        queue = deque([start])
+        rows, next_states, probs, rewards = array('q'), array('q'), array('d'), array('d')
+        while queue:
+            state = queue.popleft()
+            s = self.index[state]
+            for a, action in enumerate(self.actions):
+                for prob, next_state, reward in self._outcomes(state, action):
+                    if next_state is not None and next_state not in self.index:
+                        self.index[next_state] = len(self.states)
+                        self.states.append(next_state)
+                        queue.append(next_state)
+                    rows.append(s * len(self.actions) + a)
+                    next_states.append(-1 if next_state is None else self.index[next_state])
+                    probs.append(prob)
+                    rewards.append(reward)
+        self._rows = np.frombuffer(rows, dtype=np.int64)
+        self._next = np.frombuffer(next_states, dtype=np.int64)
+        self._probs = np.frombuffer(probs, dtype=np.float64)
+        self._rewards = np.frombuffer(rewards, dtype=np.float64)
+
+    def _policy_key(self, state):
+        return state[:3]
+
+    def action_for(self, state, patrol_index):
+        """The optimal action for an (r, c, has_key) state at the given patrol index, or None if unreachable."""
+        s = self.index.get((*state, patrol_index))
+        return None if s is None else self.actions[int(np.argmax(self.q_values[s]))]
+
+    def q_table_warm_start(self):
+        """
+        Q-values for the agents' (r, c, has_key) states: the optimal time-expanded Q-values
+        averaged over the patrol indices at which each state is reachable.
+        """
+        totals, counts = {}, {}
+        for s, state in enumerate(self.states):
+            key = state[:3]
+            totals[key] = totals.get(key, 0.0) + self.q_values[s]
+            counts[key] = counts.get(key, 0) + 1
+        return {key: dict(zip(self.actions, (totals[key] / counts[key]).tolist())) for key in totals}
+
+
+class ReachableStateSolver(TabularModelSolver):
+    """
+    Exact solver for Room 3. The room's full state product is far too large to list, but
+    the plank and key configurations reachable from one layout are not. A BFS over
+    ThirdEscapeRoom.step from the start state enumerates them (about 600k states on a
+    10x10 layout) into an indexed transition graph that value iteration solves directly.
+    """
+    def __init__(self, env, gamma=0.9, max_states=5000000):
+        super().__init__(env, gamma)
+        self.max_states = max_states
+
+    @staticmethod
+    def layout_signature(env):
+        """
+        Everything of a Room 3 layout the solve depends on besides gamma: the grid as
+        generated, the plank, key and door positions, start, exit and slip probabilities.
+        Layouts with equal signatures solve to the same tables.
+        """
+        return (env.original_grid.shape, env.original_grid.tobytes(), env.original_plank1_pos, env.original_plank2_pos,
+                env.silver_key_pos, env.golden_key_pos, env.locked_door_pos, env.start_pos, env.exit_pos,
+                tuple(sorted(env.slippery_probabilities.items())))
+
+    def _build(self):
+        start = self.env.get_start_state()
+        self.states = [start]
+        self.index = {start: 0}
+        queue = deque([start])
+        next_states, rewards = array('q'), array('d')
+        while queue:
+            state = queue.popleft()
+            for action in self.actions:
+                next_state, reward, done = self.env.step(state, action)
+                if done:
+                    next_states.append(-1)
+                else:
+                    s = self.index.get(next_state)
+                    if s is None:
+                        if len(self.states) >= self.max_states:
+                            raise ValueError(f"More than {self.max_states} reachable states; the layout is too large for the exact solver.")
+                        s = self.index[next_state] = len(self.states)
+                        self.states.append(next_state)
+                        queue.append(next_state)
+                    next_states.append(s)
+                rewards.append(reward)
+        # Steps are deterministic: exactly one outcome per (state, action), in row order
+        self._next = np.frombuffer(next_states, dtype=np.int64)
+        self._rewards = np.frombuffer(rewards, dtype=np.float64)
+        self._rows = np.arange(len(self._next), dtype=np.int64)
+        self._probs = np.ones(len(self._next))
+
+    def _backup(self, values):
+        next_values = np.where(self._next >= 0, values[self._next], 0.0)
+        return (self._rewards + self.gamma * next_values).reshape(len(self.states), len(self.actions))
+
+    def greedy_policy(self):
+        """{state: action} for every reachable state."""
+        best = np.argmax(self.q_values, axis=1)
+        return {state: self.actions[a] for state, a in zip(self.states, best.tolist())}
+
+    def to_q_table(self):
+        """The optimal Q-values as a compact ArrayQTable, ready to seed a Q-learning agent."""
+        return ArrayQTable.from_arrays(self.actions, self.states, self.q_values)
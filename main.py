@@ -10,13 +10,25 @@ from ui_components import UIManager
 from sprite_handler import AnimatedSprite
 from editor_menu import EditorMenu
 from plot_utils import show_plots
+from background_trainer import BackgroundTrainer
+from parallel_training import train_parallel, HogwildRun
+from q_tables import SharedQTable
+from profiler import PhaseProfiler
+from sampling_profiler import SamplingProfiler
+from memory_stats import measure_structures
+from policy_tables import greedy_rollout
+from policy_evaluation import evaluate_agent
+from exact_solvers import PatrolPlanner
+from result_cache import ResultCache, result_key
+from camera import Camera
 from constants import *
 
 # Import all rooms and agents
 from room1_dp_env import FirstEscapeRoom
 from room2_sarsa_env import SecondEscapeRoom
 from room3_qlearning_env import ThirdEscapeRoom
-from agent_dp import DynamicProgrammingAgent
+from room1_items_env import ItemsEscapeRoom
+from agent_dp import DynamicProgrammingAgent, ItemLayerDPAgent
 from agent_sarsa import SarsaAgent
 from agent_qlearning import QLearningAgent
 
@@ -28,13 +40,17 @@ class PygameVisualizer:
         pygame.display.set_caption("Reinforcement Learning Playground")
         self.clock = pygame.time.Clock()
         self.item_font = pygame.font.SysFont('Arial', 30, bold=True)
-        self.prob_font = pygame.font.SysFont('Monospace', 11, bold=True)
-        self.q_value_font = pygame.font.SysFont('Monospace', 10, bold=True)
         self.console_font = pygame.font.SysFont('Monospace', 14)
         self.button_font = pygame.font.SysFont('Arial', 18, bold=True)
         self.status_font = pygame.font.SysFont('Arial', 22, bold=True)
         self.editor_font = pygame.font.SysFont('Arial', 18)
         self.popup_font = pygame.font.SysFont('Arial', 24, bold=True)
+        self.hud_font = pygame.font.SysFont('Monospace', 13, bold=True)
+        self.profiler = PhaseProfiler()
+        self.sampler = SamplingProfiler()
+        self.show_memory_stats = False
+        self.memory_report = {}
+        self.memory_report_time = None
         
         self.running = True
         self.is_animating = False
@@ -61,8 +77,13 @@ class PygameVisualizer:
         self.using_image_assets = True
 
         self.console_rect = pygame.Rect(GRID_WIDTH, 0, CONSOLE_WIDTH, GRID_WIDTH)
+        self.camera = Camera((0, 0, GRID_WIDTH, GRID_WIDTH))
+        self.hero_cell = (0, 0)
+        self.scaled_item_images = {}
+        self.zoom_fonts = {}
         self.log_message("Welcome to the RL Playground!")
         self.log_message("Press F11 to toggle fullscreen.")
+        self.log_message("Arrow keys scroll the grid, +/- or the mouse wheel zoom, Home fits it.")
         
         self.hero_sprite = AnimatedSprite(size=CELL_SIZE, sprite_name='Hero')
         self.enemy_sprite = AnimatedSprite(size=CELL_SIZE, sprite_name='Enemy')
@@ -70,7 +91,17 @@ class PygameVisualizer:
         self._load_item_images()
 
         self._setup_rooms_and_agents()
+        self.room_cache = {}
+        self.background_trainer = None
+        self.hogwild_run = None
+        self.hogwild_refresh_time = 0
+        self.result_cache = ResultCache() if RESULT_CACHE_MB > 0 else None
+        if BACKGROUND_TRAINING:
+            self.background_trainer = BackgroundTrainer(max_workers=min(len(self.rooms), os.cpu_count() or 1))
+            self._start_background_training()
         self.load_room(0)
+        if PROFILING:
+            self.profiler.toggle()
 
     def _create_fallback_surface(self, color, text=""):
         """Creates a fallback surface with a color and optional text."""
@@ -98,7 +129,8 @@ class PygameVisualizer:
             "Slippery Tile": {"color": COLORS['CYAN'], "text": ""},
             "Tile": {"color": COLORS['GRAY'], "text": ""},
             "Tunnel": {"color": COLORS['PURPLE'], "text": ""},
-            "Wall": {"color": COLORS['BLACK'], "text": ""}
+            "Wall": {"color": COLORS['BLACK'], "text": ""},
+            "Item": {"color": COLORS['ORANGE'], "text": ""}
         }
 
         for item_name, details in item_details.items():
@@ -112,25 +144,95 @@ class PygameVisualizer:
                     self.using_image_assets = False
                 self.item_images[item_name] = self._create_fallback_surface(details['color'], details['text'])
 
+    def _item_image(self, item_name):
+        """The item image at the current zoom level. Scaled copies are cached until the zoom changes."""
+        size = self.camera.cell_size
+        if size == CELL_SIZE:
+            return self.item_images[item_name]
+        key = (item_name, size)
+        if key not in self.scaled_item_images:
+            if len(self.scaled_item_images) > 4 * len(self.item_images):
+                self.scaled_item_images.clear()
+            self.scaled_item_images[key] = pygame.transform.scale(self.item_images[item_name], (size, size))
+        return self.scaled_item_images[key]
+
+    def _zoom_font(self, name, base_size):
+        """A font scaled with the zoom level, created once per size."""
+        size = max(6, round(base_size * self.camera.cell_size / CELL_SIZE))
+        key = (name, size)
+        if key not in self.zoom_fonts:
+            self.zoom_fonts[key] = pygame.font.SysFont(name, size, bold=True)
+        return self.zoom_fonts[key]
+
     def _setup_rooms_and_agents(self):
         self.rooms = [
             (FirstEscapeRoom, DynamicProgrammingAgent),
             (SecondEscapeRoom, SarsaAgent),
-            (ThirdEscapeRoom, QLearningAgent)
+            (ThirdEscapeRoom, QLearningAgent),
+            (ItemsEscapeRoom, ItemLayerDPAgent)
         ]
         self.current_room_index = 0
 
+    def _default_settings(self, env, AgentClass):
+        all_options = {**env.get_editor_options(), **AgentClass.get_editor_options()}
+        return {key: details['default'] for key, details in all_options.items()}
+
+    def _start_background_training(self):
+        """Generates a map for every room and queues its agent for training in a worker process."""
+        for room_index, (RoomClass, AgentClass) in enumerate(self.rooms):
+            env = RoomClass(size=GRID_SIZE)
+            settings = self._default_settings(env, AgentClass)
+            env.generate_layout(settings)
+            self.room_cache[room_index] = {
+                'env': env, 'settings': settings, 'agent': AgentClass(env, settings),
+                'token': self.background_trainer.submit(room_index, env, AgentClass, settings),
+            }
+        self.log_message(f"Background training started for {len(self.rooms)} rooms.")
+
+    def _submit_background_training(self):
+        """Caches the current room and queues its agent for training on the current layout."""
+        self.room_cache[self.current_room_index] = {
+            'env': self.env, 'settings': self.editor_settings, 'agent': self.agent,
+            'token': self.background_trainer.submit(self.current_room_index, self.env, self.AgentClass, self.editor_settings),
+        }
+
+    def _cancel_background_training(self):
+        """Stops a pending background job from overwriting an agent the user is training by hand."""
+        if not self.background_trainer: return
+        self.background_trainer.cancel(self.current_room_index)
+        if self.current_room_index in self.room_cache:
+            self.room_cache[self.current_room_index]['token'] = None
+
+    def _poll_background_training(self):
+        for room_index, token, snapshot, error in self.background_trainer.poll():
+            cached = self.room_cache.get(room_index)
+            if not cached or cached['token'] != token:
+                continue
+            cached['token'] = None
+            if error:
+                self.log_message(f"Background training failed for {cached['env'].name}: {error}")
+                continue
+            cached['agent'].load_trained_state(snapshot)
+            if room_index == self.current_room_index:
+                self.log_message("Background training finished. Policy ready.")
+            else:
+                self.log_message(f"Background training finished for {cached['env'].name}.")
+
     def load_room(self, room_index):
+        self._cancel_hogwild_training()
         self.current_room_index = room_index % len(self.rooms)
         self.RoomClass, self.AgentClass = self.rooms[self.current_room_index]
         
-        self.env = self.RoomClass(size=GRID_SIZE)
-        self.editor_settings = {}
-        all_options = {**self.env.get_editor_options(), **self.AgentClass.get_editor_options()}
-        for key, details in all_options.items():
-            self.editor_settings[key] = details['default']
-
-        self._generate_new_map(log=False) 
+        cached = self.room_cache.get(self.current_room_index)
+        if cached:
+            self.env, self.editor_settings, self.agent = cached['env'], cached['settings'], cached['agent']
+            self._reset_view_state()
+        else:
+            self.env = self.RoomClass(size=GRID_SIZE)
+            self.editor_settings = self._default_settings(self.env, self.AgentClass)
+            self._generate_new_map(log=False) 
+        self._instrument_hot_paths()
+        self.sampler.set_subject(self.env.name, self.agent.name)
         self.ui_manager.setup_buttons(self.agent.name)
 
         # Set training delay based on the room type
@@ -141,8 +243,15 @@ class PygameVisualizer:
 
         pygame.display.set_caption(f"RL Playground - {self.agent.name}")
         self.log_message(f"Loaded {self.env.name}.")
+        if cached and self.agent.is_trained:
+            self.log_message("Using the policy trained in the background.")
+        elif self.background_trainer and self.background_trainer.is_pending(self.current_room_index):
+            self.log_message("Background training in progress...")
         
-        if isinstance(self.env, FirstEscapeRoom):
+        if isinstance(self.env, ItemsEscapeRoom):
+            self.log_message("Objective: Collect the numbered items in order, then escape.")
+            self.log_message("Each item layer is solved with vectorized value iteration.")
+        elif isinstance(self.env, FirstEscapeRoom):
             self.log_message("Objective: Find the optimal path using Policy Iteration.")
         elif isinstance(self.env, SecondEscapeRoom):
             self.log_message("Objective: Evade the enemy, find the key, and escape.")
@@ -154,40 +263,82 @@ class PygameVisualizer:
     def log_message(self, message):
         timestamp = time.strftime("%H:%M:%S")
         self.console_logs.append(f"[{timestamp}] {message}")
+        if len(self.console_logs) > MAX_CONSOLE_LOGS:
+            del self.console_logs[:len(self.console_logs) - MAX_CONSOLE_LOGS]
         line_height = 20
         max_visible_lines = self.console_rect.height // line_height
         if len(self.console_logs) > max_visible_lines:
              self.console_scroll_offset_y = (len(self.console_logs) - max_visible_lines) * line_height
 
     def _generate_new_map(self, log=True):
+        self._cancel_hogwild_training()
+        grid_size = int(self.editor_settings.get('Grid Size', GRID_SIZE))
+        if grid_size != self.env.size:
+            self.env = self.RoomClass(size=grid_size)
+        self.env.generate_layout(self.editor_settings)
+        self.agent = self.AgentClass(self.env, self.editor_settings)
+        if getattr(self.agent, 'warm_start_error', None):
+            self.log_message(f"Warm start skipped: {self.agent.warm_start_error}")
+        if getattr(self.agent, 'shared_table_error', None):
+            self.log_message(f"Shared Q-table unavailable: {self.agent.shared_table_error}")
+        self._reset_view_state()
+        self._instrument_hot_paths()
+        
+        if self.background_trainer:
+            self._submit_background_training()
+        
+        if log:
+            self.log_message("New map generated. Agent reset.")
+
+    def _reset_view_state(self):
         self.is_animating = False
         self.is_paused = False
         self.is_slow_training = False
         self.is_training_paused = False
         self.death_animation_sequence = None
-        
-        self.env.generate_layout(self.editor_settings)
-        self.agent = self.AgentClass(self.env, self.editor_settings)
+        self.env.reset_state()
+        if self.camera.grid_size != self.env.size:
+            self.camera.set_grid(self.env.size)
 
-        start_pos_coords = self.env.start_pos
-        self.hero_sprite.rect.topleft = (start_pos_coords[1] * CELL_SIZE, start_pos_coords[0] * CELL_SIZE)
+        self._move_hero(self.env.start_pos)
         self.hero_sprite.set_state('idle')
         
         if hasattr(self.env, 'enemy_pos') and self.env.enemy_pos:
             self.prev_enemy_pos = self.env.enemy_pos
-            enemy_pos_coords = self.env.enemy_pos
-            self.enemy_sprite.rect.topleft = (enemy_pos_coords[1] * CELL_SIZE, enemy_pos_coords[0] * CELL_SIZE)
             self.enemy_sprite.set_state('idle')
-        
-        if log:
-            self.log_message("New map generated. Agent reset.")
+
+    def _move_hero(self, pos):
+        """Places the hero on a cell and scrolls the camera to keep it in view."""
+        self.hero_cell = (pos[0], pos[1])
+        self.camera.ensure_visible(*self.hero_cell)
+
+    def _instrument_hot_paths(self):
+        """Tells the profiler which methods of the current room, agent and visualizer to time."""
+        self.profiler.set_targets([
+            (self.env, 'step', 'env.step'),
+            (self.agent, 'choose_action', 'choose_action'),
+            (self.agent, '_update_q', 'q_update'),
+            (self.agent, 'train_step', 'train_step'),
+            (self.agent, 'extract_policy', 'extract_policy'),
+            (self, '_handle_events', 'handle_events'),
+            (self, '_draw_grid', 'draw_grid'),
+            (self, '_draw_policy', 'draw_policy'),
+            (self, '_draw_q_values', 'draw_q_values'),
+        ])
 
     def run(self):
         while self.running:
+            if self.profiler.enabled: self.profiler.begin_frame()
             self._handle_events()
             self._update()
             self._draw_all()
             self.clock.tick(FPS)
+            if self.profiler.enabled: self.profiler.end_frame(getattr(self.agent, 'training_episode_count', self.training_iteration))
+        if self.background_trainer:
+            self.background_trainer.shutdown()
+        self._cancel_hogwild_training()
+        if self.sampler.is_running:
+            self._toggle_sampling_capture()
         pygame.quit()
 
     def _handle_events(self):
@@ -197,6 +348,15 @@ class PygameVisualizer:
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     self._toggle_fullscreen()
+                elif event.key == pygame.K_F3:
+                    self.log_message("Profiler enabled." if self.profiler.toggle() else "Profiler disabled.")
+                elif event.key == pygame.K_F4:
+                    self._toggle_sampling_capture()
+                elif event.key == pygame.K_F5:
+                    self.show_memory_stats = not self.show_memory_stats
+                    self.memory_report_time = None
+                elif event.key == pygame.K_F6:
+                    self._export_policy()
 
             if self.show_skip_episode_input:
                 self._handle_skip_input_events(event)
@@ -205,6 +365,27 @@ class PygameVisualizer:
             else:
                 self._handle_main_events(event)
 
+    def _toggle_sampling_capture(self):
+        if not self.sampler.is_running:
+            self.sampler.start()
+            self.log_message("Sampling profiler started. Press F4 to stop.")
+            return
+        path = self.sampler.stop()
+        if path:
+            self.log_message(f"Sampling profile written to {path}")
+        else:
+            self.log_message("Sampling profiler stopped. No samples were taken.")
+
+    def _export_policy(self):
+        if not self.agent.is_trained:
+            self.log_message("Agent is not trained yet!")
+            return
+        os.makedirs("policies", exist_ok=True)
+        safe_name = "".join(ch if ch.isalnum() else "_" for ch in f"{self.env.name} {self.agent.name}")
+        path = os.path.join("policies", f"{safe_name}_{time.strftime('%Y%m%d_%H%M%S')}.npz")
+        self.agent.policy_table.save(path)
+        self.log_message(f"Policy exported to {path} ({len(self.agent.policy_table)} states).")
+
     def _toggle_fullscreen(self):
         self.is_fullscreen = not self.is_fullscreen
         if self.is_fullscreen:
@@ -213,25 +394,32 @@ class PygameVisualizer:
             self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
 
     def _update(self):
+        if self.background_trainer:
+            self._poll_background_training()
+        if self.hogwild_run:
+            self._update_hogwild_training()
+        self._log_memory_events()
+
         if self.death_animation_sequence:
             self._update_death_animation()
         elif self.is_animating and not self.is_paused:
             now = pygame.time.get_ticks()
             if now - self.animation_timer > self.animation_delay:
                 self.animation_timer = now
-                self._update_animation_step()
+                with self.sampler.operation("animation"):
+                    self._update_animation_step()
         
         if self.is_slow_training and not self.is_training_paused:
             now = pygame.time.get_ticks()
             if now - self.training_timer > self.training_delay:
                 self.training_timer = now
-                self._update_slow_train_step()
+                with self.sampler.operation("slow training"):
+                    self._update_slow_train_step()
         
         self.hero_sprite.update()
         
         if hasattr(self.env, 'enemy_pos') and self.env.enemy_pos:
             current_enemy_pos = self.env.enemy_pos
-            self.enemy_sprite.rect.topleft = (current_enemy_pos[1] * CELL_SIZE, current_enemy_pos[0] * CELL_SIZE)
 
             if self.enemy_sprite.state != 'attack':
                 dx = current_enemy_pos[1] - self.prev_enemy_pos[1]
@@ -259,8 +447,27 @@ class PygameVisualizer:
                 self.death_animation_sequence = None
     
     def _handle_main_events(self, event):
-        if event.type == pygame.MOUSEWHEEL: self._handle_console_scroll(event)
+        if event.type == pygame.MOUSEWHEEL:
+            if self.camera.viewport.collidepoint(pygame.mouse.get_pos()):
+                self.camera.zoom(1.15 ** event.y, pygame.mouse.get_pos())
+            else:
+                self._handle_console_scroll(event)
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1: self._handle_click(event.pos)
+        elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+            self.camera.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN: self._handle_camera_keys(event)
+
+    def _handle_camera_keys(self, event):
+        step = self.camera.cell_size
+        pan = {pygame.K_LEFT: (-step, 0), pygame.K_RIGHT: (step, 0), pygame.K_UP: (0, -step), pygame.K_DOWN: (0, step)}
+        if event.key in pan:
+            self.camera.pan(*pan[event.key])
+        elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.camera.zoom(1.25)
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.camera.zoom(0.8)
+        elif event.key == pygame.K_HOME:
+            self.camera.set_grid(self.env.size)
 
     def _handle_console_scroll(self, event):
         current_console_width = self.screen.get_width() - GRID_WIDTH
@@ -284,12 +491,20 @@ class PygameVisualizer:
 
     def _handle_refresh_button(self): self._generate_new_map()
     def _handle_edit_button(self): self._open_editor()
-    def _handle_fast_train_button(self): self._run_fast_training()
+    def _handle_fast_train_button(self):
+        with self.sampler.operation("fast training"):
+            self._run_fast_training()
+
     def _handle_plot_button(self): self._plot_learning_progress()
     def _handle_q_values_button(self): self.show_q_values = not self.show_q_values
     
     def _handle_slow_train_button(self):
+        if self.hogwild_run:
+            # Resetting would release the shared table the workers are still writing to
+            self.log_message("Hogwild training is still running.")
+            return
         if not self.is_slow_training:
+            self._cancel_background_training()
             self.agent.reset()
             self.is_slow_training = True
             self.is_training_paused = False
@@ -341,6 +556,9 @@ class PygameVisualizer:
             {'type': 'steps', 'data': self.agent.episode_steps}
         ]
         
+        if getattr(self.agent, 'evaluator', None) and self.agent.evaluator.history:
+            plot_data.append({'type': 'evaluation', 'data': list(self.agent.evaluator.history)})
+
         if hasattr(self.agent, 'action_counts'):
             action_counts_dict = {k: dict(v) for k, v in self.agent.action_counts.items()}
             plot_data.append({'type': 'action_schema', 'data': action_counts_dict})
@@ -357,31 +575,90 @@ class PygameVisualizer:
         elif self.is_animating: status = f"Animating... Step {self.animation_step}"
         elif self.is_slow_training: 
             status = f"Slow Training... {'Iteration' if self.agent.training_type == 'iterative' else 'Episode'} {self.training_iteration if self.agent.training_type == 'iterative' else current_episode}"
+        elif self.hogwild_run: status = f"Hogwild Training... Episode {current_episode + self.hogwild_run.episodes_done}"
         if self.is_paused: status = "Run Paused"
         elif self.is_training_paused: status = "Training Paused"
         
+        # Only the cells inside the grid viewport are drawn; the clip keeps partly visible cells off the console
+        self.screen.set_clip(self.camera.viewport)
         self._draw_grid()
         self._draw_policy()
 
-        if self.show_q_values: self._draw_q_values()
+        if self.show_q_values:
+            with self.sampler.operation("Q-overlay frame"):
+                self._draw_q_values()
         
         if self.hero_sprite.state != 'dead' or self.death_animation_sequence:
-             self.hero_sprite.draw(self.screen)
+            self.hero_sprite.draw_at(self.screen, self.camera.cell_rect(*self.hero_cell))
 
         if hasattr(self.env, 'enemy_pos') and self.env.enemy_pos:
-            self.enemy_sprite.draw(self.screen)
+            self.enemy_sprite.draw_at(self.screen, self.camera.cell_rect(*self.env.enemy_pos))
+        self.screen.set_clip(None)
 
         self._draw_console()
         self._draw_bottom_panel(status)
         
         if self.success_popup_active: self._draw_success_popup()
         if self.show_skip_episode_input: self._draw_skip_input_box()
+        if self.profiler.enabled: self._draw_profiler_hud()
+        if self.show_memory_stats: self._draw_memory_stats()
         
         pygame.display.flip()
 
+    def _draw_profiler_hud(self):
+        frame_ms, phases = self.profiler.frame_breakdown()
+        lines = [
+            f"FPS {self.clock.get_fps():5.1f}   frame {frame_ms:6.2f} ms",
+            f"env steps/s {self.profiler.rates['env_steps']:9.0f}",
+            f"episodes/s  {self.profiler.rates['episodes']:9.1f}",
+        ]
+        for phase, ms in sorted(phases.items(), key=lambda item: -item[1]):
+            lines.append(f"{phase:<15}{ms:7.2f} ms")
+
+        line_height = 16
+        hud = pygame.Surface((260, 10 + line_height * len(lines)), pygame.SRCALPHA)
+        hud.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            hud.blit(self.hud_font.render(line, True, COLORS['YELLOW']), (8, 5 + i * line_height))
+        self.screen.blit(hud, (5, 5))
+
+    def _log_memory_events(self):
+        if hasattr(self.agent, 'memory_monitor'):
+            for message in self.agent.memory_monitor.pop_events():
+                self.log_message(message)
+
+    def _draw_memory_stats(self):
+        now = pygame.time.get_ticks()
+        if self.memory_report_time is None or now - self.memory_report_time > 1000:
+            self.memory_report_time = now
+            self.memory_report = measure_structures(self.agent, extra={'console_logs': self.console_logs})
+        growth = self.agent.memory_monitor.growth_rates() if hasattr(self.agent, 'memory_monitor') else {}
+
+        lines = [f"{'structure':<16}{'entries':>9}{'KB':>10}{'KB/ep':>8}"]
+        for name, entry in self.memory_report.items():
+            kb_per_episode = f"{growth[name][1] / 1024:8.2f}" if name in growth else f"{'-':>8}"
+            lines.append(f"{name:<16}{entry['entries']:>9}{entry['bytes'] / 1024:>10.1f}{kb_per_episode}")
+        total = sum(entry['bytes'] for entry in self.memory_report.values())
+        lines.append(f"{'total':<16}{'':>9}{total / 1024:>10.1f}")
+        if 'q_table' in growth:
+            lines.append(f"new states per episode: {growth['q_table'][0]:.2f}")
+
+        line_height = 16
+        panel = pygame.Surface((360, 10 + line_height * len(lines)), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(self.hud_font.render(line, True, COLORS['LIGHT_GREEN']), (8, 5 + i * line_height))
+        self.screen.blit(panel, (GRID_WIDTH - panel.get_width() - 5, 5))
+
+    def _dump_profile(self, label):
+        if not self.profiler.enabled: return
+        path = self.profiler.dump(f"{self.env.name} {self.agent.name} {label}")
+        if path: self.log_message(f"Phase histograms written to {path}")
+
     def _draw_grid(self):
         has_bag, has_rope, has_key = 0, 0, 0
         has_silver, has_golden = 0, 0
+        item_mask = 0
         plank1_pos, plank2_pos = None, None
         bridge1_pos, bridge2_pos = None, None
         plank_pos = None 
@@ -414,29 +691,35 @@ class PygameVisualizer:
                     bridge1_pos = self.env.pothole_pos
                     plank_pos = None
         
+        elif isinstance(self.env, ItemsEscapeRoom):
+            item_mask = state_source[2] if state_source else 0
+
         elif state_source and len(state_source) > 2:
             if isinstance(self.agent, DynamicProgrammingAgent): 
                 has_bag, has_rope = state_source[2], state_source[3]
             elif isinstance(self.agent, (SarsaAgent, QLearningAgent)): 
                 has_key = state_source[2]
         
-        for r, c in np.ndindex(self.env.grid.shape):
-            rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+        tile_image = self._item_image("Tile")
+        for r, c in self.camera.visible_cells():
+            rect = self.camera.cell_rect(r, c)
             cell_type = self.env.grid[r, c]
 
             # Draw base tile first
-            self.screen.blit(self.item_images["Tile"], rect)
+            self.screen.blit(tile_image, rect)
 
             if (r, c) == bridge1_pos or (r, c) == bridge2_pos:
                 cell_type = BRIDGE
+            if has_key and (r, c) == getattr(self.env, 'door_pos', None):
+                cell_type = EMPTY # The key has opened the door
             
             # Draw special tiles on top of the base tile
             if cell_type == WALL:
-                self.screen.blit(self.item_images["Wall"], rect)
+                self.screen.blit(self._item_image("Wall"), rect)
             elif cell_type == SLIPPERY:
-                self.screen.blit(self.item_images["Slippery Tile"], rect)
+                self.screen.blit(self._item_image("Slippery Tile"), rect)
             elif cell_type == PORTAL:
-                self.screen.blit(self.item_images["Tunnel"], rect)
+                self.screen.blit(self._item_image("Tunnel"), rect)
             elif cell_type == POTHOLE:
                  pygame.draw.rect(self.screen, COLORS['POTHOLE'], rect) # Keep color for potholes
             elif cell_type == EXIT:
@@ -446,19 +729,24 @@ class PygameVisualizer:
 
             # Draw items on top of tiles
             if cell_type == BRIDGE:
-                self.screen.blit(self.item_images["Bridge"], rect)
+                self.screen.blit(self._item_image("Bridge"), rect)
             if cell_type == SILVER_KEY and not has_silver:
-                self.screen.blit(self.item_images["Silver Key"], rect)
+                self.screen.blit(self._item_image("Silver Key"), rect)
             if cell_type == GOLDEN_KEY and not has_golden:
-                self.screen.blit(self.item_images["Golden Key"], rect)
+                self.screen.blit(self._item_image("Golden Key"), rect)
             if cell_type == LOCKED_DOOR and not (has_silver and has_golden):
-                self.screen.blit(self.item_images["Door"], rect)
+                self.screen.blit(self._item_image("Door"), rect)
+
+            if cell_type == ITEM and not item_mask & (1 << self.env.item_index[(r, c)]):
+                self.screen.blit(self._item_image("Item"), rect)
+                number = self._zoom_font('Arial', 30).render(str(self.env.item_index[(r, c)] + 1), True, COLORS['WHITE'])
+                self.screen.blit(number, number.get_rect(center=rect.center))
 
             item_map = { 5: "Bag", 6: "Rope", 7: "Iron Key" }
             if cell_type in item_map:
                 if (cell_type == 5 and has_bag) or (cell_type == 6 and has_rope) or (cell_type == 7 and has_key):
                     continue
-                self.screen.blit(self.item_images[item_map[cell_type]], rect)
+                self.screen.blit(self._item_image(item_map[cell_type]), rect)
             
             if cell_type == 4 and hasattr(self.env, 'slippery_probabilities'):
                 # For SARSA/Q-Learning agents, hide slip percentages when showing Q-values,
@@ -472,17 +760,11 @@ class PygameVisualizer:
             # Draw border last to frame the cell
             pygame.draw.rect(self.screen, COLORS['DARK_GRAY'], rect, 1)
         
-        plank_image = self.item_images.get("Wooden Plank")
-        if plank_image:
-            if plank1_pos:
-                plank_rect = pygame.Rect(plank1_pos[1] * CELL_SIZE, plank1_pos[0] * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                self.screen.blit(plank_image, plank_rect)
-            if plank2_pos:
-                plank_rect = pygame.Rect(plank2_pos[1] * CELL_SIZE, plank2_pos[0] * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                self.screen.blit(plank_image, plank_rect)
-            if plank_pos:
-                plank_rect = pygame.Rect(plank_pos[1] * CELL_SIZE, plank_pos[0] * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                self.screen.blit(plank_image, plank_rect)
+        if "Wooden Plank" in self.item_images:
+            plank_image = self._item_image("Wooden Plank")
+            for pos in (plank1_pos, plank2_pos, plank_pos):
+                if pos and self.camera.is_visible(*pos):
+                    self.screen.blit(plank_image, self.camera.cell_rect(*pos))
 
     def _draw_text_with_outline(self, text, font, pos, text_color, outline_color):
         """Helper function to draw text with a simple outline."""
@@ -494,12 +776,15 @@ class PygameVisualizer:
 
     def _draw_slippery_probs(self, c, r):
         if not hasattr(self.env, 'slippery_probabilities'): return
+        if self.camera.cell_size < MIN_LABEL_CELL_SIZE: return
         probs = self.env.slippery_probabilities.get((r, c))
         if not probs: return
         
-        font = self.prob_font
+        font = self._zoom_font('Monospace', 11)
         
-        positions = { 'up': {'midtop': (c*CELL_SIZE+CELL_SIZE/2, r*CELL_SIZE+5)}, 'down': {'midbottom': (c*CELL_SIZE+CELL_SIZE/2, (r+1)*CELL_SIZE-5)}, 'left': {'midleft': (c*CELL_SIZE+5, r*CELL_SIZE+CELL_SIZE/2)}, 'right': {'midright': ((c+1)*CELL_SIZE-5, r*CELL_SIZE+CELL_SIZE/2)} }
+        rect = self.camera.cell_rect(r, c)
+        pad = max(2, rect.width // 14)
+        positions = { 'up': {'midtop': (rect.centerx, rect.top+pad)}, 'down': {'midbottom': (rect.centerx, rect.bottom-pad)}, 'left': {'midleft': (rect.left+pad, rect.centery)}, 'right': {'midright': (rect.right-pad, rect.centery)} }
         for action, pos_dict in positions.items():
             prob_val = probs.get(action, 0)
             if prob_val > 0:
@@ -514,15 +799,16 @@ class PygameVisualizer:
 
     def _draw_q_values(self):
         if not hasattr(self.agent, 'q_table'): return
+        if self.camera.cell_size < MIN_LABEL_CELL_SIZE: return
         
-        font = self.q_value_font
+        font = self._zoom_font('Monospace', 10)
         
         state_source = None
         if self.is_animating: state_source = self.animation_state
         elif self.is_slow_training and hasattr(self.agent, 'slow_train_path') and self.agent.slow_train_path:
             state_source = self.agent.slow_train_path[-1]
         
-        for r, c in np.ndindex(self.env.grid.shape):
+        for r, c in self.camera.visible_cells():
             if self.env.grid[r,c] in [1,3]: continue
             
             state_key = None
@@ -531,7 +817,7 @@ class PygameVisualizer:
                     if state_source:
                         state_key = (r, c, *state_source[2:])
                     else: 
-                        state_key = (r, c, *self.env.original_plank1_pos, *self.env.original_plank2_pos, 0, 0)
+                        state_key = self.env.canonical_state((r, c, *self.env.original_plank1_pos, *self.env.original_plank2_pos, 0, 0))
                 else:
                     if state_source:
                         state_key = (r, c, state_source[2], state_source[3], state_source[4])
@@ -544,8 +830,9 @@ class PygameVisualizer:
             q_vals = self.agent.q_table.get(state_key)
             if not q_vals: continue
             
-            margin = 10
-            positions = { 'up': {'center': (c*CELL_SIZE+CELL_SIZE/2, r*CELL_SIZE+margin)}, 'down': {'center': (c*CELL_SIZE+CELL_SIZE/2, (r+1)*CELL_SIZE-margin)}, 'left': {'center': (c*CELL_SIZE+margin, r*CELL_SIZE+CELL_SIZE/2)}, 'right': {'center': ((c+1)*CELL_SIZE-margin, r*CELL_SIZE+CELL_SIZE/2)} }
+            rect = self.camera.cell_rect(r, c)
+            margin = rect.width // 7
+            positions = { 'up': {'center': (rect.centerx, rect.top+margin)}, 'down': {'center': (rect.centerx, rect.bottom-margin)}, 'left': {'center': (rect.left+margin, rect.centery)}, 'right': {'center': (rect.right-margin, rect.centery)} }
             for action, pos_dict in positions.items():
                 text = f"{q_vals.get(action, 0):.1f}"
                 text_surf = font.render(text, True, COLORS['BLACK']) # Pre-render to get rect
@@ -556,7 +843,22 @@ class PygameVisualizer:
                 else:
                     self.screen.blit(text_surf, text_rect)
 
+    def _draw_layer_policy(self):
+        """Arrows for the item-layer DP agent: the greedy actions of the layer for the items currently held."""
+        item_mask = self.animation_state[2] if self.is_animating else 0
+        layer_actions = self.agent.policy[item_mask]
+        action_names = self.agent.policy_table.action_names
+        arrow_len = self.camera.cell_size * 0.2
+        for r, c in self.camera.visible_cells():
+            if self.env.grid[r, c] in [WALL, SLIPPERY] or layer_actions[r, c] < 0: continue
+            dr, dc = self.env.action_space[action_names[layer_actions[r, c]]]
+            center_x, center_y = self.camera.cell_center(r, c)
+            self._draw_arrow((center_x, center_y), (center_x + dc*arrow_len, center_y + dr*arrow_len))
+
     def _draw_policy(self):
+        if isinstance(self.agent, ItemLayerDPAgent):
+            self._draw_layer_policy()
+            return
         # This condition is changed to always draw the policy for the DP agent
         if not isinstance(self.agent, DynamicProgrammingAgent):
             return
@@ -569,11 +871,16 @@ class PygameVisualizer:
                 policy_context['has_bag'] = state_source[2]
                 policy_context['has_rope'] = state_source[3]
             else:
-                start_items = self.editor_settings.get("Start with Items", "None")
-                policy_context['has_bag'] = 1 if start_items in ["Bag", "Both"] else 0
-                policy_context['has_rope'] = 1 if start_items in ["Rope", "Both"] else 0
+                start_state = self.env.get_start_state(self.editor_settings)
+                policy_context['has_bag'], policy_context['has_rope'] = start_state[2], start_state[3]
+
+            # One vectorized slice of the int8 policy table gives the actions of the whole layer
+            size = self.env.size
+            layer_actions = self.agent.policy_table.dense_view((size, size, 2, 2))[:, :, policy_context['has_bag'], policy_context['has_rope']]
+            action_names = self.agent.policy_table.action_names
 
-            for r, c in np.ndindex(self.env.grid.shape):
+            arrow_len = self.camera.cell_size * 0.2
+            for r, c in self.camera.visible_cells():
                 if self.env.grid[r, c] == WALL: continue
 
                 if self.env.grid[r, c] == SLIPPERY:
@@ -607,32 +914,30 @@ class PygameVisualizer:
                                 best_next_pos = (next_r, next_c)
 
                     if best_next_pos:
-                        center_x, center_y = c * CELL_SIZE + CELL_SIZE / 2, r * CELL_SIZE + CELL_SIZE / 2
-                        best_center_x = best_next_pos[1] * CELL_SIZE + CELL_SIZE / 2
-                        best_center_y = best_next_pos[0] * CELL_SIZE + CELL_SIZE / 2
+                        center_x, center_y = self.camera.cell_center(r, c)
+                        best_center_x, best_center_y = self.camera.cell_center(*best_next_pos)
                         
                         dx, dy = best_center_x - center_x, best_center_y - center_y
                         dist = np.sqrt(dx**2 + dy**2)
                         if dist > 0:
-                            arrow_len = CELL_SIZE * 0.2
                             end_x = center_x + (dx / dist) * arrow_len
                             end_y = center_y + (dy / dist) * arrow_len
                             self._draw_arrow((center_x, center_y), (end_x, end_y))
 
                 else: 
-                    state_key = (r, c, policy_context['has_bag'], policy_context['has_rope'])
-                    action = self.agent.policy[state_key]
-                    if action is None: continue
-                    center_x, center_y = c * CELL_SIZE + CELL_SIZE / 2, r * CELL_SIZE + CELL_SIZE / 2
-                    arrow_len = CELL_SIZE * 0.2
+                    if layer_actions[r, c] < 0: continue
+                    action = action_names[layer_actions[r, c]]
+                    center_x, center_y = self.camera.cell_center(r, c)
                     end_pos_delta = {'up':(0,-1),'down':(0,1),'left':(-1,0),'right':(1,0)}.get(action)
                     if end_pos_delta:
                         self._draw_arrow((center_x, center_y), (center_x + end_pos_delta[0]*arrow_len, center_y + end_pos_delta[1]*arrow_len))
 
     def _draw_arrow(self, start, end):
-        pygame.draw.line(self.screen, COLORS['BLACK'], start, end, 3)
+        scale = self.camera.cell_size / CELL_SIZE
+        head = max(3, 8 * scale)
+        pygame.draw.line(self.screen, COLORS['BLACK'], start, end, max(1, round(3 * scale)))
         rotation = np.degrees(np.arctan2(start[1]-end[1], end[0]-start[0])) + 90
-        pygame.draw.polygon(self.screen, COLORS['BLACK'], ((end[0]+8*np.sin(np.radians(rotation)), end[1]+8*np.cos(np.radians(rotation))), (end[0]+8*np.sin(np.radians(rotation-120)), end[1]+8*np.cos(np.radians(rotation-120))), (end[0]+8*np.sin(np.radians(rotation+120)), end[1]+8*np.cos(np.radians(rotation+120)))))
+        pygame.draw.polygon(self.screen, COLORS['BLACK'], ((end[0]+head*np.sin(np.radians(rotation)), end[1]+head*np.cos(np.radians(rotation))), (end[0]+head*np.sin(np.radians(rotation-120)), end[1]+head*np.cos(np.radians(rotation-120))), (end[0]+head*np.sin(np.radians(rotation+120)), end[1]+head*np.cos(np.radians(rotation+120)))))
 
     def _draw_console(self):
         current_console_width = self.screen.get_width() - GRID_WIDTH
@@ -663,9 +968,16 @@ class PygameVisualizer:
         self.ui_manager.draw()
 
     def _run_fast_training(self):
+        if self.hogwild_run:
+            self.log_message("Hogwild training is still running.")
+            return
+        self._cancel_background_training()
         if not self.is_slow_training:
+            # Checked before the reset, which can be slow itself (the Exact Solver warm start)
+            if self._load_cached_result(): return
             self.agent.reset()
         self.log_message(f"Fast training {self.agent.name}...")
+        self.profiler.reset()
         
         if self.agent.training_type == 'iterative':
             max_iter = 500
@@ -677,20 +989,111 @@ class PygameVisualizer:
             max_episodes = self.agent.max_episodes
             current_episode = getattr(self.agent, 'training_episode_count', 0)
             num_episodes_to_run = max_episodes - current_episode
-            for i in range(num_episodes_to_run):
-                self.agent.train_step()
+            if getattr(self.agent, 'parallel_workers', 1) > 1 and isinstance(self.agent.q_table, SharedQTable):
+                self.log_message(f"  ... Hogwild on a shared Q-table with {self.agent.parallel_workers} processes.")
+                self.log_message("  Q-values and the policy update while they train.")
+                self.hogwild_run = HogwildRun(self.agent, num_episodes_to_run, self.agent.parallel_workers)
+                self.hogwild_refresh_time = pygame.time.get_ticks()
+                self.is_slow_training = False
+                self.is_training_paused = False
+                return
+            elif getattr(self.agent, 'parallel_workers', 1) > 1:
+                self.log_message(f"  ... with {self.agent.parallel_workers} actor processes.")
+                train_parallel(self.agent, num_episodes_to_run, self.agent.parallel_workers, self.agent.sync_every)
+            else:
+                for i in range(num_episodes_to_run):
+                    self.agent.train_step()
+                    if self.agent.convergence.converged: break
+            self._log_convergence()
         
         self.log_message(f"Training finished."); self.agent.extract_policy()
+        self._store_result()
+        self._log_policy_evaluation()
+        self._log_exact_baseline()
+        self._dump_profile("fast_train")
+        self.is_slow_training = False
+        self.is_training_paused = False
+
+    def _load_cached_result(self):
+        """Restores the result of an earlier fast train on the same layout and settings instead of training again. Returns whether there was one."""
+        if not self.result_cache: return False
+        snapshot = self.result_cache.get(result_key(self.env, type(self.agent), self.agent.settings))
+        if snapshot is None: return False
+        self.agent.load_trained_state(snapshot)
+        self.log_message(f"Loaded the trained {self.agent.name} result for this layout and settings from the cache.")
         self.is_slow_training = False
         self.is_training_paused = False
+        return True
+
+    def _store_result(self):
+        """Caches the agent's trained state under its layout and settings, for _load_cached_result and the background trainer."""
+        if not self.result_cache: return
+        self.result_cache.put(result_key(self.env, type(self.agent), self.agent.settings), self.agent.get_trained_state())
+
+    def _update_hogwild_training(self):
+        """Finishes a Hogwild run once its workers are done; until then re-extracts the policy from the live shared table."""
+        now = pygame.time.get_ticks()
+        if self.hogwild_run.done():
+            self.hogwild_run.finish()
+            self.hogwild_run = None
+            self._log_convergence()
+            self.log_message(f"Training finished."); self.agent.extract_policy()
+            self._store_result()
+            self._log_policy_evaluation()
+            self._log_exact_baseline()
+            self._dump_profile("fast_train")
+        elif now - self.hogwild_refresh_time > LIVE_POLICY_REFRESH_MS:
+            self.hogwild_refresh_time = now
+            self.agent.extract_policy()
+
+    def _cancel_hogwild_training(self):
+        """Stops a Hogwild run; the episodes it already played stay in the shared table."""
+        if not self.hogwild_run: return
+        self.hogwild_run.cancel()
+        self.hogwild_run = None
+        self.log_message("Hogwild training stopped.")
+
+    def _log_convergence(self):
+        """Reports the episode early stopping ended training at, or how settled the last window of episodes was."""
+        monitor = self.agent.convergence
+        if monitor.stopped_at is not None:
+            self.log_message(f"Converged: stopped early at episode {monitor.stopped_at} of {self.agent.max_episodes}.")
+        elif monitor.max_q_deltas:
+            summary = monitor.summary()
+            self.log_message(f"Last {min(monitor.window, summary['episodes'])} episodes: mean max |dQ| {summary['mean_max_q_delta']:.3f}, "
+                             f"{summary['policy_changes']} policy changes, success rate {summary['success_rate']:.0%}.")
+
+    def _log_policy_evaluation(self):
+        """Rolls the greedy policy out EVALUATION_ROLLOUTS times and logs how it does, which one animated run cannot show on slippery layouts."""
+        summary = evaluate_agent(self.agent, EVALUATION_ROLLOUTS, self.env.get_start_state(self.editor_settings))
+        self.log_message(f"Greedy policy over {summary['rollouts']} runs: {summary['success_rate']:.0%} escaped, "
+                         f"discounted return {summary['mean_return']:.2f} (p10 {summary['return_p10']:.2f}, p90 {summary['return_p90']:.2f}), "
+                         f"{summary['mean_steps']:.1f} steps.")
+
+    def _log_exact_baseline(self):
+        """
+        Compares the learned greedy policy with the exact optimal return. Room 2's planner is
+        cheap enough to run every time; Room 3's solver is only available when it warm-started the agent.
+        """
+        solver = getattr(self.agent, 'exact_solver', None)
+        if solver is None and isinstance(self.env, SecondEscapeRoom):
+            try:
+                solver = PatrolPlanner(self.env, self.agent.gamma).solve()
+            except ValueError as e:
+                self.log_message(f"Exact planner skipped: {e}")
+                return
+        if solver is None: return
+        achieved = solver.evaluate_policy(self.agent.policy)
+        self.log_message(f"Exact solution: optimal return {solver.start_value:.2f}, learned policy {achieved:.2f}.")
 
     def _update_slow_train_step(self):
         if self.agent.training_type == 'iterative':
             self.training_iteration += 1
             converged, delta = self.agent.train_step()
             self.agent.extract_policy()
+            self.log_message(f"  ... item layer {self.training_iteration} of {len(self.agent.layers)} solved.")
             if converged:
-                self.log_message(f"DP converged in {self.training_iteration} iterations.")
+                self.log_message(f"DP converged after {self.agent.state_updates} state updates.")
                 self.is_training_paused = True
         else:
             if hasattr(self.agent, 'train_step_by_step'):
@@ -700,7 +1103,7 @@ class PygameVisualizer:
                  self.agent.extract_policy()
                  if self.agent.slow_train_path:
                      pos = self.agent.slow_train_path[-1][:2]
-                     self.hero_sprite.rect.topleft = (pos[1] * CELL_SIZE, pos[0] * CELL_SIZE)
+                     self._move_hero(pos)
                      self.hero_sprite.set_state('idle')
             else:
                  self.log_message("This agent does not support step-by-step training.", "WARNING")
@@ -713,44 +1116,35 @@ class PygameVisualizer:
             self.prev_enemy_pos = self.env.enemy_pos
             self.enemy_sprite.set_state('idle')
         
-        if isinstance(self.env, ThirdEscapeRoom):
-            self.animation_state = (*self.env.start_pos, 
-                                    *self.env.original_plank1_pos, 
-                                    *self.env.original_plank2_pos, 
-                                    0, 0)
-        elif isinstance(self.agent, DynamicProgrammingAgent):
-            start_items = self.editor_settings.get("Start with Items", "None")
-            start_bag = 1 if start_items in ["Bag", "Both"] else 0
-            start_rope = 1 if start_items in ["Rope", "Both"] else 0
-            self.animation_state = (*self.env.start_pos, start_bag, start_rope)
-        elif isinstance(self.agent, (SarsaAgent, QLearningAgent)):
-            self.animation_state = (*self.env.start_pos, 0)
-        
-        pos = self.env.start_pos
-        self.hero_sprite.rect.topleft = (pos[1] * CELL_SIZE, pos[0] * CELL_SIZE)
+        self.animation_state = self.env.get_start_state(self.editor_settings)
+        # The whole run is computed up front and then replayed one frame per animation tick
+        self.animation_frames = greedy_rollout(self.env, self.agent.policy_table, self.animation_state)
+        
+        self._move_hero(self.env.start_pos)
         self.hero_sprite.set_state('run')
 
         self.animation_step = 0; self.log_message("Run started.")
         self.animation_total_reward = 0
 
     def _update_animation_step(self):
-        if isinstance(self.agent, DynamicProgrammingAgent):
-            action = self.agent.policy[self.animation_state]
-        else:
-            action = self.agent.policy.get(self.animation_state)
-
-        if action is None:
+        if self.animation_step >= len(self.animation_frames):
+            self._handle_run_end(False, "Max steps reached")
+            return
+        frame = self.animation_frames[self.animation_step]
+        if frame['action'] is None:
             self._handle_run_end(False, "No policy for state")
             return
 
         prev_pos = self.animation_state[:2]
-        next_state, reward, done = self.env.step(self.animation_state, action)
+        next_state, reward, done = frame['state'], frame['reward'], frame['done']
+        if 'enemy_pos' in frame:
+            self.env.enemy_pos = frame['enemy_pos']
         self.animation_total_reward += (self.agent.gamma ** self.animation_step) * reward
         self.animation_state = next_state
         self.animation_step += 1
 
         current_pos = self.animation_state[:2]
-        self.hero_sprite.rect.topleft = (current_pos[1] * CELL_SIZE, current_pos[0] * CELL_SIZE)
+        self._move_hero(current_pos)
         
         dx = current_pos[1] - prev_pos[1]
         if dx > 0: self.hero_sprite.flip = False
@@ -810,7 +1204,8 @@ class PygameVisualizer:
                     current_episode = getattr(self.agent, 'training_episode_count', 0)
                     max_episodes = self.agent.max_episodes
                     if current_episode < target_episode <= max_episodes:
-                        self._run_skip_training(target_episode)
+                        with self.sampler.operation("skip-to"):
+                            self._run_skip_training(target_episode)
                     else:
                         self.log_message(f"Invalid episode. Enter a number between {current_episode+1} and {max_episodes}.")
                 except ValueError:
@@ -852,34 +1247,20 @@ class PygameVisualizer:
             return
 
         self.log_message(f"Skipping training to episode {target_episode}...")
+        self.profiler.reset()
         for i in range(num_episodes_to_run):
             self.agent.train_step()
         
         self.agent.extract_policy()
+        self._log_exact_baseline()
+        self._dump_profile("skip_to")
         if hasattr(self.agent, 'slow_train_episode_active'):
             self.agent.slow_train_episode_active = False
 
         if hasattr(self.agent, 'slow_train_path'):
-            if isinstance(self.env, ThirdEscapeRoom):
-                if hasattr(self.env, 'original_plank1_pos'): 
-                    initial_state = (*self.env.start_pos, 
-                                     *self.env.original_plank1_pos, 
-                                     *self.env.original_plank2_pos, 
-                                     0, 0)
-                else: 
-                    initial_state = (*self.env.start_pos, *self.env.original_plank_pos, 0)
-            elif isinstance(self.agent, DynamicProgrammingAgent):
-                start_items = self.editor_settings.get("Start with Items", "None")
-                start_bag = 1 if start_items in ["Bag", "Both"] else 0
-                start_rope = 1 if start_items in ["Rope", "Both"] else 0
-                initial_state = (*self.env.start_pos, start_bag, start_rope)
-            elif isinstance(self.agent, (SarsaAgent, QLearningAgent)):
-                initial_state = (*self.env.start_pos, 0)
-            
-            self.agent.slow_train_path = [initial_state]
+            self.agent.slow_train_path = [self.env.get_start_state(self.editor_settings)]
             
-            start_pos_coords = self.env.start_pos
-            self.hero_sprite.rect.topleft = (start_pos_coords[1] * CELL_SIZE, start_pos_coords[0] * CELL_SIZE)
+            self._move_hero(self.env.start_pos)
             self.hero_sprite.set_state('idle')
         
         self.log_message(f"Training skipped to episode {self.agent.training_episode_count}.")
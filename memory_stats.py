@@ -0,0 +1,102 @@
+import sys
+import numpy as np
+from collections import deque
+
+from q_tables import ArrayQTable
+
+# Structures that can grow while an agent trains, in the order they are reported
+TRACKED_STRUCTURES = ['q_table', 'policy', 'value_function', 'action_counts', 'slow_train_path', 'episode_rewards', 'episode_steps']
+
+
+def deep_sizeof(obj):
+    """Recursive size in bytes of containers of plain Python objects and NumPy arrays."""
+    if isinstance(obj, np.ndarray):
+        size = sys.getsizeof(obj) + (0 if obj.flags.owndata else obj.nbytes)
+        if obj.dtype == object:
+            size += sum(sys.getsizeof(item) for item in obj.flat if item is not None)
+        return size
+    if isinstance(obj, ArrayQTable):
+        return obj.nbytes()
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item) for item in obj)
+    return size
+
+
+def estimate_sizeof(obj, sample_size=64):
+    """
+    Cheap size estimate for large containers: the container itself plus the average
+    deep size of its first few elements, scaled to the number of elements.
+    """
+    if isinstance(obj, (np.ndarray, ArrayQTable)) or not hasattr(obj, '__len__') or len(obj) <= sample_size:
+        return deep_sizeof(obj)
+    if isinstance(obj, dict):
+        sample = [deep_sizeof(k) + deep_sizeof(v) for _, (k, v) in zip(range(sample_size), obj.items())]
+    else:
+        sample = [deep_sizeof(item) for _, item in zip(range(sample_size), obj)]
+    return sys.getsizeof(obj) + int(len(obj) * sum(sample) / len(sample))
+
+
+def measure_structures(owner, names=TRACKED_STRUCTURES, extra=None):
+    """Returns {name: {'entries': n, 'bytes': b}} for the named attributes of owner, plus any extra objects."""
+    objects = {name: getattr(owner, name) for name in names if getattr(owner, name, None) is not None}
+    objects.update(extra or {})
+    report = {}
+    for name, obj in objects.items():
+        entries = obj.size if isinstance(obj, np.ndarray) else len(obj)
+        report[name] = {'entries': entries, 'bytes': estimate_sizeof(obj)}
+    return report
+
+
+class MemoryMonitor:
+    """
+    Tracks how much memory an episodic agent's tables use as training goes on.
+    Every `sample_every` episodes it measures the agent's structures, computes their
+    growth per episode and, once `budget_mb` is exceeded, converts the Q-table to the
+    compact ArrayQTable representation. Warnings are queued in `events` for the UI.
+    """
+    def __init__(self, budget_mb=0.0, sample_every=100):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.sample_every = sample_every
+        self.samples = deque(maxlen=2)  # (episode, report)
+        self.events = []
+        self.over_budget = False
+
+    def on_episode_end(self, agent):
+        if agent.training_episode_count % self.sample_every:
+            return
+        report = measure_structures(agent)
+        self.samples.append((agent.training_episode_count, report))
+        if self.budget_bytes > 0:
+            self._enforce_budget(agent, report)
+
+    def _enforce_budget(self, agent, report):
+        total = sum(entry['bytes'] for entry in report.values())
+        if total <= self.budget_bytes:
+            self.over_budget = False
+            return
+        if not isinstance(agent.q_table, ArrayQTable):
+            agent.q_table = ArrayQTable.from_mapping(agent.q_table, agent.env.action_space)
+            compacted = deep_sizeof(agent.q_table)
+            self.events.append(f"Memory budget exceeded ({total / 2**20:.1f} MB). Q-table compacted to {compacted / 2**20:.1f} MB.")
+        elif not self.over_budget:
+            self.events.append(f"Memory budget exceeded ({total / 2**20:.1f} MB) even with a compact Q-table.")
+        self.over_budget = True
+
+    def growth_rates(self):
+        """Returns {name: (entries per episode, bytes per episode)} between the last two samples."""
+        if len(self.samples) < 2:
+            return {}
+        (episode0, report0), (episode1, report1) = self.samples
+        episodes = max(1, episode1 - episode0)
+        return {
+            name: ((entry['entries'] - report0.get(name, {}).get('entries', 0)) / episodes,
+                   (entry['bytes'] - report0.get(name, {}).get('bytes', 0)) / episodes)
+            for name, entry in report1.items()
+        }
+
+    def pop_events(self):
+        events, self.events = self.events, []
+        return events
@@ -0,0 +1,335 @@
+import os
+import random
+import multiprocessing
+from multiprocessing.connection import wait
+from concurrent.futures import ProcessPoolExecutor
+
+from agent_sarsa import SarsaAgent
+
+# Settings that only make sense for the learner; actors learn one step at a time on their own copy
+LEARNER_ONLY_SETTINGS = {'Warm Start': 'None', 'Experience Replay': 'Off', 'Planning Steps': '0', 'Lambda': '0', 'Evaluate Every': '0'}
+
+# Hogwild workers attach to the learner's shared table instead of creating or seeding their own, and do not evaluate
+HOGWILD_WORKER_SETTINGS = {'Warm Start': 'None', 'Shared Q-Table': 'Off', 'Evaluate Every': '0'}
+
+_actor = None  # Per-process actor, set up once by _init_actor or _init_hogwild
+_progress = None  # Per-worker episode counters of a Hogwild run, shared with the starting process
+_stop = None  # Set by the starting process, or by a worker that converged, to end a Hogwild run early
+
+
+def _init_actor(env, AgentClass, settings, q_rows):
+    """Builds the actor's own agent and seeds its Q-table with the learner's rows."""
+    global _actor
+    random.seed(int.from_bytes(os.urandom(4), 'little'))
+    env.discard_slip_draws()
+    _actor = AgentClass(env, {**settings, **LEARNER_ONLY_SETTINGS})
+    _actor.q_table.update(q_rows)
+
+
+def _update_local(agent, state, action, reward, next_state, done, next_action):
+    """
+    One-step update of the actor's own Q-table, so it steers away from what it has just
+    tried within the episode as a single-process agent would. These values never reach
+    the learner; the next refresh overwrites them.
+    """
+    reward = agent._shaped_reward(state, reward, next_state, done)
+    if isinstance(agent, SarsaAgent):
+        agent._update_q(state, action, reward, next_state, next_action)
+    else:
+        agent._update_q(state, action, reward, next_state)
+
+
+def play_episode(agent, updated=None):
+    """
+    Plays one epsilon-greedy episode on the agent's own Q-table. Returns (transitions,
+    total_reward) with one (state, action, reward, next_state, done, next_action) tuple
+    per step; next_action is the action the actor went on to take, which SARSA needs.
+    With `updated` given, it records every state the episode updates there as
+    (Q-values before its first update, {action: updates}), for q_deltas.
+    """
+    env = agent.env
+    env.reset_state()
+    state = env.get_start_state()
+    action = agent.choose_action(state)
+    transitions, total_reward, done = [], 0.0, False
+    while action is not None and not done and len(transitions) < agent.max_steps:
+        next_state, reward, done = env.step(state, action)
+        total_reward += reward
+        next_action = None if done else agent.choose_action(next_state)
+        if updated is not None:
+            entry = updated.get(state)
+            if entry is None:
+                entry = updated[state] = (dict(agent.q_table[state]), {})
+            entry[1][action] = entry[1].get(action, 0) + 1
+        _update_local(agent, state, action, reward, next_state, done, next_action)
+        transitions.append((state, action, reward, next_state, done, next_action))
+        state, action = next_state, next_action
+    return transitions, total_reward
+
+
+def _act(q_rows, epsilon, episodes):
+    """Worker task: refreshes the actor's Q-table from the learner, then plays a batch of episodes."""
+    _actor.q_table.update(q_rows)
+    _actor.epsilon = epsilon
+    return [play_episode(_actor) for _ in range(episodes)]
+
+
+def q_deltas(agent, updated):
+    """
+    What the agent's updates since `updated` was started did, as {state: {action: (target,
+    weight)}}. k updates with step size alpha move a value the fraction weight = 1 - (1 -
+    alpha)^k of the way to the mean target they bootstrapped from, so the learner can replay
+    them as one step of that size from its own current value. Adding the raw changes
+    instead overshoots: every actor that visits a pair often moves it nearly all the way to
+    the target, and two such changes added together go past it.
+    """
+    deltas = {}
+    for state, (before, visits) in updated.items():
+        after = agent.q_table[state]
+        changes = {}
+        for action, count in visits.items():
+            weight = 1 - (1 - agent.alpha) ** count
+            if weight > 0:
+                changes[action] = (before[action] + (after[action] - before[action]) / weight, weight)
+        deltas[state] = changes
+    return deltas
+
+
+def _act_deltas(q_rows, epsilon, episodes):
+    """
+    Worker task when the learner takes Q deltas: refreshes the actor's Q-table, plays a batch
+    of episodes, and returns what its own updates changed (q_deltas), its action counts and
+    one (total_reward, steps, visited states, reached_exit) summary per episode.
+    """
+    _actor.q_table.update(q_rows)
+    _actor.epsilon = epsilon
+    updated, action_counts, summaries = {}, {}, []
+    for _ in range(episodes):
+        transitions, total_reward = play_episode(_actor, updated)
+        for state, action, *_ in transitions:
+            if action in ['up', 'down', 'left', 'right']:
+                counts = action_counts.setdefault(state[:2], {})
+                counts[action] = counts.get(action, 0) + 1
+        reached_exit = bool(transitions) and transitions[-1][4] and transitions[-1][2] > 0
+        summaries.append((total_reward, len(transitions), {transition[0] for transition in transitions}, reached_exit))
+    return q_deltas(_actor, updated), action_counts, summaries
+
+
+def _actor_process(connection, env, AgentClass, settings, q_rows, deltas_mode):
+    """
+    Body of one train_parallel actor process: sets up the actor once, then plays one batch
+    for every (q_rows, epsilon, episodes) request on the connection and sends back what
+    _act_deltas or _act returns, until it receives None. An error is sent back in place of
+    the batch.
+    """
+    _init_actor(env, AgentClass, settings, q_rows)
+    task = _act_deltas if deltas_mode else _act
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        try:
+            result = task(*request)
+        except Exception as error:
+            result = error
+        connection.send(result)
+
+
+def learns_from_deltas(agent):
+    """Whether the learner can take the actors' Q deltas. Replay, planning and traces learn from the transitions themselves."""
+    return not (getattr(agent, 'experience_replay', False) or getattr(agent, 'planning_steps', 0) > 0 or agent.trace_lambda > 0)
+
+
+def apply_q_deltas(agent, deltas, action_counts):
+    """Steps the learner's Q-values by an actor's q_deltas and adds its action counts to the learner's."""
+    for state, changes in deltas.items():
+        q_values = agent.q_table[state]
+        for action, (target, weight) in changes.items():
+            q_values[action] += weight * (target - q_values[action])
+    for pos, counts in action_counts.items():
+        for action, count in counts.items():
+            agent.action_counts[pos][action] += count
+
+
+def q_rows(agent, states):
+    """{state: {action: Q}} copied from the learner's Q-table for the given states."""
+    rows = {}
+    for state in states:
+        q_values = agent.q_table.get(state)
+        if q_values is not None:
+            rows[state] = {action: float(q_values[action]) for action in agent.env.action_space}
+    return rows
+
+
+def train_parallel(agent, num_episodes, workers, sync_every=25):
+    """
+    Actor-learner training. `workers` actor processes play episodes of the agent's room,
+    each with its own epsilon (the learner's raised to a power between 1 and 1/2, so some
+    actors keep exploring longer) and its own copy of the Q-table. The single learner,
+    `agent` in this process, owns the real Q-table. Actors learn as they play, so by
+    default they return what their updates did (q_deltas) and the learner applies it with
+    one step per updated value, instead of redoing every update. With replay, planning or
+    traces on, the learner needs the transitions themselves: actors return those and the
+    learner learns from them in arrival order through learn_from_episode. Each actor is a
+    process of its own that lives for the whole run, so each batch of sync_every episodes
+    sends it exactly the learner's rows for every state learned since its last batch.
+    Stops early once the learner's convergence monitor says so.
+    """
+    workers = max(1, int(workers))
+    pending = [{} for _ in range(workers)]  # Rows not yet sent to each actor
+    initial = q_rows(agent, list(agent.q_table.keys()))
+    deltas_mode = learns_from_deltas(agent)
+    episodes_done = assigned = 0
+    connections, actors, busy = [], [], {}
+    try:
+        for worker in range(workers):
+            connection, actor_end = multiprocessing.Pipe()
+            actor = multiprocessing.Process(target=_actor_process, daemon=True,
+                                            args=(actor_end, agent.env, type(agent), agent.settings, initial, deltas_mode))
+            actor.start()
+            actor_end.close()
+            connections.append(connection)
+            actors.append(actor)
+
+        def submit(worker):
+            nonlocal assigned
+            episodes = min(sync_every, num_episodes - assigned)
+            assigned += episodes
+            epsilon = agent.epsilon ** (1 / (1 + worker / max(1, workers - 1)))
+            updates, pending[worker] = pending[worker], {}
+            connections[worker].send((updates, epsilon, episodes))
+            busy[connections[worker]] = worker
+
+        for worker in range(workers):
+            if assigned < num_episodes:
+                submit(worker)
+        while busy and not agent.convergence.converged:
+            for connection in wait(list(busy)):
+                worker = busy.pop(connection)
+                result = connection.recv()
+                if isinstance(result, Exception):
+                    raise result
+                if agent.convergence.converged: continue
+                if deltas_mode:
+                    deltas, action_counts, summaries = result
+                    apply_q_deltas(agent, deltas, action_counts)
+                    for summary in summaries:
+                        if agent.convergence.converged: break
+                        agent.record_episode(*summary)
+                        episodes_done += 1
+                    touched = deltas.keys()
+                else:
+                    touched = set()
+                    for transitions, total_reward in result:
+                        if agent.convergence.converged: break
+                        agent.learn_from_episode(transitions, total_reward)
+                        touched.update(transition[0] for transition in transitions)
+                        episodes_done += 1
+                updates = q_rows(agent, touched)
+                for queued in pending:
+                    queued.update(updates)
+                if assigned < num_episodes and not agent.convergence.converged:
+                    submit(worker)
+    finally:
+        # Idle actors stop when told to; a batch still being played after an early stop or an error is dropped
+        for worker, actor in enumerate(actors):
+            if worker in busy.values():
+                actor.terminate()
+            else:
+                try:
+                    connections[worker].send(None)
+                except OSError:
+                    actor.terminate()
+        for actor in actors:
+            actor.join()
+        for connection in connections:
+            connection.close()
+    return episodes_done
+
+
+def _init_hogwild(env, AgentClass, settings, q_table, progress, stop):
+    """Hogwild worker initializer: a full agent of its own, learning straight into the shared Q-table."""
+    global _actor, _progress, _stop
+    random.seed(int.from_bytes(os.urandom(4), 'little'))
+    env.discard_slip_draws()
+    _actor = AgentClass(env, {**settings, **HOGWILD_WORKER_SETTINGS})
+    _actor.q_table = q_table
+    _progress = progress
+    _stop = stop
+
+
+def _train_hogwild(worker, episodes, epsilon, epsilon_decay):
+    """
+    Hogwild worker task: plain train_step episodes, without locks. A worker whose own
+    convergence monitor stops early stops every worker. Returns the worker's own bookkeeping.
+    """
+    _actor.epsilon, _actor.epsilon_decay = epsilon, epsilon_decay
+    for _ in range(episodes):
+        if _stop.value: break
+        _actor.train_step()
+        _progress[worker] += 1
+        if _actor.convergence.converged:
+            _stop.value = 1
+    counts = {pos: dict(actions) for pos, actions in _actor.action_counts.items()}
+    return _actor.episode_rewards, _actor.episode_steps, counts
+
+
+class HogwildRun:
+    """
+    Hogwild training in the background. `workers` processes each run a share of the
+    episodes as ordinary Q-learning agents whose Q-table is the learner's SharedQTable,
+    so all of them, and the process that started the run, read and write the same values
+    as training goes on. Each worker decays epsilon as if it had played every worker's
+    episodes, so the schedule matches a single-process run of the same length. Nothing is
+    merged until finish() folds the workers' rewards, steps and action counts into the agent.
+    """
+    def __init__(self, agent, num_episodes, workers):
+        self.agent = agent
+        self.workers = max(1, int(workers))
+        self.num_episodes = num_episodes
+        self.progress = multiprocessing.Array('q', self.workers, lock=False)
+        self.stop = multiprocessing.Value('b', 0, lock=False)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_hogwild,
+                                            initargs=(agent.env, type(agent), agent.settings, agent.q_table, self.progress, self.stop))
+        decay = agent.epsilon_decay ** self.workers
+        shares = [num_episodes // self.workers + (worker < num_episodes % self.workers) for worker in range(self.workers)]
+        self.futures = [self.executor.submit(_train_hogwild, worker, share, agent.epsilon, decay)
+                        for worker, share in enumerate(shares)]
+
+    @property
+    def episodes_done(self):
+        return sum(self.progress)
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def cancel(self):
+        """Tells the workers to stop after their current episode and drops the results; what they learned stays in the table."""
+        self.stop.value = 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self):
+        """Waits for the workers, folds their bookkeeping into the agent in round-robin order and returns the episode count."""
+        results = [future.result() for future in self.futures]
+        self.executor.shutdown()
+        agent = self.agent
+        played = sum(len(rewards) for rewards, _, _ in results)
+        for step in range(max((len(rewards) for rewards, _, _ in results), default=0)):
+            for rewards, steps, _ in results:
+                if step < len(rewards):
+                    agent.episode_rewards.append(rewards[step])
+                    agent.episode_steps.append(steps[step])
+        for _, _, counts in results:
+            for pos, actions in counts.items():
+                for action, count in actions.items():
+                    agent.action_counts[pos][action] += count
+        agent.training_episode_count += played
+        agent.epsilon = max(agent.min_epsilon, agent.epsilon * agent.epsilon_decay ** played)
+        if played < self.num_episodes and self.stop.value:
+            agent.convergence.stopped_at = agent.training_episode_count
+        return played
+
+
+def train_hogwild(agent, num_episodes, workers):
+    """Runs Hogwild training on the agent's SharedQTable to completion."""
+    return HogwildRun(agent, num_episodes, workers).finish()
@@ -48,6 +48,8 @@ class PlotViewer:
             self._plot_steps(data)
         elif plot_type == 'action_schema':
             self._plot_action_schema(data)
+        elif plot_type == 'evaluation':
+            self._plot_evaluation(data)
 
         # Re-add buttons after clearing
         self._add_buttons()
@@ -81,6 +83,27 @@ class PlotViewer:
         self.ax.tick_params(axis='both', which='major', labelsize=12)
         plt.tight_layout(rect=[0, 0.1, 1, 0.95])
 
+    def _plot_evaluation(self, evaluations):
+        self.ax.set_title(f'Greedy Policy Evaluations for {self.agent_name}', fontsize=18, weight='bold')
+        episodes = [episode for episode, _ in evaluations]
+        summaries = [summary for _, summary in evaluations]
+
+        self.ax.plot(episodes, [s['mean_return'] for s in summaries], color='crimson', linewidth=2.5, marker='o', label='Mean Discounted Return')
+        self.ax.fill_between(episodes, [s['return_p10'] for s in summaries], [s['return_p90'] for s in summaries],
+                             color='crimson', alpha=0.15, label='10th-90th Percentile')
+        self.ax.set_xlabel("Episode", fontsize=14)
+        self.ax.set_ylabel("Discounted Return", fontsize=14)
+        success_ax = self.ax.twinx()
+        success_ax.plot(episodes, [100 * s['success_rate'] for s in summaries], color='darkgreen', linewidth=2, linestyle='--', label='Success Rate')
+        success_ax.set_ylabel("Success Rate (%)", fontsize=14)
+        success_ax.set_ylim(0, 105)
+        lines, labels = self.ax.get_legend_handles_labels()
+        success_lines, success_labels = success_ax.get_legend_handles_labels()
+        self.ax.legend(lines + success_lines, labels + success_labels, fontsize=12)
+        self.ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+        self.ax.tick_params(axis='both', which='major', labelsize=12)
+        plt.tight_layout(rect=[0, 0.1, 1, 0.95])
+
     def _plot_action_schema(self, action_counts):
         self.ax.set_title(f'Action Frequencies per Cell', fontsize=18, weight='bold', pad=20)
         size = self.grid.shape[0]
@@ -0,0 +1,147 @@
+import os
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from batched_env import BATCHED_ROOMS, batch_rooms
+from policy_tables import PolicyTable, NO_ACTION
+
+PERCENTILES = (10, 50, 90)  # Percentiles of the discounted return and of the steps that a summary reports
+
+
+def greedy_policy_table(agent):
+    """
+    The agent's current greedy policy as a PolicyTable. Episodic agents read it straight
+    from the Q-table, so this works mid-training without marking the agent trained; DP
+    agents use the table of their last policy extraction.
+    """
+    if hasattr(agent, 'greedy_policy'):
+        return PolicyTable.from_policy(agent.env, agent.greedy_policy())
+    return agent.policy_table
+
+
+def summarize_rollouts(returns, steps, successes):
+    """Success rate, mean and percentile discounted return, and mean and percentile steps of a set of rollouts."""
+    returns, steps = np.asarray(returns, dtype=float), np.asarray(steps, dtype=float)
+    summary = {
+        'rollouts': len(returns),
+        'success_rate': float(np.mean(successes)),
+        'mean_return': float(returns.mean()),
+        'mean_steps': float(steps.mean()),
+    }
+    for q, return_q, steps_q in zip(PERCENTILES, np.percentile(returns, PERCENTILES), np.percentile(steps, PERCENTILES)):
+        summary[f'return_p{q}'] = float(return_q)
+        summary[f'steps_p{q}'] = float(steps_q)
+    return summary
+
+
+def _batched_rollouts(env, policy_table, rollouts, gamma, max_steps, start_state, seed):
+    """
+    All rollouts at once on a BatchedRooms of `rollouts` copies of the layout. A row counts
+    until its first episode ends or it reaches a state without an action; after that the
+    batch keeps stepping it, but nothing it does is recorded.
+    """
+    batch = batch_rooms([env] * rollouts, max_steps, seed)
+    batch.states[:] = start_state
+    returns = np.zeros(rollouts)
+    steps = np.zeros(rollouts, dtype=np.int64)
+    successes = np.zeros(rollouts, dtype=bool)
+    running = np.ones(rollouts, dtype=bool)
+    discount = 1.0
+    for _ in range(max_steps):
+        codes = policy_table.lookup_codes(batch.encoded_states()).astype(np.int64)
+        running &= codes != NO_ACTION
+        if not running.any():
+            break
+        _, rewards, done, _ = batch.step(np.maximum(codes, 0))
+        returns += np.where(running, discount * rewards, 0.0)
+        steps += running
+        successes |= running & done & (rewards > 0)
+        running &= ~done
+        discount *= gamma
+    return returns, steps, successes
+
+
+def _rollouts(env, policy_table, rollouts, gamma, max_steps, start_state):
+    """Rollouts one at a time with the room's own step. Returns (returns, steps, successes) lists."""
+    returns, steps, successes = [], [], []
+    for _ in range(rollouts):
+        env.reset_state()
+        state, total, discount, step, success = start_state, 0.0, 1.0, 0, False
+        while step < max_steps:
+            action = policy_table.action_for(env, state)
+            if action is None:
+                break
+            state, reward, done = env.step(state, action)
+            total += discount * reward
+            discount *= gamma
+            step += 1
+            if done:
+                success = reward > 0
+                break
+        returns.append(total)
+        steps.append(step)
+        successes.append(success)
+    env.reset_state()
+    return returns, steps, successes
+
+
+def _worker_rollouts(env, policy_table, rollouts, gamma, max_steps, start_state):
+    """Process pool task: reseeds the worker so its slips differ from the other workers', then runs its share of the rollouts."""
+    random.seed(int.from_bytes(os.urandom(4), 'little'))
+    env.discard_slip_draws()
+    return _rollouts(env, policy_table, rollouts, gamma, max_steps, start_state)
+
+
+def evaluate_policy(env, policy_table, rollouts=100, gamma=0.9, max_steps=200, start_state=None, seed=None, workers=1):
+    """
+    Runs `rollouts` episodes of a greedy policy from the start state and summarizes them with
+    summarize_rollouts. An episode is a success when it ends on a positive reward. A layout
+    without slippery tiles is deterministic, so one episode is played and counted `rollouts`
+    times. Otherwise Rooms 1 and 2 step every rollout together with NumPy (batched_env.py)
+    and other rooms roll out one episode at a time, split over `workers` processes when
+    there is more than one.
+    """
+    start_state = start_state or env.get_start_state()
+    if not env.slip_actions:
+        # Slips are the rooms' only randomness: without them every rollout is the same episode
+        returns, steps, successes = _rollouts(env, policy_table, 1, gamma, max_steps, start_state)
+        return summarize_rollouts(returns * rollouts, steps * rollouts, successes * rollouts)
+    if type(env) in BATCHED_ROOMS:
+        return summarize_rollouts(*_batched_rollouts(env, policy_table, rollouts, gamma, max_steps, start_state, seed))
+    workers = max(1, min(int(workers), rollouts))
+    if workers == 1:
+        return summarize_rollouts(*_rollouts(env, policy_table, rollouts, gamma, max_steps, start_state))
+    shares = [rollouts // workers + (worker < rollouts % workers) for worker in range(workers)]
+    returns, steps, successes = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_worker_rollouts, env, policy_table, share, gamma, max_steps, start_state) for share in shares]
+        for future in futures:
+            share_returns, share_steps, share_successes = future.result()
+            returns += share_returns
+            steps += share_steps
+            successes += share_successes
+    return summarize_rollouts(returns, steps, successes)
+
+
+def evaluate_agent(agent, rollouts=100, start_state=None, seed=None, workers=1):
+    """evaluate_policy on the agent's current greedy policy, with its discount and step limit."""
+    return evaluate_policy(agent.env, greedy_policy_table(agent), rollouts, agent.gamma,
+                           getattr(agent, 'max_steps', 200), start_state, seed, workers)
+
+
+class PolicyEvaluator:
+    """
+    Evaluates an episodic agent's greedy policy every `every` training episodes (0 turns it
+    off) and keeps (episode, summary) pairs in `history`. On Rooms 1 and 2 an evaluation of
+    100 rollouts costs about as much as a few training episodes.
+    """
+    def __init__(self, every=0, rollouts=100):
+        self.every = every
+        self.rollouts = rollouts
+        self.history = []
+
+    def on_episode_end(self, agent):
+        if not self.every or agent.training_episode_count % self.every:
+            return
+        self.history.append((agent.training_episode_count, evaluate_agent(agent, self.rollouts)))
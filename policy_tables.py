@@ -0,0 +1,105 @@
+import numpy as np
+
+NO_ACTION = -1
+DENSE_STATE_LIMIT = 1 << 22  # Above this many encoded states the table only stores the states it knows
+
+
+class PolicyTable:
+    """
+    A greedy policy stored as int8 action codes indexed by the room's encoded state.
+    Small state spaces use a dense array; larger ones (Room 3) keep a sorted array of
+    encoded states next to the codes and look states up with a binary search.
+    """
+    def __init__(self, action_names, actions, keys=None):
+        self.action_names = list(action_names)
+        self.actions = actions
+        self.keys = keys
+
+    @classmethod
+    def from_policy(cls, env, policy):
+        """Builds a table from a {state: action} dict or a DP policy array indexed by state tuples."""
+        action_names = list(env.action_space)
+        codes = {name: code for code, name in enumerate(action_names)}
+        if isinstance(policy, np.ndarray):
+            items = ((state, policy[state]) for state in np.ndindex(policy.shape))
+        else:
+            items = policy.items()
+        encoded = [(env.encode_state(state), codes[action]) for state, action in items if action is not None]
+
+        num_states = env.num_encoded_states()
+        if num_states <= DENSE_STATE_LIMIT:
+            actions = np.full(num_states, NO_ACTION, dtype=np.int8)
+            if encoded:
+                indices, action_codes = zip(*encoded)
+                actions[list(indices)] = action_codes
+            return cls(action_names, actions)
+
+        encoded.sort()
+        keys = np.array([index for index, _ in encoded], dtype=np.int64)
+        actions = np.array([code for _, code in encoded], dtype=np.int8)
+        return cls(action_names, actions, keys)
+
+    @property
+    def is_dense(self):
+        return self.keys is None
+
+    def __len__(self):
+        return int(np.count_nonzero(self.actions != NO_ACTION)) if self.is_dense else len(self.keys)
+
+    def lookup_codes(self, indices):
+        """Vectorized lookup: action codes for an array of encoded states, NO_ACTION where unknown."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if self.is_dense:
+            return self.actions[indices]
+        if not len(self.keys):
+            return np.full(indices.shape, NO_ACTION, dtype=np.int8)
+        positions = np.minimum(np.searchsorted(self.keys, indices), len(self.keys) - 1)
+        return np.where(self.keys[positions] == indices, self.actions[positions], NO_ACTION).astype(np.int8)
+
+    def action_for(self, env, state):
+        """The action name for a state tuple, or None if the policy has no action for it."""
+        code = int(self.lookup_codes([env.encode_state(state)])[0])
+        return None if code == NO_ACTION else self.action_names[code]
+
+    def dense_view(self, shape):
+        """The dense code array reshaped to the room's state dimensions, e.g. (size, size, 2, 2) for Room 1."""
+        return self.actions.reshape(shape)
+
+    def save(self, path):
+        """Exports the table as a compressed .npz file."""
+        arrays = {'actions': self.actions, 'action_names': np.array(self.action_names)}
+        if not self.is_dense:
+            arrays['keys'] = self.keys
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            keys = data['keys'] if 'keys' in data else None
+            return cls([str(name) for name in data['action_names']], data['actions'], keys)
+
+
+def greedy_rollout(env, policy_table, start_state, max_steps=200):
+    """
+    Follows the policy from start_state until the episode ends, the step limit is hit
+    or a state has no action. Returns one frame per step with the state reached, the
+    action taken, its reward and done flag, and the enemy position where the room has one.
+    The room is reset before and after, so the caller's view of it is left unchanged.
+    """
+    env.reset_state()
+    frames = []
+    state = start_state
+    for _ in range(max_steps):
+        action = policy_table.action_for(env, state)
+        if action is None:
+            frames.append({'state': state, 'action': None, 'reward': 0.0, 'done': False})
+            break
+        state, reward, done = env.step(state, action)
+        frame = {'state': state, 'action': action, 'reward': reward, 'done': done}
+        if getattr(env, 'enemy_pos', None) is not None:
+            frame['enemy_pos'] = env.enemy_pos
+        frames.append(frame)
+        if done:
+            break
+    env.reset_state()
+    return frames
@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+HISTOGRAM_BUCKETS = 40  # Bucket i holds durations in [2^(i-1), 2^i) nanoseconds
+
+
+class _TimedMethod:
+    """Wraps a bound method and reports every call to the profiler under a phase name."""
+    def __init__(self, profiler, method, phase):
+        self.profiler = profiler
+        self.method = method
+        self.phase = phase
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return self.method(*args, **kwargs)
+        finally:
+            self.profiler.record(self.phase, time.perf_counter_ns() - start)
+
+    def __reduce__(self):
+        # Objects copied to worker processes get the plain, untimed method back.
+        return (getattr, (self.method.__self__, self.method.__name__))
+
+
+class PhaseProfiler:
+    """
+    Wall-clock timing of named hot-path phases (env.step, choose_action, draw calls, ...).
+    Timing wrappers are only installed on the instrumented objects while the profiler
+    is enabled, so a disabled profiler adds no cost to the code it watches.
+    """
+    def __init__(self, output_dir="profiles"):
+        self.enabled = False
+        self.output_dir = output_dir
+        self.targets = []  # (obj, method_name, phase) registered for instrumentation
+        self.installed = []  # (obj, method_name) currently wrapped
+        self.reset()
+
+        self.frame_start = None
+        self.current_frame = defaultdict(int)
+        self.frame_history = deque(maxlen=60)  # (frame_ns, {phase: ns}) of recent frames
+        self.rate_samples = deque(maxlen=2)  # (time, env_steps, episodes)
+        self.rates = {'env_steps': 0.0, 'episodes': 0.0}
+
+    def reset(self):
+        """Clears the accumulated per-phase histograms."""
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(int)
+        self.histograms = defaultdict(lambda: [0] * HISTOGRAM_BUCKETS)
+
+    def set_targets(self, targets):
+        """Replaces the list of (obj, method_name, phase) to time, re-wrapping them if enabled."""
+        self._uninstall()
+        self.targets = list(targets)
+        if self.enabled:
+            self._install()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self._install()
+        else:
+            self._uninstall()
+            self.frame_history.clear()
+            self.rate_samples.clear()
+        return self.enabled
+
+    def _install(self):
+        for obj, method_name, phase in self.targets:
+            if obj is None or method_name in vars(obj):
+                continue
+            method = getattr(obj, method_name, None)
+            if method is None:
+                continue
+            setattr(obj, method_name, _TimedMethod(self, method, phase))
+            self.installed.append((obj, method_name))
+
+    def _uninstall(self):
+        for obj, method_name in self.installed:
+            if isinstance(vars(obj).get(method_name), _TimedMethod):
+                delattr(obj, method_name)
+        self.installed = []
+
+    def record(self, phase, duration_ns):
+        self.counts[phase] += 1
+        self.totals[phase] += duration_ns
+        self.histograms[phase][min(duration_ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.current_frame[phase] += duration_ns
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter_ns()
+        self.current_frame = defaultdict(int)
+
+    def end_frame(self, episodes):
+        """Closes the current frame and refreshes the steps/sec and episodes/sec rates about once per second."""
+        if self.frame_start is None:
+            return
+        self.frame_history.append((time.perf_counter_ns() - self.frame_start, dict(self.current_frame)))
+        self.frame_start = None
+
+        now = time.perf_counter()
+        if not self.rate_samples or now - self.rate_samples[-1][0] >= 1.0:
+            self.rate_samples.append((now, self.counts['env.step'], episodes))
+            if len(self.rate_samples) == 2:
+                (t0, steps0, episodes0), (t1, steps1, episodes1) = self.rate_samples
+                self.rates['env_steps'] = (steps1 - steps0) / (t1 - t0)
+                self.rates['episodes'] = max(0, episodes1 - episodes0) / (t1 - t0)
+
+    def frame_breakdown(self):
+        """Returns the mean frame time and mean per-phase time (both in ms) over the recent frames."""
+        if not self.frame_history:
+            return 0.0, {}
+        n = len(self.frame_history)
+        phase_totals = defaultdict(int)
+        for _, phases in self.frame_history:
+            for phase, ns in phases.items():
+                phase_totals[phase] += ns
+        mean_frame = sum(frame_ns for frame_ns, _ in self.frame_history) / n / 1e6
+        return mean_frame, {phase: ns / n / 1e6 for phase, ns in phase_totals.items()}
+
+    def _percentile_us(self, histogram, fraction):
+        target = fraction * sum(histogram)
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1000.0
+        return 0.0
+
+    def dump(self, label):
+        """Writes the per-phase histograms to a JSON file and returns its path, or None if nothing was recorded."""
+        if not self.counts:
+            return None
+        report = {'label': label, 'created': time.strftime("%Y-%m-%d %H:%M:%S"), 'phases': {}}
+        for phase, count in sorted(self.counts.items()):
+            histogram = self.histograms[phase]
+            report['phases'][phase] = {
+                'count': count,
+                'total_ms': self.totals[phase] / 1e6,
+                'mean_us': self.totals[phase] / count / 1000.0,
+                'p50_us': self._percentile_us(histogram, 0.5),
+                'p90_us': self._percentile_us(histogram, 0.9),
+                'p99_us': self._percentile_us(histogram, 0.99),
+                'histogram': [{'le_us': (1 << bucket) / 1000.0, 'count': n} for bucket, n in enumerate(histogram) if n],
+            }
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = "".join(ch if ch.isalnum() else "_" for ch in label)
+        path = os.path.join(self.output_dir, f"phases_{safe_label}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return path
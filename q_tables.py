@@ -0,0 +1,196 @@
+import sys
+import weakref
+import numpy as np
+from collections.abc import MutableMapping
+from multiprocessing import shared_memory
+
+SHARED_TABLE_LIMIT = 1 << 30  # Bytes of address space a SharedQTable may reserve for a room's encoded states
+
+
+class QRow(MutableMapping):
+    """A view of one state's action values inside an ArrayQTable, usable like the usual {action: value} dict."""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, action):
+        return float(self.table.values[self.row, self.table.action_index[action]])
+
+    def __setitem__(self, action, value):
+        self.table.values[self.row, self.table.action_index[action]] = value
+
+    def __delitem__(self, action):
+        raise TypeError("Actions cannot be removed from a Q-table row.")
+
+    def __iter__(self):
+        return iter(self.table.actions)
+
+    def __len__(self):
+        return len(self.table.actions)
+
+    def get(self, action, default=None):
+        column = self.table.action_index.get(action)
+        return default if column is None else float(self.table.values[self.row, column])
+
+    def values(self):
+        return self.table.values[self.row].tolist()
+
+    def items(self):
+        return list(zip(self.table.actions, self.table.values[self.row].tolist()))
+
+
+class ArrayQTable:
+    """
+    A compact Q-table: one float32 row per state in a single growable NumPy array,
+    with a dict from state to row number. Behaves like the defaultdict of dicts the
+    agents use by default, so it can be swapped in when memory runs short.
+    """
+    def __init__(self, actions, capacity=1024, dtype=np.float32):
+        self.actions = list(actions)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self.index = {}
+        self.states = []
+        self.values = np.zeros((capacity, len(self.actions)), dtype=dtype)
+
+    @classmethod
+    def from_mapping(cls, q_table, actions):
+        table = cls(actions, capacity=max(1024, len(q_table)))
+        for state, action_values in q_table.items():
+            row = table._insert(state)
+            for action, value in action_values.items():
+                table.values[row, table.action_index[action]] = value
+        return table
+
+    @classmethod
+    def from_arrays(cls, actions, states, values):
+        """Builds a table from a list of states and a matching (len(states), len(actions)) value array."""
+        table = cls(actions, capacity=max(1024, len(states)), dtype=np.float32)
+        table.states = list(states)
+        table.index = {state: row for row, state in enumerate(table.states)}
+        table.values[:len(states)] = values
+        return table
+
+    def _insert(self, state):
+        row = len(self.states)
+        if row == len(self.values):
+            grown = np.zeros((2 * len(self.values), len(self.actions)), dtype=self.values.dtype)
+            grown[:row] = self.values
+            self.values = grown
+        self.index[state] = row
+        self.states.append(state)
+        return row
+
+    def row_of(self, state):
+        """The row holding a state's values, adding a zero row for a new state. Rows never move."""
+        row = self.index.get(state)
+        return self._insert(state) if row is None else row
+
+    def __getitem__(self, state):
+        return QRow(self, self.row_of(state))
+
+    def get(self, state, default=None):
+        row = self.index.get(state)
+        return default if row is None else QRow(self, row)
+
+    def __contains__(self, state):
+        return state in self.index
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def keys(self):
+        return list(self.states)
+
+    def items(self):
+        return [(state, QRow(self, row)) for row, state in enumerate(self.states)]
+
+    def nbytes(self):
+        """Bytes used by the value array and the state index, with key sizes estimated from the first key."""
+        key_bytes = sys.getsizeof(self.states[0]) * len(self.states) if self.states else 0
+        return self.values.nbytes + sys.getsizeof(self.index) + sys.getsizeof(self.states) + key_bytes
+
+
+class SharedQTable(ArrayQTable):
+    """
+    A Q-table in a shared-memory block that several processes update at once, without
+    locks (Hogwild). Row i holds the values of the state the room encodes as i, so every
+    process finds a state's row without a shared index, and a byte per state records
+    which rows have been written. The block spans the room's whole encoded state space;
+    the OS only backs the pages that are actually touched. Pickling a table sends just the
+    room and the block's name, and unpickling attaches to the same block. The creating
+    process unlinks the block once its table is released or garbage collected.
+    """
+    def __init__(self, env, name=None):
+        self.env = env
+        self.actions = list(env.action_space)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        num_states = env.num_encoded_states()
+        row_bytes = len(self.actions) * np.dtype(np.float32).itemsize
+        size = num_states * (row_bytes + 1)
+        if size > SHARED_TABLE_LIMIT:
+            raise ValueError(f"{num_states} encoded states need {size / 2**20:.0f} MB; the shared Q-table is limited to {SHARED_TABLE_LIMIT / 2**20:.0f} MB.")
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.values = np.ndarray((num_states, len(self.actions)), dtype=np.float32, buffer=self.shm.buf)
+        self.visited = np.ndarray(num_states, dtype=np.uint8, buffer=self.shm.buf, offset=num_states * row_bytes)
+        self._unlink = weakref.finalize(self, self.shm.unlink) if name is None else None
+
+    def __getstate__(self):
+        return {'env': self.env, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['env'], state['name'])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def release(self):
+        """Unlinks the block if this process created it. Processes still attached keep their mapping."""
+        if self._unlink:
+            self._unlink()
+
+    def load(self, states, values):
+        """Writes a list of states and a matching (len(states), len(actions)) value array into the table."""
+        rows = np.fromiter((self.env.encode_state(state) for state in states), dtype=np.int64, count=len(states))
+        self.values[rows] = values
+        self.visited[rows] = 1
+
+    def _insert(self, state):
+        raise TypeError("Rows of a shared Q-table are fixed by the state encoding.")
+
+    def row_of(self, state):
+        row = self.env.encode_state(state)
+        self.visited[row] = 1
+        return row
+
+    def get(self, state, default=None):
+        row = self.env.encode_state(state)
+        return QRow(self, row) if self.visited[row] else default
+
+    def __contains__(self, state):
+        return bool(self.visited[self.env.encode_state(state)])
+
+    def __len__(self):
+        return int(np.count_nonzero(self.visited))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def _visited_rows(self):
+        # Scans a copy: other processes may mark rows while np.flatnonzero counts them
+        return np.flatnonzero(self.visited.copy()).tolist()
+
+    def keys(self):
+        return [self.env.decode_state(row) for row in self._visited_rows()]
+
+    def items(self):
+        return [(self.env.decode_state(row), QRow(self, row)) for row in self._visited_rows()]
+
+    def nbytes(self):
+        """Bytes backing the rows written so far plus the visited flags; untouched pages of the block cost nothing."""
+        return len(self) * self.values.shape[1] * self.values.itemsize + self.visited.nbytes
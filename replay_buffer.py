@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions for experience replay. States are stored
+    as ArrayQTable row numbers, so a sampled minibatch indexes the value array directly.
+    When the agent masks actions, the allowed actions of each next state are kept too.
+    """
+    def __init__(self, capacity, num_actions, with_masks=False):
+        self.capacity = max(1, int(capacity))
+        self.rows = np.zeros(self.capacity, dtype=np.int64)
+        self.actions = np.zeros(self.capacity, dtype=np.int8)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.next_rows = np.zeros(self.capacity, dtype=np.int64)
+        self.done = np.zeros(self.capacity, dtype=bool)
+        self.next_masks = np.ones((self.capacity, num_actions), dtype=bool) if with_masks else None
+        self.size = 0
+        self._next_slot = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, row, action, reward, next_row, done, next_mask=None):
+        """Stores one transition, overwriting the oldest once the buffer is full."""
+        slot = self._next_slot
+        self.rows[slot] = row
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.next_rows[slot] = next_row
+        self.done[slot] = done
+        if self.next_masks is not None:
+            self.next_masks[slot] = next_mask
+        self._next_slot = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size, rng):
+        """A uniform minibatch (with replacement) as (rows, actions, rewards, next_rows, done, next_masks)."""
+        picks = rng.integers(0, self.size, size=batch_size)
+        masks = None if self.next_masks is None else self.next_masks[picks]
+        return self.rows[picks], self.actions[picks], self.rewards[picks], self.next_rows[picks], self.done[picks], masks
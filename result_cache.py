@@ -0,0 +1,129 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+
+from constants import RESULT_CACHE_MB
+
+CACHE_FORMAT = 1  # Part of every key; bump it when training or the snapshots change so old entries stop matching
+
+
+def _canonical(value):
+    """
+    Turns layout and settings data into JSON-ready values that are equal exactly when the
+    data is: arrays keep their dtype and shape, NumPy scalars become Python ones, and
+    dicts and sets are sorted so their order does not matter.
+    """
+    if isinstance(value, np.ndarray):
+        return ['ndarray', value.dtype.str, list(value.shape), value.ravel().tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return ['dict', sorted(([_canonical(k), _canonical(v)] for k, v in value.items()), key=repr)]
+    if isinstance(value, (set, frozenset)):
+        return ['set', sorted((_canonical(v) for v in value), key=repr)]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def result_key(env, AgentClass, settings, seed=None):
+    """
+    The cache key of training AgentClass on env's current layout: a SHA-256 over the room's
+    layout_fingerprint, the agent class, every setting (as strings, the way the editor
+    hands them over) and the seed. Runs without a seed share one entry per layout and settings.
+    """
+    payload = {
+        'format': CACHE_FORMAT,
+        'room': type(env).__name__,
+        'layout': env.layout_fingerprint(),
+        'agent': AgentClass.__name__,
+        'settings': {name: str(value) for name, value in settings.items()},
+        'seed': seed,
+    }
+    encoded = json.dumps(_canonical(payload), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Trained snapshots (get_trained_state) on disk, one pickle per result_key. Reading an
+    entry refreshes its modification time, and every write deletes the least recently used
+    entries until the directory fits in max_mb. Entries are written under a temporary name
+    and renamed into place, so several processes can share a directory; an entry another
+    process evicts mid-read is a miss.
+    """
+    def __init__(self, directory="cache", max_mb=RESULT_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """The snapshot stored under key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def put(self, key, snapshot):
+        """Stores a snapshot under key, then evicts down to max_mb. A snapshot larger than the whole cache is not kept."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.evict()
+
+    def entries(self):
+        """(last used ns, bytes, path) of every entry, least recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes. Returns how many it deleted."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return evicted
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
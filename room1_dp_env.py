@@ -1,10 +1,13 @@
 import numpy as np
 import random
+from collections import deque
 from base_classes import BaseRoom
 from constants import EMPTY, WALL, START, EXIT, SLIPPERY, BAG, ROPE
 
 class FirstEscapeRoom(BaseRoom):
     """Room 1: Walls, slippery tiles, and items to collect in order."""
+    layout_attributes = BaseRoom.layout_attributes + ('bag_pos', 'rope_pos')
+
     def __init__(self, size=10):
         super().__init__(size)
         self.name = "Room 1: Dynamic Programming"
@@ -15,6 +18,7 @@ class FirstEscapeRoom(BaseRoom):
 
     def get_editor_options(self):
         return {
+            **super().get_editor_options(),
             "Walls": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
             "Slippery Tiles": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
             "Start with Items": {"type": "dropdown", "options": ["None", "Bag", "Rope", "Both"], "default": "None"},
@@ -46,13 +50,14 @@ class FirstEscapeRoom(BaseRoom):
         possible_placements_2d = [(r,c) for r,c in np.ndindex(self.grid.shape) if self.grid[r,c] == EMPTY]
         
         num_slippery_str = settings.get('Slippery Tiles', 'Random')
-        num_slippery = random.randint(1, 10) if num_slippery_str == "Random" else int(num_slippery_str)
+        num_slippery = self._random_count(1, 10) if num_slippery_str == "Random" else int(num_slippery_str)
 
         num_slippery = min(num_slippery, len(possible_placements_2d))
         slippery_positions = random.sample(possible_placements_2d, num_slippery)
         for pos in slippery_positions:
             self.grid[pos] = SLIPPERY
             self._generate_slippery_probabilities(pos)
+        self._compile_slip_tables()
 
         if not self._is_path_possible():
             self.generate_layout(settings)
@@ -82,67 +87,72 @@ class FirstEscapeRoom(BaseRoom):
     
         self.slippery_probabilities[pos] = {action: final_probs.get(action, 0.0) for action in self.action_space}
 
-    def get_transition_model(self, state, action):
+    def _move(self, state, act):
+        """(next_state, reward) of moving in direction act from state, once any slip has been resolved."""
         r, c, has_bag, has_rope = state
+        d_row, d_col = self.action_space[act]
+        next_r, next_c = r + d_row, c + d_col
+
+        if 0 <= next_r < self.size and 0 <= next_c < self.size and self.grid[next_r, next_c] != WALL:
+            next_state_pos = (next_r, next_c)
+            reward = 0.0
+        else:
+            next_state_pos = (r, c)
+            reward = -10.0
         
-        if self.grid[r, c] in [WALL, EXIT]: return [(1.0, state, 0)]
-        current_pos = (r, c)
+        next_has_bag, next_has_rope = has_bag, has_rope
+        if next_state_pos == self.bag_pos and not has_bag:
+            reward += 20; next_has_bag = 1
+        elif next_state_pos == self.rope_pos and not has_rope:
+            reward += 30 if has_bag else -10; next_has_rope = 1
         
-        if self.grid[current_pos] == SLIPPERY:
-            # On a slippery tile, the outcome is determined by the tile's random probabilities,
-            # not the agent's intended action.
-            tile_probs = self.slippery_probabilities.get(current_pos, {})
-            outcomes = [(prob, act) for act, prob in tile_probs.items() if prob > 0]
-        else:
-            # On a normal tile, the outcome is deterministic based on the chosen action.
-            outcomes = [(1.0, action)]
-
-        transitions = []
-        for prob, act in outcomes:
-            if act is None:
-                next_r, next_c = r, c
-            else:
-                d_row, d_col = self.action_space[act]
-                next_r, next_c = r + d_row, c + d_col
-
-            if 0 <= next_r < self.size and 0 <= next_c < self.size and self.grid[next_r, next_c] != WALL:
-                next_state_pos = (next_r, next_c)
-                reward = 0.0
-            else:
-                next_state_pos = (r, c)
-                reward = -10.0
-            
-            next_has_bag, next_has_rope = has_bag, has_rope
-            if next_state_pos == self.bag_pos and not has_bag:
-                reward += 20; next_has_bag = 1
-            elif next_state_pos == self.rope_pos and not has_rope:
-                reward += 30 if has_bag else -10; next_has_rope = 1
-            
-            if next_state_pos == self.exit_pos:
-                reward += 100 if next_has_bag and next_has_rope else -20
+        if next_state_pos == self.exit_pos:
+            reward += 100 if next_has_bag and next_has_rope else -20
 
-            final_next_state = (next_state_pos[0], next_state_pos[1], next_has_bag, next_has_rope)
-            transitions.append((prob, final_next_state, reward))
-        return transitions
+        return (next_state_pos[0], next_state_pos[1], next_has_bag, next_has_rope), reward
+
+    def get_transition_model(self, state, action):
+        r, c = state[0], state[1]
+        if self.grid[r, c] in [WALL, EXIT]: return [(1.0, state, 0)]
+        # On a slippery tile, the outcome is determined by the tile's compiled slip table,
+        # not the agent's intended action.
+        outcomes = self.slip_outcomes((r, c)) or [(1.0, action)]
+        return [(prob, *self._move(state, act)) for prob, act in outcomes]
 
     def step(self, state, action):
-        transitions = self.get_transition_model(state, action)
-        probabilities = [t[0] for t in transitions]
-        next_states = [t[1] for t in transitions]
-        rewards = [t[2] for t in transitions]
-        
-        chosen_index = random.choices(range(len(next_states)), weights=probabilities, k=1)[0]
-        
-        next_state = next_states[chosen_index]
-        reward = rewards[chosen_index]
+        pos = (state[0], state[1])
+        if self.grid[pos] in [WALL, EXIT]:
+            next_state, reward = state, 0
+        else:
+            if pos in self.slip_actions:
+                action = self._sample_slip(pos)
+            next_state, reward = self._move(state, action)
         done = (next_state[0], next_state[1]) == self.exit_pos
         return next_state, reward, done
 
+    def get_start_state(self, settings=None):
+        start_items = (settings or {}).get("Start with Items", "None")
+        start_bag = 1 if start_items in ["Bag", "Both"] else 0
+        start_rope = 1 if start_items in ["Rope", "Both"] else 0
+        return (*self.start_pos, start_bag, start_rope)
+
+    def num_encoded_states(self):
+        return self.size * self.size * 4
+
+    def encode_state(self, state):
+        r, c, has_bag, has_rope = state
+        return ((r * self.size + c) * 2 + has_bag) * 2 + has_rope
+
+    def decode_state(self, index):
+        index, has_rope = divmod(index, 2)
+        index, has_bag = divmod(index, 2)
+        return (*divmod(index, self.size), has_bag, has_rope)
+
     def _is_path_possible(self):
-        q = [self.start_pos]
+        q = deque([self.start_pos])
         visited = {self.start_pos}
         while q:
-            r, c = q.pop(0)
+            r, c = q.popleft()
             if (r, c) == self.exit_pos: return True
             for dr, dc in self.action_space.values():
                 nr, nc = r + dr, c + dc
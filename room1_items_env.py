@@ -0,0 +1,143 @@
+import numpy as np
+import random
+from base_classes import BaseRoom
+from room1_dp_env import FirstEscapeRoom
+from constants import EMPTY, WALL, EXIT, SLIPPERY, ITEM
+
+class ItemsEscapeRoom(FirstEscapeRoom):
+    """
+    Room 1 variant: N numbered items to collect in order before the exit.
+    The items held are a bitmask, so a state is (r, c, item_mask) and the DP values
+    fit in one (2^N, size, size) array.
+    """
+    layout_attributes = FirstEscapeRoom.layout_attributes + (
+        'item_positions', 'in_order_reward', 'out_of_order_reward', 'exit_reward', 'early_exit_reward')
+
+    def __init__(self, size=10):
+        super().__init__(size)
+        self.name = "Room 1+: Ordered Items"
+        self.state_space = "One layer of size x size states per item mask."
+        self.num_items = 0
+        self.item_positions = []
+        self.item_index = {}
+        self.in_order_reward = 25.0
+        self.out_of_order_reward = -10.0
+        self.exit_reward = 100.0
+        self.early_exit_reward = -20.0
+
+    def get_editor_options(self):
+        return {
+            **BaseRoom.get_editor_options(self),
+            "Walls": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
+            "Slippery Tiles": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
+            "Items": {"type": "dropdown", "options": list(range(1, 9)), "default": "4"},
+            "In-Order Reward": {"type": "input", "default": "25", "input_type": "float"},
+            "Out-of-Order Reward": {"type": "input", "default": "-10", "input_type": "float"},
+            "Exit Reward": {"type": "input", "default": "100", "input_type": "float"},
+            "Early Exit Reward": {"type": "input", "default": "-20", "input_type": "float"},
+        }
+
+    @property
+    def full_mask(self):
+        return (1 << self.num_items) - 1
+
+    def generate_layout(self, settings):
+        """Places the items in the middle half of the grid, then the slippery tiles, as in Room 1."""
+        BaseRoom.generate_layout(self, settings)
+        self.slippery_probabilities = {}
+        self.num_items = int(settings.get('Items', 4))
+        self.in_order_reward = float(settings.get('In-Order Reward', 25))
+        self.out_of_order_reward = float(settings.get('Out-of-Order Reward', -10))
+        self.exit_reward = float(settings.get('Exit Reward', 100))
+        self.early_exit_reward = float(settings.get('Early Exit Reward', -20))
+
+        zone_size = max(4, self.size // 2)
+        start_coord = (self.size - zone_size) // 2
+        end_coord = start_coord + zone_size
+        item_spawn_zone = [(r, c) for r in range(start_coord, end_coord) for c in range(start_coord, end_coord)]
+        possible_placements = [p for p in item_spawn_zone if self.grid[p] == EMPTY]
+        if len(possible_placements) < self.num_items:
+            self.generate_layout(settings); return
+
+        self.item_positions = random.sample(possible_placements, self.num_items)
+        self.item_index = {pos: i for i, pos in enumerate(self.item_positions)}
+        for pos in self.item_positions:
+            self.grid[pos] = ITEM
+
+        possible_placements_2d = [(r,c) for r,c in np.ndindex(self.grid.shape) if self.grid[r,c] == EMPTY]
+        num_slippery_str = settings.get('Slippery Tiles', 'Random')
+        num_slippery = self._random_count(1, 10) if num_slippery_str == "Random" else int(num_slippery_str)
+        num_slippery = min(num_slippery, len(possible_placements_2d))
+        for pos in random.sample(possible_placements_2d, num_slippery):
+            self.grid[pos] = SLIPPERY
+            self._generate_slippery_probabilities(pos)
+        self._compile_slip_tables()
+
+        if not self._is_path_possible():
+            self.generate_layout(settings)
+
+    def _pickup(self, pos, item_mask):
+        """Reward and new mask for stepping on pos. An item counts as in order if every item before it is held."""
+        item = self.item_index.get(pos)
+        if item is None or item_mask & (1 << item):
+            return 0.0, item_mask
+        earlier = (1 << item) - 1
+        reward = self.in_order_reward if item_mask & earlier == earlier else self.out_of_order_reward
+        return reward, item_mask | (1 << item)
+
+    def _move(self, state, act):
+        r, c, item_mask = state
+        d_row, d_col = self.action_space[act]
+        next_r, next_c = r + d_row, c + d_col
+        if 0 <= next_r < self.size and 0 <= next_c < self.size and self.grid[next_r, next_c] != WALL:
+            next_pos, reward = (next_r, next_c), 0.0
+        else:
+            next_pos, reward = (r, c), -10.0
+
+        pickup_reward, next_mask = self._pickup(next_pos, item_mask)
+        reward += pickup_reward
+        if next_pos == self.exit_pos:
+            reward += self.exit_reward if next_mask == self.full_mask else self.early_exit_reward
+        return (*next_pos, next_mask), reward
+
+    def get_outcome_arrays(self):
+        """
+        The movement part of the model as flat arrays, shared by every item layer. For each
+        action: (source cells, next cells, probabilities, rewards), one entry per possible
+        outcome, with cells as r * size + c. Item and exit rewards depend on the mask and
+        are added by the solver. Also returns a (4, size*size) bool array of valid actions.
+        """
+        outcomes = {}
+        valid = np.zeros((len(self.action_space), self.size * self.size), dtype=bool)
+        for a, action in enumerate(self.action_space):
+            sources, next_cells, probs, rewards = [], [], [], []
+            for r, c in np.ndindex(self.grid.shape):
+                if self.grid[r, c] in [WALL, EXIT]: continue
+                cell = r * self.size + c
+                valid[a, cell] = action in self.get_valid_actions((r, c))
+                moves = self.slip_outcomes((r, c)) or [(1.0, action)]
+                for prob, act in moves:
+                    d_row, d_col = self.action_space[act]
+                    next_r, next_c = r + d_row, c + d_col
+                    blocked = not (0 <= next_r < self.size and 0 <= next_c < self.size and self.grid[next_r, next_c] != WALL)
+                    sources.append(cell)
+                    next_cells.append(cell if blocked else next_r * self.size + next_c)
+                    probs.append(prob)
+                    rewards.append(-10.0 if blocked else 0.0)
+            outcomes[action] = (np.array(sources, dtype=np.int64), np.array(next_cells, dtype=np.int64),
+                                np.array(probs, dtype=np.float64), np.array(rewards, dtype=np.float64))
+        return outcomes, valid
+
+    def get_start_state(self, settings=None):
+        return (*self.start_pos, 0)
+
+    def num_encoded_states(self):
+        return (1 << self.num_items) * self.size * self.size
+
+    def encode_state(self, state):
+        r, c, item_mask = state
+        return (item_mask * self.size + r) * self.size + c
+
+    def decode_state(self, index):
+        item_mask, cell = divmod(index, self.size * self.size)
+        return (*divmod(cell, self.size), item_mask)
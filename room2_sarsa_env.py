@@ -3,29 +3,41 @@ import random
 from base_classes import BaseRoom
 from constants import EMPTY, WALL, START, EXIT, IRON_KEY, PORTAL, SLIPPERY
 
+# Entries of the collision table: how the enemy catches a player who lands on a cell
+CAUGHT_BEFORE_PATROL = 1  # The player walks into the enemy's cell
+CAUGHT_AFTER_PATROL = 2  # The enemy's next patrol step lands on the player
+
 class SecondEscapeRoom(BaseRoom):
     """
     Room 2: A dynamic room with a patrolling enemy.
     """
+    layout_attributes = BaseRoom.layout_attributes + (
+        'key_pos', 'door_pos', 'portal_in_pos', 'portal_out_pos', 'patrol_route')
+
     def __init__(self, size=10):
         super().__init__(size)
         self.name = "Room 2: SARSA with Enemy"
         self.state_space = [(pr, pc, hk) for pr in range(size) for pc in range(size) for hk in range(2)]
+        # The dividing walls sit at the same relative place on every grid size (row 4 and column 6 on 10x10)
+        self.wall_row = int(size * 0.4)
+        self.wall_col = int(size * 0.6)
         self.key_pos = None
         self.door_pos = None
         self.portal_in_pos = None
         self.portal_out_pos = None
-        self.has_key = False
         
         self.enemy_pos = (0, 0)
         self.patrol_route = []
         self.patrol_index = 0
+        self.collision_table = np.zeros((1, size, size), dtype=np.int8)
 
         self.original_grid = np.zeros((size, size), dtype=int)
+        self.grid = self.original_grid
         self.slippery_probabilities = {}
 
     def get_editor_options(self):
         return {
+            **super().get_editor_options(),
             "Walls": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
             "Slippery Tiles": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "Random"},
         }
@@ -37,8 +49,8 @@ class SecondEscapeRoom(BaseRoom):
         self.slippery_probabilities = {}
         self.grid = np.zeros((self.size, self.size), dtype=int)
 
-        self.grid[4, :] = WALL
-        self.grid[4:, 6] = WALL
+        self.grid[self.wall_row, :] = WALL
+        self.grid[self.wall_row:, self.wall_col] = WALL
 
         self._generate_patrol_route()
         
@@ -47,7 +59,7 @@ class SecondEscapeRoom(BaseRoom):
         occupied_positions.add(self.start_pos)
         occupied_positions.add(self.exit_pos)
 
-        key_zone = [(r, c) for r in range(4) for c in range(self.size)]
+        key_zone = [(r, c) for r in range(self.wall_row) for c in range(self.size)]
         possible_key_placements = [p for p in key_zone if p not in occupied_positions]
         if possible_key_placements:
             self.key_pos = random.choice(possible_key_placements)
@@ -57,11 +69,11 @@ class SecondEscapeRoom(BaseRoom):
         if self.key_pos: 
             occupied_positions.add(self.key_pos)
 
-        door_candidates = [(4, c) for c in range(1, 6) if self.grid[4, c] == WALL]
-        self.door_pos = random.choice(door_candidates) if door_candidates else (4, 1)
+        door_candidates = [(self.wall_row, c) for c in range(1, self.wall_col) if self.grid[self.wall_row, c] == WALL]
+        self.door_pos = random.choice(door_candidates) if door_candidates else (self.wall_row, 1)
 
-        portal_in_zone = [(r, c) for r in range(7, 10) for c in range(3)]
-        portal_out_zone = [(r, c) for r in range(5, 7) for c in range(7, 10)]
+        portal_in_zone = [(r, c) for r in range(self.size - 3, self.size) for c in range(self.wall_col // 2)]
+        portal_out_zone = [(r, c) for r in range(self.wall_row + 1, self.wall_row + 3) for c in range(self.wall_col + 1, self.size)]
         possible_portal_in = [p for p in portal_in_zone if p not in occupied_positions]
         self.portal_in_pos = random.choice(possible_portal_in) if possible_portal_in else None
         if self.portal_in_pos: occupied_positions.add(self.portal_in_pos)
@@ -79,8 +91,8 @@ class SecondEscapeRoom(BaseRoom):
         num_walls_str = settings.get('Walls', 'Random')
         num_slippery_str = settings.get('Slippery Tiles', 'Random')
 
-        num_walls = random.randint(1, 10) if num_walls_str == "Random" else int(num_walls_str)
-        num_slippery = random.randint(1, 10) if num_slippery_str == "Random" else int(num_slippery_str)
+        num_walls = self._random_count(1, 10) if num_walls_str == "Random" else int(num_walls_str)
+        num_slippery = self._random_count(1, 10) if num_slippery_str == "Random" else int(num_slippery_str)
 
         possible_randoms = [(r, c) for r,c in np.ndindex(self.grid.shape) if self.grid[r,c] == EMPTY and (r,c) not in occupied_positions]
         
@@ -96,74 +108,139 @@ class SecondEscapeRoom(BaseRoom):
         for pos_array in all_slippery_tiles:
             pos_tuple = tuple(pos_array)
             self._generate_slippery_probabilities(pos_tuple)
+        self._compile_slip_tables()
 
-        self.original_grid = np.copy(self.grid)
+        # The grid is never modified once generated: the key and door follow has_key in the state
+        self.original_grid = self.grid
+        self._build_action_masks()
+        self._build_distance_maps()
+        self._build_collision_table()
         self.reset_state()
 
+    def _build_action_masks(self):
+        """For each has_key value and cell, the actions that do not walk into a wall, the closed door or off the grid."""
+        self._action_masks = [[[None] * self.size for _ in range(self.size)] for _ in range(2)]
+        for has_key in range(2):
+            for r, c in np.ndindex(self.grid.shape):
+                actions = []
+                for action, (dr, dc) in self.action_space.items():
+                    nr, nc = r + dr, c + dc
+                    if not (0 <= nr < self.size and 0 <= nc < self.size): continue
+                    if self.original_grid[nr, nc] == WALL and not (has_key and (nr, nc) == self.door_pos): continue
+                    actions.append(action)
+                self._action_masks[has_key][r][c] = actions
+
+    def get_action_mask(self, state):
+        r, c, has_key = state
+        return self._action_masks[has_key][r][c]
+
+    def _build_collision_table(self):
+        """
+        collision_table[patrol_index, r, c]: whether, and how, the enemy catches a player who lands
+        on (r, c) during a step that starts at that patrol index. A layout without a route keeps
+        the enemy still at its position.
+        """
+        route = self.patrol_route or [self.enemy_pos]
+        self.collision_table = np.zeros((len(route), self.size, self.size), dtype=np.int8)
+        for index, enemy_before in enumerate(route):
+            enemy_after = route[(index + 1) % len(route)]
+            self.collision_table[index][enemy_after] = CAUGHT_AFTER_PATROL
+            self.collision_table[index][enemy_before] = CAUGHT_BEFORE_PATROL
+        self._collisions = self.collision_table.reshape(len(route), -1).tolist()
+
+    def _build_distance_maps(self):
+        """
+        BFS distances to the key with the door closed and to the exit with it open, both
+        taking the portal. The enemy and slippery tiles are ignored: the maps only steer shaping.
+        """
+        walls = self.original_grid == WALL
+        open_walls = walls.copy()
+        if self.door_pos: open_walls[self.door_pos] = False
+        teleports = {self.portal_in_pos: self.portal_out_pos} if self.portal_in_pos and self.portal_out_pos else {}
+        unreachable = 2 * self.size * self.size
+        self.key_distance = np.minimum(self._distance_field([self.key_pos], walls, teleports), unreachable)
+        self.exit_distance = np.minimum(self._distance_field([self.exit_pos], open_walls, teleports), unreachable)
+
+    def estimated_moves_to_go(self, state):
+        r, c, has_key = state
+        if has_key:
+            return float(self.exit_distance[r, c])
+        return float(self.key_distance[r, c] + self.exit_distance[self.key_pos])
+
     def _generate_patrol_route(self):
         path = []
         for c in range(self.size - 1, -1, -1): path.append((0, c))
-        for r in range(1, 4): path.append((r, 0))
-        for c in range(1, self.size): path.append((3, c))
-        for r in range(2, -1, -1): path.append((r, self.size - 1))
+        for r in range(1, self.wall_row): path.append((r, 0))
+        for c in range(1, self.size): path.append((self.wall_row - 1, c))
+        for r in range(self.wall_row - 2, -1, -1): path.append((r, self.size - 1))
         self.patrol_route = path
         
     def reset_state(self):
-        self.grid = np.copy(self.original_grid)
-        self.has_key = False
+        """Puts the enemy back at the start of its patrol. The grid holds no episode state, so nothing is copied."""
         self.patrol_index = 0
         self.enemy_pos = self.patrol_route[0] if self.patrol_route else (0, self.size-1)
-        if self.key_pos: self.grid[self.key_pos] = IRON_KEY
-        if self.door_pos: self.grid[self.door_pos] = WALL
 
-    def step(self, state, action):
-        player_r, player_c, has_key_state = state
-        
-        current_pos = (player_r, player_c)
-        next_player_pos = current_pos
-        reward = 0.0 
-        
-        if self.grid[current_pos] == SLIPPERY:
-            probs = self.slippery_probabilities.get(current_pos, {})
-            if probs:
-                valid_slip_actions = [act for act, p in probs.items() if p > 0]
-                if valid_slip_actions:
-                    action = random.choice(valid_slip_actions)
-
-        d_row, d_col = self.action_space[action]
-        nr, nc = player_r + d_row, player_c + d_col
-        
-        if not (0 <= nr < self.size and 0 <= nc < self.size and self.grid[nr, nc] != WALL):
-            reward = -5.0 
-            next_player_pos = current_pos
-        else:
-            next_player_pos = (nr, nc)
-        
-        if next_player_pos == self.enemy_pos:
-            return (*next_player_pos, has_key_state), -100.0, True
+    def get_start_state(self, settings=None):
+        return (*self.start_pos, 0)
 
-        if self.patrol_route:
-            self.patrol_index = (self.patrol_index + 1) % len(self.patrol_route)
-            self.enemy_pos = self.patrol_route[self.patrol_index]
+    def num_encoded_states(self):
+        return self.size * self.size * 2
+
+    def encode_state(self, state):
+        r, c, has_key = state
+        return (r * self.size + c) * 2 + has_key
 
-        if next_player_pos == self.enemy_pos:
-            return (*next_player_pos, has_key_state), -100.0, True
+    def decode_state(self, index):
+        index, has_key = divmod(index, 2)
+        return (*divmod(index, self.size), has_key)
+
+    def move_outcome(self, state, action, patrol_index):
+        """
+        The deterministic part of a step, once any slip is resolved: the player moves in the
+        direction of `action` during the step that starts at `patrol_index`. Reads only the
+        layout's precomputed tables and changes nothing, so any number of callers can use it
+        at once. Returns (next_state, reward, done, next_patrol_index); a player caught by
+        walking into the enemy leaves the patrol where it was, as the animation shows it.
+        """
+        player_r, player_c, has_key = state
+        if action in self._action_masks[has_key][player_r][player_c]:
+            d_row, d_col = self.action_space[action]
+            player_r, player_c = player_r + d_row, player_c + d_col
+            reward = 0.0
+        else:
+            reward = -5.0
 
-        if next_player_pos == self.portal_in_pos:
-            next_player_pos = self.portal_out_pos
+        collisions = self._collisions[patrol_index]
+        collision = collisions[player_r * self.size + player_c]
+        if collision == CAUGHT_BEFORE_PATROL:
+            return (player_r, player_c, has_key), -100.0, True, patrol_index
+        next_patrol_index = (patrol_index + 1) % len(self._collisions)
+        if collision == CAUGHT_AFTER_PATROL:
+            return (player_r, player_c, has_key), -100.0, True, next_patrol_index
+
+        next_pos = (player_r, player_c)
+        if next_pos == self.portal_in_pos and self.portal_out_pos:
+            next_pos = self.portal_out_pos
             reward += 5.0
-        
-        tile_at_next_pos = self.grid[next_player_pos]
-        next_has_key_state = has_key_state
-        if tile_at_next_pos == IRON_KEY and not has_key_state:
-            self.has_key = True; next_has_key_state = 1; reward += 50.0 
-            if self.key_pos: self.grid[self.key_pos] = EMPTY
-            if self.door_pos: self.grid[self.door_pos] = EMPTY
-        
-        done = (next_player_pos == self.exit_pos)
+        if not has_key and next_pos == self.key_pos:
+            has_key = 1
+            reward += 50.0
+        done = (next_pos == self.exit_pos)
         if done: reward += 100.0
-            
-        next_state = (*next_player_pos, next_has_key_state)
+        return (*next_pos, has_key), reward, done, next_patrol_index
+
+    def transition(self, state, action, patrol_index):
+        """A reentrant step: move_outcome after sampling a slip on ice. Returns (next_state, reward, done, next_patrol_index)."""
+        pos = (state[0], state[1])
+        if pos in self.slip_actions:
+            action = self._sample_slip(pos)
+        return self.move_outcome(state, action, patrol_index)
+
+    def step(self, state, action):
+        """Steps from the room's own patrol phase and advances it, which moves the enemy the visualizer draws."""
+        next_state, reward, done, self.patrol_index = self.transition(state, action, self.patrol_index)
+        if self.patrol_route:
+            self.enemy_pos = self.patrol_route[self.patrol_index]
         return next_state, reward, done
 
     def _generate_slippery_probabilities(self, pos):
@@ -7,6 +7,9 @@ class ThirdEscapeRoom(BaseRoom):
     """
     Room 3 Challenge: The Pothole Islands.
     """
+    layout_attributes = BaseRoom.layout_attributes + (
+        'original_plank1_pos', 'original_plank2_pos', 'silver_key_pos', 'golden_key_pos', 'locked_door_pos')
+
     def __init__(self, size=10):
         super().__init__(size)
         self.name = "Room 3: The Pothole Islands"
@@ -30,6 +33,7 @@ class ThirdEscapeRoom(BaseRoom):
     def get_editor_options(self):
         """Returns editor options for walls."""
         return {
+            **super().get_editor_options(),
             "Walls": {"type": "dropdown", "options": ["Random"] + list(range(21)), "default": "0"},
         }
 
@@ -113,7 +117,7 @@ class ThirdEscapeRoom(BaseRoom):
         possible_randoms = [p for p in np.ndindex(self.grid.shape) if p not in occupied_coords]
         
         num_walls_str = settings.get('Walls', '0')
-        num_walls = random.randint(1, 10) if num_walls_str == "Random" else int(num_walls_str)
+        num_walls = self._random_count(1, 10) if num_walls_str == "Random" else int(num_walls_str)
         wall_positions = random.sample(possible_randoms, min(num_walls, len(possible_randoms)))
         for pos in wall_positions:
             self.grid[pos] = WALL
@@ -123,6 +127,8 @@ class ThirdEscapeRoom(BaseRoom):
         self.grid[self.locked_door_pos] = LOCKED_DOOR
         
         self.original_grid = np.copy(self.grid)
+        self._build_action_masks()
+        self._build_distance_maps()
         self.reset_state()
     
     def encode_bridge_pos(self, r, c):
@@ -136,13 +142,163 @@ class ThirdEscapeRoom(BaseRoom):
     def reset_state(self):
         self.grid = np.copy(self.original_grid)
 
+    def get_start_state(self, settings=None):
+        return self.canonical_state((*self.start_pos, *self.original_plank1_pos, *self.original_plank2_pos, 0, 0))
+
+    def canonical_state(self, state):
+        """
+        The planks are interchangeable, so states that only differ by which plank is which
+        are the same state. The canonical form lists the plank with the smaller (r, c) first;
+        bridged planks (r == -1) therefore come before planks on the floor.
+        """
+        if (state[4], state[5]) < (state[2], state[3]):
+            return (state[0], state[1], state[4], state[5], state[2], state[3], state[6], state[7])
+        return state
+
+    def _encode_plank(self, plank_r, plank_c):
+        """A plank on the floor maps to its cell index, a bridged plank to size*size plus its encoded bridge position."""
+        return self.size * self.size + plank_c if plank_r == -1 else plank_r * self.size + plank_c
+
+    def _decode_plank(self, code):
+        cells = self.size * self.size
+        return (-1, code - cells) if code >= cells else divmod(code, self.size)
+
+    def num_encoded_states(self):
+        plank_codes = 2 * self.size * self.size
+        return self.size * self.size * plank_codes * plank_codes * 4
+
+    def encode_state(self, state):
+        player_r, player_c, p1_r, p1_c, p2_r, p2_c, has_silver, has_golden = state
+        plank_codes = 2 * self.size * self.size
+        index = player_r * self.size + player_c
+        index = index * plank_codes + self._encode_plank(p1_r, p1_c)
+        index = index * plank_codes + self._encode_plank(p2_r, p2_c)
+        return (index * 2 + has_silver) * 2 + has_golden
+
+    def decode_state(self, index):
+        plank_codes = 2 * self.size * self.size
+        index, has_golden = divmod(index, 2)
+        index, has_silver = divmod(index, 2)
+        index, plank2 = divmod(index, plank_codes)
+        index, plank1 = divmod(index, plank_codes)
+        return (*divmod(index, self.size), *self._decode_plank(plank1), *self._decode_plank(plank2), has_silver, has_golden)
+
+    def _tile_at(self, pos, p1_r, p1_c, p2_r, p2_c):
+        """The tile at pos with bridged planks laid over the potholes, without copying the grid."""
+        if (p1_r == -1 and self.decode_bridge_pos(p1_c) == pos) or (p2_r == -1 and self.decode_bridge_pos(p2_c) == pos):
+            return BRIDGE
+        return self.grid[pos]
+
+    def _build_action_masks(self):
+        """
+        The static part of the action masks: per door state (locked, unlocked), cell and action,
+        whether the cell the player ends up on is on the grid and not a wall or the locked door,
+        and for pulls whether the pulled cell is on the grid.
+        """
+        self._static_masks = np.zeros((2, self.size, self.size, len(self.action_space)), dtype=bool)
+        for door_open in range(2):
+            for r, c in np.ndindex(self.grid.shape):
+                for a, (action, (dr, dc)) in enumerate(self.action_space.items()):
+                    pull = "pull" in action
+                    nr, nc = (r - dr, c - dc) if pull else (r + dr, c + dc)
+                    if not (0 <= nr < self.size and 0 <= nc < self.size): continue
+                    if pull and not (0 <= r + dr < self.size and 0 <= c + dc < self.size): continue
+                    if self.original_grid[nr, nc] == WALL: continue
+                    if (nr, nc) == self.locked_door_pos and not door_open: continue
+                    self._static_masks[door_open, r, c, a] = True
+
+    def get_action_mask(self, state):
+        """
+        The static mask for the player's cell combined with the planks: pulls need a plank on
+        the floor to pull, and walking into a plank needs room to push it (an empty tile or a pothole).
+        Exactly the actions that would leave the state unchanged with the -5 bump penalty are left out;
+        a pull that backs into a pothole still ends the episode, so it stays.
+        """
+        player_r, player_c, p1_r, p1_c, p2_r, p2_c, has_silver, has_golden = state
+        static = self._static_masks[int(bool(has_silver and has_golden)), player_r, player_c]
+        floor_planks = [pos for pos in ((p1_r, p1_c), (p2_r, p2_c)) if pos[0] != -1]
+        actions = []
+        for a, (action, (dr, dc)) in enumerate(self.action_space.items()):
+            if not static[a]: continue
+            target = (player_r + dr, player_c + dc)
+            if "pull" in action:
+                backing_into = (player_r - dr, player_c - dc)
+                if target not in floor_planks and self._tile_at(backing_into, p1_r, p1_c, p2_r, p2_c) != POTHOLE: continue
+            elif target in floor_planks:
+                beyond = (target[0] + dr, target[1] + dc)
+                if not (0 <= beyond[0] < self.size and 0 <= beyond[1] < self.size): continue
+                if self._tile_at(beyond, p1_r, p1_c, p2_r, p2_c) not in (EMPTY, POTHOLE): continue
+            actions.append(action)
+        return actions
+
+    def _build_distance_maps(self):
+        """
+        BFS distance fields over the fixed layout, with potholes and the keys as obstacles, for
+        each key: to its access points, to the push positions (where the player stands to push
+        a plank onto an access point) and, for planks, to the landing cells next to the access
+        points they are pushed from. Plus the distance to the exit with the door open.
+        """
+        self._island_cells = np.isin(self.original_grid, [POTHOLE, SILVER_KEY, GOLDEN_KEY])
+        blocked = self._island_cells | np.isin(self.original_grid, [WALL, LOCKED_DOOR])
+        open_blocked = blocked.copy()
+        open_blocked[self.locked_door_pos] = False
+        in_bounds = lambda r, c: 0 <= r < self.size and 0 <= c < self.size
+        self._unreachable = 4 * self.size * self.size
+        field = lambda targets, blocked: np.minimum(self._extend_onto_islands(self._distance_field(targets, blocked)), self._unreachable)
+        self.exit_distance = field([self.exit_pos], open_blocked)
+
+        self.access_distance, self.push_distance, self.plank_distance, self._landings = [], [], [], []
+        for access_points in (self.silver_key_access_points, self.golden_key_access_points):
+            landings, pushes = set(), set()
+            for ar, ac in access_points:
+                for dr, dc in self.action_space.values():
+                    landing, push = (ar - dr, ac - dc), (ar - 2 * dr, ac - 2 * dc)
+                    if in_bounds(*landing) and in_bounds(*push) and not blocked[landing] and not blocked[push]:
+                        landings.add(landing)
+                        pushes.add(push)
+            self._landings.append(landings)
+            self.access_distance.append(field(access_points, blocked))
+            self.push_distance.append(field(pushes, blocked))
+            self.plank_distance.append(field(landings, blocked))
+
+        # Moves from standing on a key to the exit, and on to the other key's push position
+        self._key_to_exit = [min((self.exit_distance[l] + 2 for l in landings), default=self._unreachable) for landings in self._landings]
+        self._key_to_key = [min((self.push_distance[1 - k][l] + 2 for l in self._landings[k]), default=self._unreachable) for k in range(2)]
+
+    def _extend_onto_islands(self, distances):
+        """Fills in the island cells a player can stand on once bridged (a bridge, or the key two moves in) from their neighbours."""
+        for _ in range(2):
+            padded = np.pad(distances, 1, constant_values=np.inf)
+            neighbours = np.minimum.reduce([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+            distances = np.where(self._island_cells, np.minimum(distances, neighbours + 1), distances)
+        return distances
+
+    def estimated_moves_to_go(self, state):
+        """
+        Moves along the route to the next missing key (bridging its island first if needed,
+        fetching the nearest plank), then any other key, then the exit.
+        """
+        player_r, player_c, p1_r, p1_c, p2_r, p2_c, has_silver, has_golden = state
+        if has_silver and has_golden:
+            return float(self.exit_distance[player_r, player_c])
+        held = (has_silver, has_golden)
+        bridges = [self.decode_bridge_pos(pc) for pr, pc in ((p1_r, p1_c), (p2_r, p2_c)) if pr == -1]
+        floor_planks = [(pr, pc) for pr, pc in ((p1_r, p1_c), (p2_r, p2_c)) if pr != -1]
+        access = (self.silver_key_access_points, self.golden_key_access_points)
+        best = self._unreachable
+        for k in range(2):
+            if held[k]: continue
+            if any(bridge in access[k] for bridge in bridges):
+                leg = self.access_distance[k][player_r, player_c] + 1
+            else:
+                plank = min((self.plank_distance[k][p] for p in floor_planks), default=self._unreachable)
+                leg = self.push_distance[k][player_r, player_c] + plank + 3
+            rest = self._key_to_exit[k] if held[1 - k] else self._key_to_key[k] + 3 + self._key_to_exit[1 - k]
+            best = min(best, leg + rest)
+        return float(min(best, self._unreachable))
+
     def get_valid_actions(self, state):
         player_r, player_c, p1_r, p1_c, p2_r, p2_c, has_silver, has_golden = state
-        
-        temp_grid = np.copy(self.grid)
-        
-        if p1_r == -1: temp_grid[self.decode_bridge_pos(p1_c)] = BRIDGE
-        if p2_r == -1: temp_grid[self.decode_bridge_pos(p2_c)] = BRIDGE
 
         actions = []
         for action, (dr, dc) in self.action_space.items():
@@ -151,7 +307,7 @@ class ThirdEscapeRoom(BaseRoom):
             if not (0 <= nr < self.size and 0 <= nc < self.size):
                 continue
 
-            tile_type = temp_grid[nr, nc]
+            tile_type = self._tile_at((nr, nc), p1_r, p1_c, p2_r, p2_c)
             is_wall = tile_type == WALL
             is_locked_door = tile_type == LOCKED_DOOR and not (has_silver and has_golden)
 
@@ -162,12 +318,13 @@ class ThirdEscapeRoom(BaseRoom):
         return actions
 
     def step(self, state, action):
+        """Applies an action and returns (next_state, reward, done), with next_state in canonical form."""
+        next_state, reward, done = self._step(state, action)
+        return self.canonical_state(next_state), reward, done
+
+    def _step(self, state, action):
         player_r, player_c, p1_r, p1_c, p2_r, p2_c, has_silver, has_golden = state
         reward = -0.1
-        
-        temp_grid = np.copy(self.grid)
-        if p1_r == -1: temp_grid[self.decode_bridge_pos(p1_c)] = BRIDGE
-        if p2_r == -1: temp_grid[self.decode_bridge_pos(p2_c)] = BRIDGE
 
         d_row, d_col = self.action_space[action]
         
@@ -178,7 +335,7 @@ class ThirdEscapeRoom(BaseRoom):
             if not (0 <= agent_new_pos[0] < self.size and 0 <= agent_new_pos[1] < self.size):
                 return state, -5.0, False 
 
-            tile_to_step_on = temp_grid[agent_new_pos]
+            tile_to_step_on = self._tile_at(agent_new_pos, p1_r, p1_c, p2_r, p2_c)
             is_locked_door = agent_new_pos == self.locked_door_pos and not (has_silver and has_golden)
 
             if tile_to_step_on == WALL or is_locked_door:
@@ -205,7 +362,7 @@ class ThirdEscapeRoom(BaseRoom):
                 next_plank_r, next_plank_c = plank_state[0] + d_row, plank_state[1] + d_col
                 
                 if not (0 <= next_plank_r < self.size and 0 <= next_plank_c < self.size): return state, -5.0, False
-                tile_beyond_plank = temp_grid[next_plank_r, next_plank_c]
+                tile_beyond_plank = self._tile_at((next_plank_r, next_plank_c), p1_r, p1_c, p2_r, p2_c)
                 
                 if tile_beyond_plank == POTHOLE:
                     new_bridge_pos = (next_plank_r, next_plank_c)
@@ -235,7 +392,7 @@ class ThirdEscapeRoom(BaseRoom):
                 else: return state, -5.0, False
 
         if not (0 <= next_player_r < self.size and 0 <= next_player_c < self.size): return state, -5.0, False
-        tile_type = temp_grid[next_player_r, next_player_c]
+        tile_type = self._tile_at((next_player_r, next_player_c), p1_r, p1_c, p2_r, p2_c)
         if tile_type == WALL or (tile_type == LOCKED_DOOR and not (has_silver and has_golden)): return state, -5.0, False
         if tile_type == POTHOLE: return state, -100.0, True
 
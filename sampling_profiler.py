@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that can be started and stopped while the game is running.
+    A daemon thread samples the stack of the watched thread every few milliseconds and
+    files each sample under the room, agent and operation that were active at the time.
+    """
+    def __init__(self, interval=0.005, output_dir="profiles"):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.is_running = False
+        self.room = ""
+        self.agent = ""
+        self.operations = ["main loop"]
+        self._thread = None
+        self._target_thread_id = None
+
+    def set_subject(self, room, agent):
+        """Sets the room and agent that new samples are attributed to."""
+        self.room = room
+        self.agent = agent
+
+    @contextmanager
+    def operation(self, name):
+        """Attributes samples taken inside the block to the named operation (e.g. 'fast training')."""
+        self.operations.append(name)
+        try:
+            yield
+        finally:
+            self.operations.pop()
+
+    def start(self):
+        """Starts sampling the calling thread."""
+        if self.is_running:
+            return
+        self.samples = defaultdict(Counter)  # (room, agent, operation) -> Counter of stacks
+        self.sample_count = 0
+        self.started_at = time.perf_counter()
+        self._target_thread_id = threading.get_ident()
+        self.is_running = True
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling and writes the report. Returns the report path, or None if nothing was sampled."""
+        if not self.is_running:
+            return None
+        self.is_running = False
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self._write_report() if self.sample_count else None
+
+    def _sample_loop(self):
+        own_file = os.path.abspath(__file__)
+        while self.is_running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if os.path.abspath(code.co_filename) != own_file:
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if not stack:
+                continue
+            self.samples[(self.room, self.agent, self.operations[-1])][tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def _write_report(self, top=25):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        report_path = os.path.join(self.output_dir, f"sampling_{stamp}.txt")
+        folded_path = os.path.join(self.output_dir, f"sampling_{stamp}.folded")
+
+        lines = [
+            f"Sampling profile captured {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Duration: {self.duration:.2f} s, samples: {self.sample_count}, interval: {self.interval * 1000:.1f} ms",
+            f"Folded stacks (for flame graph tools): {os.path.basename(folded_path)}",
+        ]
+        folded = []
+        for (room, agent, operation), stacks in sorted(self.samples.items(), key=lambda item: -sum(item[1].values())):
+            total = sum(stacks.values())
+            self_counts, cumulative_counts = Counter(), Counter()
+            for stack, count in stacks.items():
+                self_counts[stack[-1]] += count
+                for function in set(stack):
+                    cumulative_counts[function] += count
+                folded.append(f"{room};{agent};{operation};{';'.join(stack)} {count}")
+
+            lines.append("")
+            lines.append(f"=== {room} | {agent} | {operation}: {total} samples ({100.0 * total / self.sample_count:.1f}%) ===")
+            lines.append("  Self time:")
+            for function, count in self_counts.most_common(top):
+                lines.append(f"    {100.0 * count / total:6.1f}%  {function}")
+            lines.append("  Cumulative time:")
+            for function, count in cumulative_counts.most_common(top):
+                lines.append(f"    {100.0 * count / total:6.1f}%  {function}")
+
+        with open(report_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        with open(folded_path, 'w') as f:
+            f.write("\n".join(folded) + "\n")
+        return report_path
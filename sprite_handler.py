@@ -45,6 +45,8 @@ class AnimatedSprite(pygame.sprite.Sprite):
             self.rect = self.image.get_rect()
 
         self.flip = False
+        self._scaled_size = size
+        self._scaled_frames = {}
 
     def _load_animations(self, size):
         """
@@ -138,3 +140,18 @@ class AnimatedSprite(pygame.sprite.Sprite):
     def draw(self, surface):
         """Draws the sprite on the given surface."""
         surface.blit(self.image, self.rect)
+
+    def draw_at(self, surface, rect):
+        """Draws the current frame scaled to fit rect. Scaled frames are cached for the current zoom level."""
+        if rect.width == self.size:
+            surface.blit(self.image, rect)
+            return
+        if rect.width != self._scaled_size:
+            self._scaled_size = rect.width
+            self._scaled_frames = {}
+        key = (self.state, self.current_frame, self.flip)
+        image = self._scaled_frames.get(key)
+        if image is None:
+            image = pygame.transform.scale(self.image, (rect.width, rect.height))
+            self._scaled_frames[key] = image
+        surface.blit(image, rect)